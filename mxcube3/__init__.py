@@ -18,6 +18,7 @@ from optparse import OptionParser
 from mxcube3.config import Config
 from mxcube3.app import MXCUBEApplication
 from mxcube3.server import Server
+from mxcube3.core.util.profileutils import STARTUP_PROFILER
 
 sys.modules["Qub"] = mock.Mock()
 sys.modules["Qub.CTools"] = mock.Mock()
@@ -85,6 +86,14 @@ def parse_args():
         default=False,
     )
 
+    opt_parser.add_option(
+        "-p",
+        "--profile-startup",
+        dest="profile_startup",
+        help="Profile the startup and write the report (JSON) to this file",
+        default="",
+    )
+
     return opt_parser.parse_args()
 
 
@@ -92,31 +101,44 @@ def main(test=False):
     try:
         cmdline_options, args = parse_args()
 
-        # This refactoring (with other bits) allows you to pass a 'path1:path2' lookup path
-        # as the hwr_directory. I need it for sensible managing of a multi-beamline test set-up
-        # without continuously editing teh main config files.
-        # Note that the machinery was all there in the core alrady. rhfogh.
-        HWR.init_hardware_repository(cmdline_options.hwr_directory)
-        config_path = HWR.get_hardware_repository().find_in_repository(
-            "mxcube-web"
-        )
-
-        cfg = Config(config_path)
-
-        if test:
-            cfg.flask.USER_DB_PATH = "/tmp/mxcube-test-user.db"
-
-        server.init(cmdline_options, cfg, mxcube)
-        mxcube.init(
-            server,
-            cmdline_options.allow_remote,
-            cmdline_options.ra_timeout,
-            cmdline_options.video_device,
-            cmdline_options.log_file,
-            cfg,
-        )
-
-        server.register_routes(mxcube)
+        # The profiler is disabled (the import functions restored) even if
+        # the startup fails
+        with STARTUP_PROFILER.profile(bool(cmdline_options.profile_startup)):
+            # This refactoring (with other bits) allows you to pass a 'path1:path2' lookup path
+            # as the hwr_directory. I need it for sensible managing of a multi-beamline test set-up
+            # without continuously editing teh main config files.
+            # Note that the machinery was all there in the core alrady. rhfogh.
+            with STARTUP_PROFILER.stage("hardware repository"):
+                HWR.init_hardware_repository(cmdline_options.hwr_directory)
+
+            config_path = HWR.get_hardware_repository().find_in_repository(
+                "mxcube-web"
+            )
+
+            with STARTUP_PROFILER.stage("config"):
+                cfg = Config(config_path)
+
+            if test:
+                cfg.flask.USER_DB_PATH = "/tmp/mxcube-test-user.db"
+
+            with STARTUP_PROFILER.stage("server"):
+                server.init(cmdline_options, cfg, mxcube)
+
+            with STARTUP_PROFILER.stage("application"):
+                mxcube.init(
+                    server,
+                    cmdline_options.allow_remote,
+                    cmdline_options.ra_timeout,
+                    cmdline_options.video_device,
+                    cmdline_options.log_file,
+                    cfg,
+                )
+
+            with STARTUP_PROFILER.stage("routes"):
+                server.register_routes(mxcube)
+
+        if cmdline_options.profile_startup:
+            STARTUP_PROFILER.write_report(cmdline_options.profile_startup)
     except:
         traceback.print_exc()
         raise
@@ -8,6 +8,10 @@ import logging
 import traceback
 import atexit
 import json
+import time
+
+import gevent
+import gevent.pool
 
 from pathlib import Path
 from logging import StreamHandler, NullHandler
@@ -20,6 +24,7 @@ from mxcubecore.utils.conversion import make_table
 
 from mxcube3.logging_handler import MX3LoggingHandler
 from mxcube3.core.util.adapterutils import get_adapter_cls_from_hardware_object
+from mxcube3.core.util.profileutils import STARTUP_PROFILER
 from mxcube3.core.adapter.adapter_base import AdapterBase
 from mxcube3.core.components.component_base import import_component
 from mxcube3.core.components.lims import Lims
@@ -48,6 +53,10 @@ class MXCUBECore:
 
     adapter_dict = {}
 
+    # Adapters added while adapters are created concurrently, by greenlet,
+    # see adapt_hardware_objects
+    _pending_adapters = None
+
     @staticmethod
     def exit_with_error(msg):
         """
@@ -96,7 +105,9 @@ class MXCUBECore:
 
         try:
             MXCUBECore.beamline = BeamlineAdapter(HWR.beamline, MXCUBEApplication)
-            MXCUBECore.adapt_hardware_objects(app)
+
+            with STARTUP_PROFILER.stage("adapters"):
+                MXCUBECore.adapt_hardware_objects(app)
         except Exception:
             msg = "Could not initialize one or several hardware objects, "
             msg += "stopped at first error ! \n"
@@ -123,6 +134,17 @@ class MXCUBECore:
 
     @staticmethod
     def _add_adapter(_id, adapter_cls, ho, adapter_instance):
+        pending = MXCUBECore._pending_adapters
+
+        # Adapters created by adapters that are created concurrently are
+        # added once all adapters are created, in the same order as if they
+        # were created one after the other
+        if pending is not None and gevent.getcurrent() in pending:
+            pending[gevent.getcurrent()].append(
+                (_id, adapter_cls, ho, adapter_instance)
+            )
+            return
+
         if _id not in MXCUBECore.adapter_dict:
             MXCUBECore.adapter_dict[_id] = {
                 "id": str(_id),
@@ -139,13 +161,88 @@ class MXCUBECore:
     def get_adapter(_id):
         return MXCUBECore._get_object_from_id(_id)
 
+    @staticmethod
+    def _create_adapter(app, ho, _id, adapter_cls, adapter_config):
+        """
+        Creates the adapter for a hardware object
+
+        :param app: MXCUBEApplication
+        :param ho: Hardware object to adapt
+        :param str _id: Adapter id
+        :param adapter_cls: Adapter class
+        :param adapter_config: Adapter properties
+
+        :returns: Tuple (adapter class, adapter instance, init time [s]),
+                  AdapterBase is used if the adapter could not be created
+        """
+        t0 = time.time()
+
+        try:
+            with STARTUP_PROFILER.stage(_id):
+                adapter_instance = adapter_cls(ho, _id, app, **dict(adapter_config))
+
+            logging.getLogger("MX3.HWR").info("Added adapter for %s" % _id)
+        except:
+            logging.getLogger("MX3.HWR").exception(
+                "Could not add adapter for %s" % _id
+            )
+            logging.getLogger("MX3.HWR").info("%s not available" % _id)
+            adapter_cls = AdapterBase
+            adapter_instance = AdapterBase(None, _id, app)
+
+        return adapter_cls, adapter_instance, time.time() - t0
+
+    @staticmethod
+    def _create_adapters_concurrently(app, to_adapt, adapter_config, concurrency):
+        """
+        Creates the adapters for the hardware objects in to_adapt, at most
+        concurrency at the time. Adapters (and the adapters they create) are
+        added in the order of to_adapt.
+
+        :param app: MXCUBEApplication
+        :param list to_adapt: List of tuples (hardware object, id, adapter class)
+        :param adapter_config: Adapter properties
+        :param int concurrency: Maximum number of adapters created concurrently
+
+        :returns: Dictionary with the init time [s] of each adapter by id
+        """
+        MXCUBECore._pending_adapters = {}
+
+        def _create(item):
+            ho, _id, adapter_cls = item
+            nested = MXCUBECore._pending_adapters[gevent.getcurrent()] = []
+
+            return (
+                MXCUBECore._create_adapter(app, ho, _id, adapter_cls, adapter_config),
+                nested,
+            )
+
+        try:
+            results = gevent.pool.Pool(concurrency).map(_create, to_adapt)
+        finally:
+            MXCUBECore._pending_adapters = None
+
+        init_times = {}
+
+        for (ho, _id, _), (created, nested) in zip(to_adapt, results):
+            adapter_cls, adapter_instance, init_times[_id] = created
+
+            for args in nested:
+                MXCUBECore._add_adapter(*args)
+
+            MXCUBECore._add_adapter(_id, adapter_cls, ho, adapter_instance)
+
+        return init_times
+
     @staticmethod
     def adapt_hardware_objects(app):
         adapter_config = app.CONFIG.app.adapter_properties
+        concurrency = app.CONFIG.app.adapter_init_concurrency
 
         # NB. We should investigate why the list hardware_objects
         # is updated internaly in mxcubecore
         hwobject_list = [item for item in MXCUBECore.hwr.hardware_objects]
+        to_adapt = []
 
         for ho_name in hwobject_list:
             # Go through all hardware objects exposed by mxcubecore
@@ -163,26 +260,38 @@ class MXCUBECore:
             adapter_cls = get_adapter_cls_from_hardware_object(ho)
 
             if adapter_cls:
-                try:
-                    adapter_instance = adapter_cls(ho, _id, app, **dict(adapter_config))
-                    logging.getLogger("MX3.HWR").info("Added adapter for %s" % _id)
-                except:
-                    logging.getLogger("MX3.HWR").exception(
-                        "Could not add adapter for %s" % _id
+                to_adapt.append((ho, _id, adapter_cls))
+            else:
+                logging.getLogger("MX3.HWR").info("No adapter for %s" % _id)
+
+        if concurrency > 1:
+            init_times = MXCUBECore._create_adapters_concurrently(
+                app, to_adapt, adapter_config, concurrency
+            )
+        else:
+            init_times = {}
+
+            for ho, _id, adapter_cls in to_adapt:
+                adapter_cls, adapter_instance, init_times[_id] = (
+                    MXCUBECore._create_adapter(
+                        app, ho, _id, adapter_cls, adapter_config
                     )
-                    logging.getLogger("MX3.HWR").info("%s not available" % _id)
-                    adapter_cls = AdapterBase
-                    adapter_instance = AdapterBase(None, _id, app)
+                )
 
                 MXCUBECore._add_adapter(_id, adapter_cls, ho, adapter_instance)
-            else:
-                logging.getLogger("MX3.HWR").info("No adapter for %s" % _id)
 
         print(
             make_table(
-                ["Name", "Adapter", "HO filename"],
+                ["Name", "Adapter", "HO filename", "Init time [s]"],
                 [
-                    [item["id"], item["adapter_cls"], item["ho"]]
+                    [
+                        item["id"],
+                        item["adapter_cls"],
+                        item["ho"],
+                        "%.2f" % init_times[item["id"]]
+                        if item["id"] in init_times
+                        else "",
+                    ]
                     for item in MXCUBECore.adapter_dict.values()
                 ],
             )
@@ -280,22 +389,41 @@ class MXCUBEApplication:
             cfg.app.usermanager, package="components.user"
         )
 
-        MXCUBEApplication.queue = Queue(MXCUBEApplication, {})
-        MXCUBEApplication.lims = Lims(MXCUBEApplication, {})
-        MXCUBEApplication.usermanager = _UserManagerCls(
-            MXCUBEApplication, cfg.app.usermanager
-        )
-        MXCUBEApplication.chat = Chat(MXCUBEApplication, {})
-        MXCUBEApplication.sample_changer = SampleChanger(MXCUBEApplication, {})
-        MXCUBEApplication.beamline = Beamline(MXCUBEApplication, {})
-        MXCUBEApplication.sample_view = SampleView(MXCUBEApplication, {})
-        MXCUBEApplication.workflow = Workflow(MXCUBEApplication, {})
+        with STARTUP_PROFILER.stage("components"):
+            with STARTUP_PROFILER.stage("queue"):
+                MXCUBEApplication.queue = Queue(MXCUBEApplication, {})
+
+            with STARTUP_PROFILER.stage("lims"):
+                MXCUBEApplication.lims = Lims(MXCUBEApplication, {})
+
+            with STARTUP_PROFILER.stage("usermanager"):
+                MXCUBEApplication.usermanager = _UserManagerCls(
+                    MXCUBEApplication, cfg.app.usermanager
+                )
+
+            with STARTUP_PROFILER.stage("chat"):
+                MXCUBEApplication.chat = Chat(MXCUBEApplication, {})
+
+            with STARTUP_PROFILER.stage("sample_changer"):
+                MXCUBEApplication.sample_changer = SampleChanger(MXCUBEApplication, {})
+
+            with STARTUP_PROFILER.stage("beamline"):
+                MXCUBEApplication.beamline = Beamline(MXCUBEApplication, {})
+
+            with STARTUP_PROFILER.stage("sample_view"):
+                MXCUBEApplication.sample_view = SampleView(MXCUBEApplication, {})
+
+            with STARTUP_PROFILER.stage("workflow"):
+                MXCUBEApplication.workflow = Workflow(MXCUBEApplication, {})
+
+        with STARTUP_PROFILER.stage("signals"):
+            MXCUBEApplication.init_signal_handlers()
 
-        MXCUBEApplication.init_signal_handlers()
         atexit.register(MXCUBEApplication.app_atexit)
 
         # Install server-side UI state storage
-        MXCUBEApplication.init_state_storage()
+        with STARTUP_PROFILER.stage("state storage"):
+            MXCUBEApplication.init_state_storage()
 
         # MXCUBEApplication.load_settings()
 
@@ -312,6 +440,12 @@ class MXCUBEApplication:
 
         :return: None
         """
+        # The encoder settings are passed to the streaming processes, started
+        # by the camera, through the environment
+        os.environ["MXCUBE_VIDEO_ENCODER"] = (
+            MXCUBEApplication.CONFIG.app.video_encoder.json()
+        )
+
         try:
             HWR.beamline.sample_view.camera.start_streaming()
         except Exception as ex:
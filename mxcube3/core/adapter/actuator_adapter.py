@@ -1,10 +1,13 @@
+from mxcubecore.HardwareObjects.abstract import AbstractActuator
+
 from mxcube3.core.adapter.adapter_base import ActuatorAdapterBase
-from mxcube3.core.util.adapterutils import export
-from mxcube3.core.util.networkutils import RateLimited
+from mxcube3.core.util.adapterutils import adapts, export
+from mxcube3.core.util.networkutils import Throttled
 
 from mxcube3.core.models.adaptermodels import HOActuatorValueChangeModel, FloatValueModel
 
 
+@adapts(AbstractActuator.AbstractActuator)
 class ActuatorAdapter(ActuatorAdapterBase):
     """
     Adapter for Energy Hardware Object, a web socket is used to communicate
@@ -19,7 +22,8 @@ class ActuatorAdapter(ActuatorAdapterBase):
         super(ActuatorAdapter, self).__init__(ho, *args, **kwargs)
         self._event_rate = 4
 
-        @RateLimited(self._event_rate)
+        # _vc is bound to this instance, so a single key is enough
+        @Throttled(self._event_rate, key=lambda *args, **kwargs: None)
         def _vc(value, **kwargs):
             self.value_change(value, **kwargs)
 
@@ -1,4 +1,5 @@
 import logging
+import time
 
 from mxcube3.core.util.adapterutils import get_adapter_cls_from_hardware_object
 from mxcube3.core.models.adaptermodels import HOModel, HOActuatorModel
@@ -20,6 +21,8 @@ class AdapterBase:
         self._read_only = False
         self._type = type(self).__name__.replace("Adapter", "").upper()
         self._unique = True
+        self._snapshot = None
+        self._snapshot_time = 0
 
     def get_adapter_id(self, ho=None):
         ho = self._ho if not ho else ho
@@ -114,6 +117,34 @@ class AdapterBase:
         """
         self.app.server.emit("beamline_value_change", self.dict(), namespace="/hwr")
 
+    def _update_snapshot(self, **kwargs):
+        """
+        Updates the keys given in kwargs of the last dictionary representation
+        (snapshot), used from signal handlers to keep the snapshot up to date
+        without reading the hardware. The age of the snapshot is not reset,
+        the other keys (i.e state, limits) are as old as the last full read.
+        """
+        if self._snapshot is not None:
+            self._snapshot.update(kwargs)
+
+    def unavailable_dict(self, msg=""):
+        """
+        Dictionary representation used when the hardware object can't be read.
+        Args:
+            msg (str): Message describing why the object is unavailable
+        Returns:
+            (dict): The dictionary.
+        """
+        return {
+            "name": self._name,
+            "state": "UNKNOWN",
+            "msg": msg,
+            "type": "FLOAT",
+            "available": False,
+            "readonly": False,
+            "attributes": {},
+        }
+
     def _dict_repr(self):
         """
         Dictionary representation of the hardware object.
@@ -136,16 +167,7 @@ class AdapterBase:
             # Return a default representation if there is a problem retrieving
             # any of the attributes
             self._available = False
-
-            data = {
-                "name": self._name,
-                "state": "UNKNOWN",
-                "msg": "Exception: %s" % str(ex),
-                "type": "FLOAT",
-                "available": self.available(),
-                "readonly": False,
-                "attributes": {}
-            }
+            data = AdapterBase.unavailable_dict(self, "Exception: %s" % str(ex))
 
             logging.getLogger("MX3.HWR").exception(
                 f"Failed to get dictionary representation of {self._name}"
@@ -157,7 +179,44 @@ class AdapterBase:
         return HOModel(**self._dict_repr())
 
     def dict(self):
-        return self.data().dict()
+        """
+        Dictionary representation read from the hardware object, the result is
+        kept as snapshot.
+        Returns:
+            (dict): The dictionary.
+        """
+        data = self.data().dict()
+        self._snapshot = data
+        self._snapshot_time = time.time()
+
+        return dict(data)
+
+    def snapshot(self, max_age=None):
+        """
+        Dictionary representation kept up to date by the signals of the
+        hardware object, read from the hardware object if there is no snapshot
+        or if it is older than max_age.
+        Args:
+            max_age (float): Maximum age of the snapshot [s], None for no limit
+        Returns:
+            (dict): The dictionary.
+        """
+        if self.snapshot_expired(max_age):
+            return self.dict()
+
+        return dict(self._snapshot)
+
+    def snapshot_expired(self, max_age=None):
+        """
+        Args:
+            max_age (float): Maximum age of the snapshot [s], None for no limit
+        Returns:
+            (bool): True if there is no snapshot or if it was read from the
+                    hardware object more than max_age ago
+        """
+        return self._snapshot is None or (
+            max_age is not None and time.time() - self._snapshot_time > max_age
+        )
 
 
 class ActuatorAdapterBase(AdapterBase):
@@ -184,6 +243,7 @@ class ActuatorAdapterBase(AdapterBase):
         socketIO.
         """
         data = {"name": self._name, "value": args[0]}
+        self._update_snapshot(value=args[0])
         self.app.server.emit("beamline_value_change", data, namespace="/hwr")
 
     # Abstract method
@@ -242,6 +302,12 @@ class ActuatorAdapterBase(AdapterBase):
         except (AttributeError, TypeError):
             raise ValueError("Could not get limits")
 
+    def unavailable_dict(self, msg=""):
+        data = super(ActuatorAdapterBase, self).unavailable_dict(msg)
+        data.update({"value": 0, "limits": (0, 0)})
+
+        return data
+
     def _dict_repr(self):
         """Dictionary representation of the hardware object.
         Returns:
@@ -1,8 +1,11 @@
+from mxcubecore.HardwareObjects.abstract import AbstractBeam
+
 from mxcube3.core.adapter.adapter_base import ActuatorAdapterBase
-from mxcube3.core.util.adapterutils import export
+from mxcube3.core.util.adapterutils import adapts, export
 from mxcube3.core.models.adaptermodels import HOBeamModel, HOBeamValueModel
 
 
+@adapts(AbstractBeam.AbstractBeam)
 class BeamAdapter(ActuatorAdapterBase):
     def __init__(self, ho, *args, **kwargs):
         super(BeamAdapter, self).__init__(ho, *args, **kwargs)
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 import logging
 
+import gevent
+import gevent.pool
+
 BEAMLINE_ADAPTER = None
 
 # Singleton like interface is needed to keep the same referance to the
@@ -41,20 +44,69 @@ class _BeamlineAdapter:
     def get_object(self, name):
         return self.get_attr_from_path(name)
 
-    def dict(self):
+    def dict(self, max_age=None, timeout=None, concurrency=10):
         """
-        Build dictionary value-representation for each beamline attribute
+        Build dictionary value-representation for each beamline attribute,
+        from the snapshot kept by each adapter.
+         Args:
+           max_age (float): Maximum age of the snapshots [s], older snapshots
+                            are read from the hardware. None for no limit
+           timeout (float): Time to wait for each adapter read from the
+                            hardware [s], None to wait indefinitely
+           concurrency (int): Maximum number of adapters read concurrently
          Returns:
            (dict): The dictionary.
         """
         attributes = {}
+        expired = []
 
         for attr_name in self.app.mxcubecore.adapter_dict:
-            _d = self.app.mxcubecore.get_adapter(attr_name).dict()
-            attributes.update({attr_name: _d})
+            adapter = self.app.mxcubecore.get_adapter(attr_name)
+
+            if adapter.snapshot_expired(max_age):
+                expired.append(attr_name)
+            else:
+                attributes[attr_name] = adapter.snapshot()
+
+        attributes.update(self._read_adapters(expired, timeout, concurrency))
+
+        # Keep the order of adapter_dict
+        attributes = {
+            attr_name: attributes[attr_name]
+            for attr_name in self.app.mxcubecore.adapter_dict
+        }
 
         return {"attributes": attributes}
 
+    def _read_adapters(self, attr_names, timeout=None, concurrency=10):
+        """
+        Read the dictionary representation of several adapters from the
+        hardware concurrently, adapters not read within timeout are reported
+        as unavailable.
+         Args:
+           attr_names (list): Names of the adapters to read
+           timeout (float): Time to wait for each adapter [s], None to wait
+                            indefinitely
+           concurrency (int): Maximum number of adapters read concurrently
+         Returns:
+           (dict): attribute name: dictionary representation
+        """
+
+        def _read(attr_name):
+            adapter = self.app.mxcubecore.get_adapter(attr_name)
+
+            try:
+                with gevent.Timeout(timeout):
+                    return attr_name, adapter.dict()
+            except gevent.Timeout:
+                msg = "Timeout after %s s reading %s" % (timeout, attr_name)
+                logging.getLogger("MX3.HWR").warning(msg)
+                return attr_name, adapter.unavailable_dict(msg)
+
+        pool = gevent.pool.Pool(max(1, concurrency))
+
+        return dict(pool.imap_unordered(_read, attr_names))
+
     def get_available_methods(self):
         """
         Get the available methods.
@@ -1,10 +1,13 @@
 import logging
 
 from mxcubecore.BaseHardwareObjects import HardwareObjectState
+from mxcubecore.HardwareObjects import DataPublisher
 
 from mxcube3.core.adapter.adapter_base import AdapterBase
+from mxcube3.core.util.adapterutils import adapts
 
 
+@adapts(DataPublisher.DataPublisher)
 class DataPublisherAdapter(AdapterBase):
     def __init__(self, ho, *args, **kwargs):
         """
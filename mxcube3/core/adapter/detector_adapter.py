@@ -1,7 +1,11 @@
+from mxcubecore.HardwareObjects.abstract import AbstractDetector
+
 from mxcube3.core.adapter.adapter_base import AdapterBase
 from mxcube3.core.adapter.motor_adapter import MotorAdapter
+from mxcube3.core.util.adapterutils import adapts
 
 
+@adapts(AbstractDetector.AbstractDetector)
 class DetectorAdapter(AdapterBase):
     def __init__(self, ho, *args, **kwargs):
         """
@@ -1,6 +1,10 @@
+from mxcubecore.HardwareObjects import MiniDiff, GenericDiffractometer
+
 from mxcube3.core.adapter.adapter_base import AdapterBase
+from mxcube3.core.util.adapterutils import adapts
 
 
+@adapts(MiniDiff.MiniDiff, GenericDiffractometer.GenericDiffractometer)
 class DiffractometerAdapter(AdapterBase):
     def __init__(self, ho, *args, **kwargs):
         """
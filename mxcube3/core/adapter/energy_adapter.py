@@ -1,7 +1,11 @@
+from mxcubecore.HardwareObjects.abstract import AbstractEnergy
+
 from mxcube3.core.adapter.actuator_adapter import ActuatorAdapter
 from mxcube3.core.adapter.wavelength_adapter import WavelengthAdapter
+from mxcube3.core.util.adapterutils import adapts
 
 
+@adapts(AbstractEnergy.AbstractEnergy)
 class EnergyAdapter(ActuatorAdapter):
     """
     Adapter for Energy Hardware Object, a web socket is used to communicate
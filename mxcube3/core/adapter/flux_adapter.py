@@ -3,7 +3,7 @@ from decimal import Decimal
 from mxcubecore.BaseHardwareObjects import HardwareObjectState
 
 from mxcube3.core.adapter.adapter_base import ActuatorAdapterBase
-from mxcube3.core.util.networkutils import RateLimited
+from mxcube3.core.util.networkutils import Throttled
 
 
 class FluxAdapter(ActuatorAdapterBase):
@@ -21,7 +21,7 @@ class FluxAdapter(ActuatorAdapterBase):
         except BaseException:
             pass
 
-    @RateLimited(6)
+    @Throttled(6)
     def _value_change(self, value, **kwargs):
         value = "{:.2E}".format(Decimal(self._ho.get_value()))
         self.value_change(value, **kwargs)
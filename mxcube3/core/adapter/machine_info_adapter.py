@@ -1,10 +1,13 @@
 from mxcubecore.BaseHardwareObjects import HardwareObjectState
+from mxcubecore.HardwareObjects.abstract import AbstractMachineInfo
 
 from mxcube3.core.adapter.adapter_base import ActuatorAdapterBase
+from mxcube3.core.util.adapterutils import adapts
 from mxcube3.core.models.adaptermodels import HOModel, HOMachineInfoModel, HOActuatorValueChangeModel
-from mxcube3.core.util.networkutils import RateLimited
+from mxcube3.core.util.networkutils import Throttled
 
 
+@adapts(AbstractMachineInfo.AbstractMachineInfo)
 class MachineInfoAdapter(ActuatorAdapterBase):
     def __init__(self, ho, *args, **kwargs):
         """
@@ -18,7 +21,7 @@ class MachineInfoAdapter(ActuatorAdapterBase):
     def _set_value(self, value):
         pass
 
-    @RateLimited(0.1)
+    @Throttled(0.1)
     def _value_change(self, *args, **kwargs):
         self.value_change(self.get_value(), **kwargs)
 
@@ -1,9 +1,13 @@
+from mxcubecore.HardwareObjects.abstract import AbstractMotor
+
 from mxcube3.core.adapter.adapter_base import ActuatorAdapterBase
-from mxcube3.core.util.networkutils import RateLimited
+from mxcube3.core.util.adapterutils import adapts
+from mxcube3.core.util.networkutils import Throttled
 
 from mxcube3.core.models.adaptermodels import HOActuatorValueChangeModel, FloatValueModel
 
 
+@adapts(AbstractMotor.AbstractMotor)
 class MotorAdapter(ActuatorAdapterBase):
     def __init__(self, ho, *args, **kwargs):
         """
@@ -14,7 +18,7 @@ class MotorAdapter(ActuatorAdapterBase):
         ho.connect("valueChanged", self._value_change)
         ho.connect("stateChanged", self.state_change)
 
-    @RateLimited(6)
+    @Throttled(6)
     def _value_change(self, *args, **kwargs):
         self.value_change(*args, **kwargs)
 
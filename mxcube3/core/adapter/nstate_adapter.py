@@ -1,10 +1,14 @@
 from enum import Enum
 import logging
 
+from mxcubecore.HardwareObjects.abstract import AbstractNState, AbstractShutter
+
 from mxcube3.core.adapter.adapter_base import ActuatorAdapterBase
+from mxcube3.core.util.adapterutils import adapts
 from mxcube3.core.models.adaptermodels import NStateModel, HOActuatorValueChangeModel, StrValueModel
 
 
+@adapts(AbstractNState.AbstractNState, AbstractShutter.AbstractShutter)
 class NStateAdapter(ActuatorAdapterBase):
     def __init__(self, ho, *args, **kwargs):
         """
@@ -1,5 +1,5 @@
 from mxcube3.core.adapter.adapter_base import ActuatorAdapterBase
-from mxcube3.core.util.networkutils import RateLimited
+from mxcube3.core.util.networkutils import Throttled
 
 from mxcube3.core.models.adaptermodels import FloatValueModel, HOActuatorValueChangeModel
 
@@ -24,7 +24,7 @@ class WavelengthAdapter(ActuatorAdapterBase):
         except BaseException:
             pass
 
-    @RateLimited(6)
+    @Throttled(6)
     def _value_change(self, pos, wl, *args, **kwargs):
         self.value_change(wl)
 
@@ -172,7 +172,11 @@ class Beamline(ComponentBase):
 
     def beamline_get_all_attributes(self):
         ho = BeamlineAdapter(HWR.beamline)
-        data = ho.dict()
+        data = ho.dict(
+            self.app.CONFIG.app.adapter_snapshot_max_age,
+            self.app.CONFIG.app.adapter_read_timeout,
+            self.app.CONFIG.app.adapter_read_concurrency,
+        )
         actions = list()
 
         try:
@@ -74,7 +74,9 @@ class Lims(ComponentBase):
 
         for loc, data in self.app.SAMPLE_LIST["sampleList"].items():
             if loc in current_queue:
-                sample = current_queue[loc]
+                # The queue sample is shared with the queue dictionary cache
+                # and is modified below and added to the sample list
+                sample = dict(current_queue[loc])
 
                 # Don't synchronize, lims attributes from queue sample, if
                 # they are already set by sc or lims
@@ -93,6 +95,7 @@ class Lims(ComponentBase):
 
                 # Make sure that sample in queue is updated with lims information
                 model, entry = self.app.queue.get_entry(sample["queueID"])
+                old_attrs = self._queue_sample_attrs(model)
                 model.set_from_dict(data)
 
                 # Update sample location, location is Manual for free pin mode
@@ -100,8 +103,22 @@ class Lims(ComponentBase):
                 model.loc_str = data.get("sampleID", -1)
                 model.free_pin_mode = data.get("location", "") == "Manual"
 
+                if old_attrs != self._queue_sample_attrs(model):
+                    self.app.queue.invalidate_queue_dict(model)
+
                 self.sample_list_update_sample(loc, sample)
 
+    def _queue_sample_attrs(self, model):
+        # Attributes of the sample model that are part of the queue
+        # dictionary representation of the sample
+        return (
+            model.get_name(),
+            model.code,
+            model.crystals[0].protein_acronym,
+            model.loc_str,
+            model.free_pin_mode,
+        )
+
     def sample_list_update_sample(self, loc, sample):
         _sample = self.app.SAMPLE_LIST["sampleList"].get(loc, {})
 
@@ -1,8 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
 import json
-import pickle as pickle
-import redis
 import itertools
 import logging
 import re
@@ -20,6 +18,7 @@ from mxcubecore.HardwareObjects.base_queue_entry import QUEUE_ENTRY_STATUS
 from mxcubecore.HardwareObjects.Gphl import GphlQueueEntry
 
 from mxcube3.core.components.component_base import ComponentBase
+from mxcube3.core.util.queuestore import RedisQueueStore, create_queue_store
 
 from functools import reduce
 
@@ -43,6 +42,14 @@ ORIGIN_MX3 = "MX3"
 class Queue(ComponentBase):
     def __init__(self, app, config):
         super().__init__(app, config)
+        # Dictionary representation (without LIMS data) of each node, keyed
+        # by node_id, see _node_to_dict
+        self._node_dict_cache = {}
+        # Position of each task node within its sample, keyed by node_id
+        # with values (sample_node, index), see node_index
+        self._node_positions = {}
+        # Created on first save or load, see get_queue_store
+        self._queue_store = None
 
     def build_prefix_path_dict(self, path_list):
         prefix_path_dict = {}
@@ -94,24 +101,19 @@ class Queue(ComponentBase):
             sample = node.loc_str
         # TaskGroup just return the sampleID
         elif node.get_parent():
-            # NB under GPhL workflow, nodes do not have predictable distance
-            # to their sample node
-            sample_model = node.get_sample_node()
+            position = self._node_positions.get(node._node_id, None)
+
+            if position is None:
+                # NB under GPhL workflow, nodes do not have predictable distance
+                # to their sample node
+                sample_model = node.get_sample_node()
+                self._index_sample_node(sample_model)
+                position = self._node_positions.get(
+                    node._node_id, (sample_model, None)
+                )
 
+            sample_model, index = position
             sample = sample_model.loc_str
-            task_groups = sample_model.get_children()
-            tlist = []
-
-            for group in task_groups:
-                if group.interleave_num_images:
-                    tlist.append(group)
-                else:
-                    tlist.extend(group.get_children())
-
-            try:
-                index = tlist.index(node)
-            except Exception:
-                pass
 
         return {
             "sample": sample,
@@ -120,6 +122,60 @@ class Queue(ComponentBase):
             "sample_node": sample_model,
         }
 
+    def _index_sample_node(self, sample_model):
+        """
+        Indexes the position of all the nodes belonging to sample <sample_model>.
+        Tasks are indexed in the order they appear in the sample, interleaved
+        collections (TaskGroup) counting as one task. Other nodes in the
+        sample sub tree are indexed with position None.
+
+        :param Sample sample_model: Sample to index
+        """
+        node_list = list(sample_model.get_children())
+
+        while node_list:
+            _node = node_list.pop()
+            self._node_positions[_node._node_id] = (sample_model, None)
+            node_list.extend(_node.get_children())
+
+        index = 0
+
+        for group in sample_model.get_children():
+            if group.interleave_num_images:
+                tlist = [group]
+            else:
+                tlist = group.get_children()
+
+            for task in tlist:
+                self._node_positions[task._node_id] = (sample_model, index)
+                index += 1
+
+    def invalidate_node_index(self, node=None):
+        """
+        Invalidates the positions of the nodes belonging to the same sample
+        as <node>, they are re-indexed the next time node_index is called.
+        Needs to be called when tasks are added, removed or re-ordered.
+
+        :param TaskNode node: Node that was added, removed or moved, the
+                              entire index is invalidated if nothing is passed.
+        """
+        if node is None or isinstance(node, qmo.RootNode):
+            self._node_positions.clear()
+            return
+
+        sample_node = node if isinstance(node, qmo.Sample) else node.get_sample_node()
+
+        if sample_node is None:
+            self._node_positions.clear()
+            return
+
+        node_list = list(sample_node.get_children())
+
+        while node_list:
+            _node = node_list.pop()
+            self._node_positions.pop(_node._node_id, None)
+            node_list.extend(_node.get_children())
+
     def load_queue_from_dict(self, queue_dict):
         """
         Loads the queue in queue_dict in to the current HWR.beamline.queue_model (HWR.beamline.queue_model)
@@ -158,7 +214,9 @@ class Queue(ComponentBase):
                 where the contents of task is a dictionary, the content depends on
                 the TaskNode type (DataCollection, Chracterisation, Sample). The
                 task dict can be directly used with the set_from_dict methods of
-                the corresponding node.
+                the corresponding node. The sample and task dictionaries are
+                shared with the cache (see _node_to_dict), copy them before
+                modifying them.
         """
         if not node:
             node = HWR.beamline.queue_model.get_model_root()
@@ -171,6 +229,33 @@ class Queue(ComponentBase):
 
         return res
 
+    def invalidate_queue_dict(self, node=None):
+        """
+        Invalidates the cached dictionary representation of <node> so that
+        it is re-created by the next call to queue_to_dict. The representation
+        of a task depends on its siblings (taskIndex) and the one of a sample
+        on its tasks (state), so the entire sample sub tree is invalidated.
+
+        :param TaskNode node: Node that changed, the entire cache is
+                              invalidated if nothing is passed.
+        """
+        if node is None or isinstance(node, qmo.RootNode):
+            self._node_dict_cache.clear()
+            return
+
+        sample_node = node if isinstance(node, qmo.Sample) else node.get_sample_node()
+
+        if sample_node is None:
+            self._node_dict_cache.clear()
+            return
+
+        node_list = [sample_node]
+
+        while node_list:
+            _node = node_list.pop()
+            self._node_dict_cache.pop(_node._node_id, None)
+            node_list.extend(_node.get_children())
+
     def queue_to_json(self, node=None, include_lims_data=False):
         """
         Returns the json representation of the queue
@@ -274,6 +359,26 @@ class Queue(ComponentBase):
 
         return res
 
+    def _lims_result_data(self, node_id, include_lims_data=False):
+        """
+        :param int node_id: Node id of the task
+        :param bool include_lims_data: Get the results of the task from LIMS
+        :returns: Dictionary with the LIMS results (if asked for) and the link
+                  to the task in LIMS
+        """
+        limsres = {}
+        lims_id = self.app.NODE_ID_TO_LIMS_ID.get(node_id, "null")
+
+        # Only add data from lims if explicitly asked for, since
+        # its a operation that can take some time.
+        if include_lims_data and HWR.beamline.lims.lims_rest:
+            limsres = HWR.beamline.lims.lims_rest.get_dc(lims_id)
+
+        # Always add link to data, (no request made)
+        limsres["limsTaskLink"] = self.app.lims.get_dc_link(lims_id)
+
+        return limsres
+
     def _handle_dc(self, sample_node, node, include_lims_data=False):
         parameters = node.as_dict()
         parameters["shape"] = getattr(node, "shape", "")
@@ -302,16 +407,7 @@ class Queue(ComponentBase):
             parameters["path"], parameters["fileName"]
         )
 
-        limsres = {}
-        lims_id = self.app.NODE_ID_TO_LIMS_ID.get(node._node_id, "null")
-
-        # Only add data from lims if explicitly asked for, since
-        # its a operation that can take some time.
-        if include_lims_data and HWR.beamline.lims.lims_rest:
-            limsres = HWR.beamline.lims.lims_rest.get_dc(lims_id)
-
-        # Always add link to data, (no request made)
-        limsres["limsTaskLink"] = self.app.lims.get_dc_link(lims_id)
+        limsres = self._lims_result_data(node._node_id, include_lims_data)
 
         res = {
             "label": "Data Collection",
@@ -356,16 +452,7 @@ class Queue(ComponentBase):
             parameters["directory"], parameters["fileName"]
         )
 
-        limsres = {}
-        lims_id = self.app.NODE_ID_TO_LIMS_ID.get(node._node_id, "null")
-
-        # Only add data from lims if explicitly asked for, since
-        # its a operation that can take some time.
-        if include_lims_data and HWR.beamline.lims.lims_rest:
-            limsres = HWR.beamline.lims.lims_rest.get_dc(lims_id)
-
-        # Always add link to data, (no request made)
-        limsres["limsTaskLink"] = self.app.lims.get_dc_link(lims_id)
+        limsres = self._lims_result_data(node._node_id, include_lims_data)
 
         res = {
             "label": parameters["label"],
@@ -405,16 +492,7 @@ class Queue(ComponentBase):
             parameters["path"], parameters["fileName"]
         )
 
-        limsres = {}
-        lims_id = self.app.NODE_ID_TO_LIMS_ID.get(node._node_id, "null")
-
-        # Only add data from lims if explicitly asked for, since
-        # its a operation that can take some time.
-        if include_lims_data and HWR.beamline.lims.lims_rest:
-            limsres = HWR.beamline.lims.lims_rest.get_dc(lims_id)
-
-        # Always add link to data, (no request made)
-        limsres["limsTaskLink"] = self.app.lims.get_dc_link(lims_id)
+        limsres = self._lims_result_data(node._node_id, include_lims_data)
 
         res = {
             "label": parameters["label"],
@@ -516,16 +594,7 @@ class Queue(ComponentBase):
         queueID = node._node_id
         enabled, state = self.get_node_state(queueID)
 
-        limsres = {}
-        lims_id = self.app.NODE_ID_TO_LIMS_ID.get(node._node_id, "null")
-
-        # Only add data from lims if explicitly asked for, since
-        # its a operation that can take some time.
-        if include_lims_data and HWR.beamline.lims.lims_rest:
-            limsres = HWR.beamline.lims.lims_rest.get_dc(lims_id)
-
-        # Always add link to data, (no request made)
-        limsres["limsTaskLink"] = self.app.lims.get_dc_link(lims_id)
+        limsres = self._lims_result_data(node._node_id, include_lims_data)
 
         originID, task = self._handle_diffraction_plan(node, sample_node)
 
@@ -655,39 +724,97 @@ class Queue(ComponentBase):
             node_list = node.get_children()
 
         for node in node_list:
-            # NB under GPhL workflow, nodes do not have predictable distance
-            # to their sample node
-            sample_node = node.get_sample_node()
+            node_dict = self._node_to_dict(node, include_lims_data)
+
             if isinstance(node, qmo.Sample):
                 if len(result) == 0:
                     result = [{"sample_order": []}]
 
-                result.append(self._handle_sample(node, include_lims_data))
+                result.append(node_dict)
 
                 if node.is_enabled():
                     result[0]["sample_order"].append(node.loc_str)
-
-            elif isinstance(node, qmo.Characterisation):
-                result.append(self._handle_char(sample_node, node, include_lims_data))
-            elif isinstance(node, qmo.DataCollection):
-                result.append(self._handle_dc(sample_node, node, include_lims_data))
-            elif isinstance(node, qmo.Workflow):
-                result.append(self._handle_wf(sample_node, node, include_lims_data))
-            elif isinstance(node, qmo.GphlWorkflow):
-                result.append(
-                    self._handle_gphl_wf(sample_node, node, include_lims_data)
-                )
-            elif isinstance(node, qmo.XRFSpectrum):
-                result.append(self._handle_xrf(sample_node, node))
-            elif isinstance(node, qmo.EnergyScan):
-                result.append(self._handle_energy_scan(sample_node, node))
-            elif isinstance(node, qmo.TaskGroup) and node.interleave_num_images:
-                result.append(self._handle_interleaved(sample_node, node))
+            elif node_dict is not None:
+                result.append(node_dict)
             else:
                 result.extend(self.queue_to_dict_rec(node, include_lims_data))
 
         return result
 
+    def _node_to_dict(self, node, include_lims_data=False):
+        """
+        Cached dictionary representation of a single node, see
+        invalidate_queue_dict. The representation is cached without LIMS
+        data, the LIMS results change without the node changing and are
+        added to a copy of the task dictionaries on each call.
+
+        :param TaskNode node: The node to get the representation for
+        :returns: The representation or None if the node is a container
+                  (i.e TaskGroup) without representation. Dictionaries may be
+                  shared with the cache, callers modifying them must copy them
+        """
+        node_dict = self._node_dict_cache.get(node._node_id, None)
+
+        if node_dict is None:
+            node_dict = self._handle_node(node)
+
+            if node_dict is None:
+                return None
+
+            self._node_dict_cache[node._node_id] = node_dict
+
+        if include_lims_data and HWR.beamline.lims.lims_rest:
+            if isinstance(node, qmo.Sample):
+                node_dict = {
+                    loc: dict(
+                        sample,
+                        tasks=[self._with_lims_data(task) for task in sample["tasks"]],
+                    )
+                    for loc, sample in node_dict.items()
+                }
+            else:
+                node_dict = self._with_lims_data(node_dict)
+
+        return node_dict
+
+    def _with_lims_data(self, task):
+        """
+        :param dict task: Dictionary representation of a task
+        :returns: Copy of task with the results from LIMS, task itself if it
+                  has no LIMS results (i.e energy scans)
+        """
+        if "limsResultData" not in task:
+            return task
+
+        return dict(
+            task, limsResultData=self._lims_result_data(task["queueID"], True)
+        )
+
+    def _handle_node(self, node, include_lims_data=False):
+        # NB under GPhL workflow, nodes do not have predictable distance
+        # to their sample node
+        sample_node = node.get_sample_node()
+        res = None
+
+        if isinstance(node, qmo.Sample):
+            res = self._handle_sample(node, include_lims_data)
+        elif isinstance(node, qmo.Characterisation):
+            res = self._handle_char(sample_node, node, include_lims_data)
+        elif isinstance(node, qmo.DataCollection):
+            res = self._handle_dc(sample_node, node, include_lims_data)
+        elif isinstance(node, qmo.Workflow):
+            res = self._handle_wf(sample_node, node, include_lims_data)
+        elif isinstance(node, qmo.GphlWorkflow):
+            res = self._handle_gphl_wf(sample_node, node, include_lims_data)
+        elif isinstance(node, qmo.XRFSpectrum):
+            res = self._handle_xrf(sample_node, node)
+        elif isinstance(node, qmo.EnergyScan):
+            res = self._handle_energy_scan(sample_node, node)
+        elif isinstance(node, qmo.TaskGroup) and node.interleave_num_images:
+            res = self._handle_interleaved(sample_node, node)
+
+        return res
+
     def queue_exec_state(self):
         """
         :returns: The queue execution state, one of QUEUE_STOPPED, QUEUE_PAUSED
@@ -719,6 +846,7 @@ class Queue(ComponentBase):
         model, entry = self.get_entry(qid)
         model.set_enabled(enabled)
         entry.set_enabled(enabled)
+        self.invalidate_queue_dict(model)
 
     def delete_entry(self, entry):
         """
@@ -727,6 +855,8 @@ class Queue(ComponentBase):
         parent_entry = entry.get_container()
         parent_entry.dequeue(entry)
         model = entry.get_data_model()
+        self.invalidate_queue_dict(model)
+        self.invalidate_node_index(model)
         HWR.beamline.queue_model.del_child(model.get_parent(), model)
         logging.getLogger("MX3.HWR").info("[QUEUE] is:\n%s " % self.queue_to_json())
 
@@ -761,13 +891,16 @@ class Queue(ComponentBase):
         :param bool flag: True for enabled False for disabled
         """
         if isinstance(id_or_qentry, qe.BaseQueueEntry):
+            model = id_or_qentry.get_data_model()
             id_or_qentry.set_enabled(flag)
-            id_or_qentry.get_data_model().set_enabled(flag)
+            model.set_enabled(flag)
         else:
             model, entry = self.get_entry(id_or_qentry)
             entry.set_enabled(flag)
             model.set_enabled(flag)
 
+        self.invalidate_queue_dict(model)
+
     def swap_task_entry(self, sid, ti1, ti2):
         """
         Swaps order of two queue entries in the queue, with the same sample <sid>
@@ -792,6 +925,9 @@ class Queue(ComponentBase):
         sentry._queue_entry_list[ti2] = sentry._queue_entry_list[ti1]
         sentry._queue_entry_list[ti1] = ti2_temp_entry
 
+        self.invalidate_queue_dict(smodel)
+        self.invalidate_node_index(smodel)
+
         logging.getLogger("MX3.HWR").info("[QUEUE] is:\n%s " % self.queue_to_json())
 
     def move_task_entry(self, sid, ti1, ti2):
@@ -814,6 +950,9 @@ class Queue(ComponentBase):
         # Swap queue entry order
         sentry._queue_entry_list.insert(ti2, sentry._queue_entry_list.pop(ti1))
 
+        self.invalidate_queue_dict(smodel)
+        self.invalidate_node_index(smodel)
+
         logging.getLogger("MX3.HWR").info("[QUEUE] is:\n%s " % self.queue_to_json())
 
     def set_sample_order(self, order):
@@ -1605,15 +1744,30 @@ class Queue(ComponentBase):
         HWR.beamline.queue_model.clear_model("free-pin")
         HWR.beamline.queue_model.clear_model("plate")
         HWR.beamline.queue_model.select_model("ispyb")
+        self.invalidate_queue_dict()
+        self.invalidate_node_index()
+
+    def get_queue_store(self):
+        """
+        :returns: QueueStore configured in queue_store of the application
+                  configuration
+        """
+        if self._queue_store is None:
+            config = self.app.CONFIG.app.queue_store
+            self._queue_store = create_queue_store(
+                config.backend, config.path, config.format
+            )
 
-    def save_queue(self, session, redis=redis.Redis()):
+        return self._queue_store
+
+    def save_queue(self, session, store=None):
         """
-        Saves the current HWR.beamline.queue_model (HWR.beamline.queue_model) into a redis database.
-        The queue that is saved is the pickled result returned by queue_to_dict
+        Saves the current HWR.beamline.queue_model into the queue store, the
+        result of queue_to_dict is saved under the proposal of the current
+        user. Only the samples changed since the previous save are written.
 
         :param session: Session to save queue for
-        :param redis: Redis database
-
+        :param QueueStore store: Store to save to, defaults to get_queue_store()
         """
         proposal_id = getattr(current_user, "proposal", None)
 
@@ -1621,21 +1775,35 @@ class Queue(ComponentBase):
             # List of samples dicts (containing tasks) sample and tasks have same
             # order as the in queue HO
             queue = self.queue_to_dict(HWR.beamline.queue_model.get_model_root())
-            redis.set("self.app.queue:%d" % proposal_id, pickle.dumps(queue))
+            store = store or self.get_queue_store()
 
-    def load_queue(self, session, redis=redis.Redis()):
+            # Not saving the queue must not prevent signing out
+            try:
+                store.save("queue:%s" % proposal_id, queue)
+            except Exception:
+                logging.getLogger("MX3.HWR").exception(
+                    "Could not save the queue of proposal %s" % proposal_id
+                )
+
+    def load_queue(self, session, store=None):
         """
-        Loads the queue belonging to session <session> into redis db <redis>
+        Loads the queue belonging to session <session> from the queue store
 
         :param session: Session for queue to load
-        :param redis: Redis database
+        :param QueueStore store: Store to load from, defaults to get_queue_store()
         """
         proposal_id = getattr(current_user, "proposal", None)
 
         if proposal_id is not None:
-            serialized_queue = redis.get("self.app.queue:%d" % proposal_id)
-            queue = pickle.loads(serialized_queue)
-            self.load_queue_from_dict(queue)
+            store = store or self.get_queue_store()
+            queue = store.load("queue:%s" % proposal_id)
+
+            # Saved by previous versions
+            if queue is None and isinstance(store, RedisQueueStore):
+                queue = store.load_pickled("self.app.queue:%s" % proposal_id)
+
+            if queue:
+                self.load_queue_from_dict(queue)
 
     def queue_model_child_added(self, parent, child):
         """
@@ -1644,6 +1812,9 @@ class Queue(ComponentBase):
         added. Handels for instance the addition of reference collections for
         characterisations and workflows.
         """
+        self.invalidate_queue_dict(parent)
+        self.invalidate_node_index(parent)
+
         parent_model, parent_entry = self.get_entry(parent._node_id)
         child_model, child_entry = self.get_entry(child._node_id)
 
@@ -1691,6 +1862,7 @@ class Queue(ComponentBase):
                 parent_entry.enqueue(entry)
 
     def queue_model_diff_plan_available(self, char, collection_list):
+        self.invalidate_queue_dict(char)
         cols = []
         for collection in collection_list:
             if isinstance(collection, qmo.DataCollection):
@@ -1824,6 +1996,26 @@ class Queue(ComponentBase):
             queue, "diff_plan_available", self.queue_model_diff_plan_available
         )
 
+        # The state of the nodes are part of their dictionary representation,
+        # so the cached representation is invalidated when the state changes
+        HWR.beamline.queue_manager.connect(
+            "queue_entry_execute_started", self.queue_entry_state_changed
+        )
+
+        HWR.beamline.queue_manager.connect(
+            "queue_entry_execute_finished", self.queue_entry_state_changed
+        )
+
+        HWR.beamline.queue_manager.connect(
+            "queue_execute_started", self.queue_state_changed
+        )
+
+        HWR.beamline.queue_manager.connect(
+            "queue_execution_finished", self.queue_state_changed
+        )
+
+        HWR.beamline.queue_manager.connect("queue_stopped", self.queue_state_changed)
+
         HWR.beamline.queue_manager.connect(
             "queue_execute_started", signals.queue_execution_started
         )
@@ -1866,6 +2058,24 @@ class Queue(ComponentBase):
             "energy_scan_finished", signals.energy_scan_finished
         )
 
+    def queue_entry_state_changed(self, entry, *args):
+        """
+        Listen to execution state changes of queue entries and invalidates
+        the cached dictionary representation of the corresponding node.
+        """
+        model = entry.get_data_model()
+
+        if model is not None:
+            self.invalidate_queue_dict(model)
+
+    def queue_state_changed(self, *args):
+        """
+        Listen to execution state changes of the queue, the running state
+        of all nodes might have changed so the entire cached dictionary
+        representation is invalidated.
+        """
+        self.invalidate_queue_dict()
+
     def enable_sample_entries(self, sample_id_list, flag):
         current_queue = self.queue_to_dict()
 
@@ -1889,7 +2099,29 @@ class Queue(ComponentBase):
         """
         return self.app.AUTO_MOUNT_SAMPLE
 
-    def get_task_progress(self, node, pdata):
+    def get_task_num_images(self, node):
+        """
+        :param node: Task node
+
+        :returns: Total number of images collected by the task
+        """
+        if isinstance(node, qmo.Characterisation):
+            dc = node.reference_image_collection
+            total = float(dc.acquisitions[0].acquisition_parameters.num_images) * 2
+        else:
+            total = float(node.acquisitions[0].acquisition_parameters.num_images)
+
+        return total
+
+    def get_task_progress(self, node, pdata, num_images=None):
+        """
+        :param node: Task node
+        :param pdata: Progress data, the current frame or for interleaved
+                      collections a dictionary with sub wedge information
+        :param num_images: Total number of images, if already known
+
+        :returns: Progress of task (0-1)
+        """
         progress = 0
 
         if node.is_executed():
@@ -1900,12 +2132,8 @@ class Queue(ComponentBase):
                 * pdata["sw_size"]
                 / float(pdata["nitems"] * pdata["sw_size"])
             )
-        elif isinstance(node, qmo.Characterisation):
-            dc = node.reference_image_collection
-            total = float(dc.acquisitions[0].acquisition_parameters.num_images) * 2
-            progress = pdata / total
         else:
-            total = float(node.acquisitions[0].acquisition_parameters.num_images)
+            total = num_images if num_images else self.get_task_num_images(node)
             progress = pdata / total
 
         return progress
@@ -1975,6 +2203,7 @@ class Queue(ComponentBase):
                 qe.get_data_model().set_executed(True)
                 qe.get_data_model().set_enabled(False)
                 qe._execution_failed = True
+                self.invalidate_queue_dict(qe.get_data_model())
 
                 HWR.beamline.queue_manager._is_stopped = True
                 signals.queue_execution_stopped()
@@ -2038,6 +2267,8 @@ class Queue(ComponentBase):
         elif data["type"] == "Characterisation":
             self.set_char_params(model, entry, data, sample_model)
 
+        self.invalidate_queue_dict(model)
+
         logging.getLogger("MX3.HWR").info("[QUEUE] is:\n%s " % self.queue_to_json())
 
         return model
@@ -2058,6 +2289,7 @@ class Queue(ComponentBase):
             # TODO: update here the model with the new 'params'
             # missing lines...
             sample_entry.set_data_model(sample_node)
+            self.invalidate_queue_dict(sample_node)
             logging.getLogger("MX3.HWR").info("[QUEUE] sample updated")
         else:
             msg = "[QUEUE] Sample with id %s not in queue, can't update" % sid
@@ -2068,6 +2300,7 @@ class Queue(ComponentBase):
         node = HWR.beamline.queue_model.get_node(node_id)
         entry = HWR.beamline.queue_manager.get_entry_with_model(node)
         queue = self.queue_to_dict()
+        self.invalidate_queue_dict(node)
 
         if isinstance(entry, qe.SampleQueueEntry):
             # this is a sample entry, thus, go through its checked children and
@@ -4,14 +4,17 @@ import types
 import sys
 import os
 import inspect
+import time
 
-import PIL
 import gevent.event
 
-from io import StringIO
 import base64
 
 from mxcube3.core.util.convertutils import to_camel, from_camel
+from mxcube3.core.util.coordutils import ScreenToMotorCalibration
+from mxcube3.core.util.gridutils import GridResults
+from mxcube3.core.util.networkutils import Throttled
+from mxcube3.core.util.shapeutils import ShapeChangeTracker, ShapeIndex
 
 from mxcubecore.HardwareObjects.queue_entry import CENTRING_METHOD
 from mxcubecore.BaseHardwareObjects import HardwareObjectState
@@ -21,22 +24,45 @@ from mxcubecore.HardwareObjects.abstract.AbstractNState import AbstractNState
 from mxcubecore import HardwareRepository as HWR
 
 from mxcube3.core.components.component_base import ComponentBase
+from mxcube3.video import frameutils, streaming_processes
+from mxcube3.video.broadcaster import VariantBroadcaster
+from mxcube3.video.framebuffer import FrameBuffer
 
 
 SNAPSHOT_RECEIVED = gevent.event.Event()
 SNAPSHOT = None
+# Maximum age of a buffered camera frame used as snapshot [s]
+SNAPSHOT_MAX_FRAME_AGE = 0.5
 
 
 class SampleView(ComponentBase):
     def __init__(self, app, config):
         super().__init__(app, config)
-        self._sample_image = None
         self._click_count = 0
         self._click_limit = 3
         self._centring_point_id = None
+        self._video_stream = VariantBroadcaster(
+            {
+                name: (variant.scale, variant.quality)
+                for name, variant in app.CONFIG.app.video_stream_variants.items()
+            }
+        )
+        self._camera_connected = False
+        self._frame_buffer = None
+        self._shape_tracker = ShapeChangeTracker()
+        self._calibration = ScreenToMotorCalibration(self._centred_point_from_coord)
+        self._grid_results = {}
+        self._shape_index = ShapeIndex()
+        self._shape_index_time = None
+
+        if app.CONFIG.app.video_frame_buffer_size > 0:
+            self._frame_buffer = FrameBuffer(app.CONFIG.app.video_frame_buffer_size)
 
         enable_snapshots(
-            HWR.beamline.collect, HWR.beamline.diffractometer, HWR.beamline.sample_view
+            HWR.beamline.collect,
+            HWR.beamline.diffractometer,
+            HWR.beamline.sample_view,
+            self._frame_buffer,
         )
 
         HWR.beamline.sample_view.connect("shapesChanged", self._emit_shapes_updated)
@@ -47,19 +73,43 @@ class SampleView(ComponentBase):
             zoom_motor.connect("stateChanged", self._zoom_changed)
 
     def _zoom_changed(self, *args, **kwargs):
+        self._calibration.invalidate()
+        self._shape_index_time = None
         ppm = HWR.beamline.diffractometer.get_pixels_per_mm()
         self.app.server.emit(
             "update_pixels_per_mm", {"pixelsPerMm": ppm}, namespace="/hwr"
         )
 
     def _emit_shapes_updated(self):
+        """
+        Sends the shapes added, changed and deleted since the last update,
+        clients not having baseVersion fetch all shapes (get_shapes). The
+        shapesChanged signal does not tell which shapes changed, so all the
+        shapes are still converted (as_dict) and compared on each change,
+        only the data sent is reduced to the changes.
+        """
+        self._shape_index_time = None
         shape_dict = {}
 
         for shape in HWR.beamline.sample_view.get_shapes():
-            _s = to_camel(shape.as_dict())
-            shape_dict.update({shape.id: _s})
+            shape_dict[shape.id] = to_camel(shape.as_dict())
+
+        base_version = self._shape_tracker.version
+        changed, deleted = self._shape_tracker.update(shape_dict)
 
-        self.app.server.emit("update_shapes", {"shapes": shape_dict}, namespace="/hwr")
+        if not (changed or deleted):
+            return
+
+        self.app.server.emit(
+            "update_shapes_delta",
+            {
+                "baseVersion": base_version,
+                "version": self._shape_tracker.version,
+                "shapes": changed,
+                "deleted": deleted,
+            },
+            namespace="/hwr",
+        )
 
     def centring_clicks_left(self):
         return self._click_limit - self._click_count
@@ -167,58 +217,208 @@ class SampleView(ComponentBase):
         HWR.beamline.sample_view.connect("newGridResult", self.handle_grid_result)
         self._click_limit = int(HWR.beamline.click_centring_num_clicks or 3)
 
+        beam = HWR.beamline.beam
+
+        if beam is not None:
+            for sig in signals.beam_signals:
+                beam.connect(beam, sig, self._beam_changed)
+
+        # Frames are buffered whether streamed or not
+        if self._frame_buffer is not None:
+            self._connect_camera(HWR.beamline.sample_view.camera)
+
+    def _beam_changed(self, *args, **kwargs):
+        self._calibration.invalidate()
+        self._shape_index_time = None
+
+    def shapes_at(self, x, y, max_age=1):
+        """
+        Shapes at a point of the screen, from a spatial index rebuilt when
+        shapes, zoom or beam change, and at least every max_age seconds
+
+        :param float x: Horizontal screen coordinate
+        :param float y: Vertical screen coordinate
+        :param float max_age: Maximum age of the index [s]
+        :returns: List of {"id", "t", "cell"}, points first, then lines and
+                  grids. cell is the number of the grid cell at x, y for
+                  grids, None otherwise
+        """
+        now = time.time()
+
+        if self._shape_index_time is None or now - self._shape_index_time > max_age:
+            self._shape_index.build(
+                {s.id: s.as_dict() for s in HWR.beamline.sample_view.get_shapes()},
+                HWR.beamline.diffractometer.get_pixels_per_mm(),
+            )
+            self._shape_index_time = now
+
+        return [
+            {"id": sid, "t": t, "cell": cell}
+            for sid, t, cell in self._shape_index.query(x, y)
+        ]
+
+    @staticmethod
+    def _centred_point_from_coord(x, y):
+        return HWR.beamline.diffractometer.get_centred_point_from_coord(
+            x, y, return_by_names=True
+        )
+
+    def centred_points_from_coords(self, coords):
+        """
+        Motor positions of several screen points. Computed in one batch from
+        a cached calibration when the diffractometer reports its positions,
+        otherwise point by point. The calibration depends on the zoom (pixels
+        per mm), the beam position and the orientation of the sample (omega
+        and kappa angles), it is applied relative to the current positions of
+        the centring motors.
+
+        :param list coords: List of (x, y) screen coordinates
+        :returns: List with the motor positions (dict) of each point
+        """
+        dm = HWR.beamline.diffractometer
+        result = None
+
+        try:
+            positions = dm.get_positions()
+            beam_pos = tuple(HWR.beamline.beam.get_beam_position_on_screen())
+            key = (
+                tuple(dm.get_pixels_per_mm()),
+                beam_pos,
+                tuple(positions.get(name) for name in ("phi", "kappa", "kappa_phi")),
+            )
+        except (AttributeError, TypeError):
+            key = None
+
+        # Calibrating costs 4 points, not worth it for a few points
+        if key is not None and (
+            len(coords) >= 4 or self._calibration.is_calibrated(key)
+        ):
+            result = self._calibration.to_motor_positions(
+                coords, key, beam_pos, positions
+            )
+
+        if result is None:
+            result = [self._centred_point_from_coord(x, y) for x, y in coords]
+
+        return result
+
+    def _connect_camera(self, camera):
+        if not self._camera_connected:
+            camera.connect("imageReceived", self.new_sample_video_frame_received)
+            self._camera_connected = True
+
     def new_sample_video_frame_received(self, img, width, height, *args, **kwargs):
         """
         Executed when a new image is received, update the centred positions
         and set the gevent so the new image can be sent.
         """
+        captured = self._video_stream.frame_captured()
+        streamed = self._video_stream.num_subscribers > 0
+
+        # Nobody to send the frame to, skip the conversion
+        if not streamed and self._frame_buffer is None:
+            return
+
         # Assume that we are gettign a qimage if we are not getting a str,
         # to be able to handle data sent by hardware objects used in MxCuBE 2.x
         # Passed as str in Python 2.7 and bytes in Python 3
-        if isinstance(img, str):
-            img = img
-        elif isinstance(img, bytes):
-            img = img
+        if isinstance(img, (str, bytes)):
+            frame = img
+
+            if streamed:
+                self._video_stream.publish(jpeg=img, captured=captured)
+        elif streamed:
+            frame = frameutils.to_pil_image(
+                frameutils.qimage_buffer(img), width, height
+            )
+            self._video_stream.publish(image=frame, captured=captured)
         else:
-            rawdata = img.bits().asstring(img.numBytes())
-            strbuf = StringIO()
-            image = PIL.Image.frombytes("RGBA", (width, height), rawdata)
-            (r, g, b, a) = image.split()
-            image = PIL.Image.merge("RGB", (b, g, r))
-            image.save(strbuf, "JPEG")
-            img = strbuf.get_value()
+            # Only buffered, converted if a snapshot is taken from it
+            frame = frameutils.RawFrame(img, width, height)
 
-        self._sample_image = img
+        if self._frame_buffer is not None:
+            self._frame_buffer.append(frame, captured)
 
-        HWR.beamline.sample_view.camera.new_frame.set()
-        HWR.beamline.sample_view.camera.new_frame.clear()
+    @property
+    def video_stream_variants(self):
+        return self._video_stream.variants
 
-    def stream_video(self, camera):
-        """it just send a message to the client so it knows that there is a new
-        image. A HO is supplying that image
+    def stream_video(self, camera, name="", max_fps=None, variant=None):
+        """
+        Generator of the MJPEG stream of camera for one client, all clients
+        share the frames received from the camera. Each variant is encoded
+        once for all the clients using it.
+
+        :param camera: Camera hardware object
+        :param str name: Name of the client (i.e remote address)
+        :param float max_fps: Maximum frame rate for this client, None for
+                              no limit
+        :param str variant: Name of the stream variant, see
+                            video_stream_variants, defaults to the first one
         """
-        HWR.beamline.sample_view.camera.new_frame = gevent.event.Event()
+        self._connect_camera(camera)
 
-        try:
-            HWR.beamline.sample_view.camera.disconnect(
-                "imageReceived", self.new_sample_video_frame_received
-            )
-        except KeyError:
-            pass
+        variant = variant if variant else self.video_stream_variants[0]
+        subscriber = self._video_stream.subscribe(variant, name, max_fps)
 
-        HWR.beamline.sample_view.camera.connect(
-            "imageReceived", self.new_sample_video_frame_received
-        )
-
-        while True:
-            try:
-                camera.new_frame.wait()
+        try:
+            for frame in subscriber.frames():
                 yield (
                     b"--frame\r\n"
-                    b"--!>\nContent-type: image/jpeg\n\n" + self._sample_image + b"\r\n"
+                    b"--!>\nContent-type: image/jpeg\n\n" + frame + b"\r\n"
                 )
-            except Exception:
-                pass
+        finally:
+            subscriber.close()
+
+    def video_stream_stats(self):
+        """
+        :returns: Dictionary with the camera frame rate, the variants of the
+                  MJPEG stream, the frame counters and latency of each client
+                  and the status of the MPEG1 streaming processes (None if
+                  not running)
+        """
+        camera = HWR.beamline.sample_view.camera
+        stream_hash = getattr(camera, "stream_hash", None)
+
+        return {
+            "capture": self._video_stream.capture_stats(),
+            "variants": self._video_stream.variant_stats(),
+            "subscribers": self._video_stream.stats(),
+            "streaming": streaming_processes.read_status(stream_hash)
+            if stream_hash
+            else None,
+        }
+
+    def get_frame(self, t=None, timeout=1):
+        """
+        JPEG data of the first frame received at or after time t, from the
+        frame buffer
+
+        :param float t: Time, defaults to now (the next frame)
+        :param float timeout: Maximum time to wait for the frame [s]
+        :returns: Tuple (time, bytes), None if no frame was received in time
+                  or the frame buffer is disabled
+        """
+        if self._frame_buffer is None:
+            return None
+
+        return self._frame_buffer.jpeg_at(t, timeout)
+
+    def save_frame(self, filename, t=None, timeout=1):
+        """
+        Writes the frame received at or after time t to filename
+
+        :returns: True if written, False if no frame was available
+        """
+        frame = self.get_frame(t, timeout)
+
+        if frame is None:
+            return False
+
+        with open(filename, "wb") as f:
+            f.write(frame[1])
+
+        return True
 
     def set_image_size(self, width, height):
         HWR.beamline.sample_view.camera.restart_streaming((width, height))
@@ -240,7 +440,7 @@ class SampleView(ComponentBase):
             s = shape.as_dict()
             shape_dict.update({shape.id: s})
 
-        return {"shapes": to_camel(shape_dict)}
+        return {"shapes": to_camel(shape_dict), "version": self._shape_tracker.version}
 
     def get_shape_width_sid(self, sid):
         shape = HWR.beamline.sample_view.get_shape(sid)
@@ -252,22 +452,131 @@ class SampleView(ComponentBase):
         return shape
 
     def shape_add_cell_result(self, sid, cell, result):
+        shape = HWR.beamline.sample_view.get_shape(sid)
+        shape.set_cell_result(cell, result)
+        self._emit_grid_result(sid)
+
+    @Throttled(2, key=lambda self, sid: sid)
+    def _emit_grid_result(self, sid):
         from mxcube3.routes import signals
 
         shape = HWR.beamline.sample_view.get_shape(sid)
-        shape.set_cell_result(cell, result)
-        signals.grid_result_available(to_camel(shape.as_dict()))
+
+        if shape:
+            signals.grid_result_available(to_camel(shape.as_dict()))
+
+    def shape_add_cell_results(
+        self, sid, cells, values, colors=None, result_type="heatmap"
+    ):
+        """
+        Sets the result of several cells of grid sid. The results are kept in
+        arrays, the cells changed are sent to the clients at most twice per
+        second (grid_cell_results) instead of the whole grid for each cell.
+
+        :param str sid: Id of the grid
+        :param list cells: Cell numbers, starting at 1
+        :param list values: Value of each cell
+        :param list colors: RGBA colour of each cell, None to compute them
+                            from the values
+        :param str result_type: heatmap or crystalmap
+        :returns: Version of the grid results, incremented on each change
+        :raises KeyError: If there is no grid sid
+        :raises ValueError: On invalid cells, values or result type
+        """
+        shape = HWR.beamline.sample_view.get_shape(sid)
+
+        if not shape or getattr(shape, "num_cols", None) is None:
+            raise KeyError("No grid with id %s" % sid)
+
+        num_cells = shape.num_cols * shape.num_rows
+        results = self._grid_results.get(sid)
+
+        if results is None or results.num_cells != num_cells:
+            results = GridResults(num_cells)
+            self._grid_results[sid] = results
+
+        results.set_cells(cells, values, colors, result_type)
+        self._emit_grid_cell_results(sid)
+
+        return results.version
+
+    def get_grid_results(self, sid):
+        """
+        :returns: GridResults of grid sid, None if no result was added
+                  through shape_add_cell_results
+        """
+        return self._grid_results.get(sid)
+
+    @Throttled(2, key=lambda self, sid: sid)
+    def _emit_grid_cell_results(self, sid):
+        from mxcube3.routes import signals
+
+        shape = HWR.beamline.sample_view.get_shape(sid)
+        results = self._grid_results.get(sid)
+
+        if not shape or results is None:
+            self._grid_results.pop(sid, None)
+            return
+
+        # Keep the full result on the shape, for get_shapes and the
+        # hardware objects using it
+        shape.set_result(results.as_result())
+        signals.grid_cell_results_available(
+            sid, results.version, results.pop_changes()
+        )
 
     def handle_grid_result(self, shape):
         from mxcube3.routes import signals
 
         signals.grid_result_available(to_camel(shape.as_dict()))
 
+    def _new_shape_positions(self, shapes_data):
+        """
+        Motor positions of the new shapes without refs, computed in one batch
+
+        :param list shapes_data: Shape data (snake case) of the shapes to update
+        :returns: Dictionary index in shapes_data: list of motor positions
+                  (the point, and the center for grids)
+        """
+        coords = []
+        indices = []
+
+        for i, shape_data in enumerate(shapes_data):
+            if HWR.beamline.sample_view.get_shape(shape_data.get("id", -1)):
+                continue
+
+            if shape_data.get("refs") or "screen_coord" not in shape_data:
+                continue
+
+            try:
+                x, y = shape_data["screen_coord"]
+                points = [(x, y)]
+
+                # We also store the center of the grid
+                if shape_data.get("t", "") == "G":
+                    x_c = x + (shape_data["num_cols"] / 2.0) * shape_data["cell_width"]
+                    y_c = y + (shape_data["num_rows"] / 2.0) * shape_data["cell_height"]
+                    points.append((x_c, y_c))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            coords.extend(points)
+            indices.append((i, len(points)))
+
+        if not coords:
+            return {}
+
+        positions = iter(self.centred_points_from_coords(coords))
+
+        return {i: [next(positions) for _ in range(n)] for i, n in indices}
+
     def update_shapes(self, shapes):
+        self._shape_index_time = None
         updated_shapes = []
+        shapes_data = [from_camel(s) for s in shapes]
+        new_positions = self._new_shape_positions(shapes_data)
 
-        for s in shapes:
-            shape_data = from_camel(s)
+        for i, shape_data in enumerate(shapes_data):
             pos = []
 
             # Get the shape if already exists
@@ -296,28 +605,8 @@ class SampleView(ComponentBase):
                 if not refs:
                     try:
                         x, y = shape_data["screen_coord"]
-                        mpos = HWR.beamline.diffractometer.get_centred_point_from_coord(
-                            x, y, return_by_names=True
-                        )
-                        pos.append(mpos)
-
-                        # We also store the center of the grid
-                        if t == "G":
-                            # coords for the center of the grid
-                            x_c = (
-                                x
-                                + (shape_data["num_cols"] / 2.0)
-                                * shape_data["cell_width"]
-                            )
-                            y_c = (
-                                y
-                                + (shape_data["num_rows"] / 2.0)
-                                * shape_data["cell_height"]
-                            )
-                            center_positions = HWR.beamline.diffractometer.get_centred_point_from_coord(
-                                x_c, y_c, return_by_names=True
-                            )
-                            pos.append(center_positions)
+                        # The point, and the center for grids
+                        pos = new_positions[i]
 
                         shape = HWR.beamline.sample_view.add_shape_from_mpos(
                             pos, (x, y), t
@@ -486,7 +775,9 @@ class SampleView(ComponentBase):
         logging.getLogger("user_level_log").info(msg)
 
 
-def enable_snapshots(collect_object, diffractometer_object, sample_view):
+def enable_snapshots(
+    collect_object, diffractometer_object, sample_view, frame_buffer=None
+):
     def _snapshot_received(data):
         snapshot_jpg = data.get("data", "")
 
@@ -513,8 +804,89 @@ def enable_snapshots(collect_object, diffractometer_object, sample_view):
         # with open(filename, "wb") as snapshot_file:
         #     snapshot_file.write(SNAPSHOT)
 
+    def _buffered_snapshot(bw=False, after=None, size=None):
+        """
+        Last frame of frame_buffer, if received less than
+        SNAPSHOT_MAX_FRAME_AGE ago. Does not wait for a new frame.
+
+        :param float after: Only use a frame received after this time
+        :param tuple size: Only use a frame of this size (width, height)
+        :returns: PIL.Image, None if there is no such frame
+        """
+        latest = frame_buffer.latest() if frame_buffer is not None else None
+
+        if latest is None:
+            return None
+
+        frame_time = latest[0]
+
+        if time.time() - frame_time > SNAPSHOT_MAX_FRAME_AGE or (
+            after is not None and frame_time < after
+        ):
+            return None
+
+        result = frame_buffer.image_at(frame_time, timeout=0)
+
+        if result is None or (size is not None and result[1].size != size):
+            return None
+
+        return result[1].convert("L") if bw else result[1]
+
+    def _grab_snapshot(bw=False, after=None):
+        """
+        Current camera frame, from frame_buffer if it has a frame received
+        after the given time and with the resolution of the camera (the
+        stream may be scaled), otherwise from the camera
+
+        :param float after: Time the sample was last moved
+        :returns: PIL.Image, None if the camera can't provide it in memory
+        """
+        try:
+            size = (sample_view.camera.get_width(), sample_view.camera.get_height())
+        except AttributeError:
+            size = None
+
+        image = _buffered_snapshot(bw, after, size) if size else None
+
+        if image is not None:
+            return image
+
+        try:
+            frame = sample_view.camera.get_snapshot(bw=bw, return_as_array=True)
+        except (AttributeError, NotImplementedError):
+            return None
+
+        return None if frame is None else frameutils.to_image(frame)
+
+    def _write_snapshot(image, filename):
+        jpeg = frameutils.encode_jpeg(image, quality=95)
+
+        with open(filename, "wb") as snapshot_file:
+            snapshot_file.write(jpeg)
+
+    def _start_snapshot(filename, take_snapshot, pipelined=False, after=None):
+        """
+        Takes a snapshot with take_snapshot, or if pipelined grabs the frame
+        to memory and writes it in a greenlet (when the camera supports it)
+
+        :param float after: Time the sample was last moved
+        :returns: Greenlet writing the snapshot, None if already written
+        """
+        image = _grab_snapshot(after=after) if pipelined else None
+
+        if image is None:
+            take_snapshot(filename)
+            return None
+
+        return gevent.spawn(_write_snapshot, image, filename)
+
     def save_snapshot(self, filename, bw=False):
-        sample_view.save_snapshot(filename, overlay=False, bw=bw)
+        image = _buffered_snapshot(bw)
+
+        if image is None:
+            sample_view.save_snapshot(filename, overlay=False, bw=bw)
+        else:
+            _write_snapshot(image, filename)
         # _do_take_snapshot(filename, bw)
 
     def take_snapshots(self, snapshots=None, _do_take_snapshot=_do_take_snapshot):
@@ -562,6 +934,14 @@ def enable_snapshots(collect_object, diffractometer_object, sample_view):
                 "Taking %d sample snapshot(s)" % number_of_snapshots
             )
 
+            # Only the default way of taking snapshots can be pipelined
+            pipelined = (
+                mxcube.CONFIG.app.pipelined_snapshots
+                and _do_take_snapshot is _default_take_snapshot
+            )
+            writers = {}
+            moved = time.time()
+
             for snapshot_index in range(number_of_snapshots):
                 snapshot_filename = os.path.join(
                     snapshot_directory,
@@ -580,17 +960,38 @@ def enable_snapshots(collect_object, diffractometer_object, sample_view):
                     logging.getLogger("MX3.HWR").info(
                         "Taking snapshot number: %d" % (snapshot_index + 1)
                     )
-                    _do_take_snapshot(snapshot_filename)
+                    writer = _start_snapshot(
+                        snapshot_filename, _do_take_snapshot, pipelined, moved
+                    )
+
+                    if writer is not None:
+                        writers[snapshot_filename] = writer
                     # diffractometer.save_snapshot(snapshot_filename)
                 except Exception:
                     sys.excepthook(*sys.exc_info())
                     raise RuntimeError(
-                        "Could not take snapshot '%s'", snapshot_filename
+                        "Could not take snapshot '%s'" % snapshot_filename
                     )
 
                 if number_of_snapshots > 1:
                     move_omega_relative(90)
                     diffractometer_object.wait_ready()
+                    moved = time.time()
+
+            # All snapshots have to be written before the collection starts
+            gevent.joinall(list(writers.values()))
+
+            for snapshot_filename, writer in writers.items():
+                if writer.exception is not None:
+                    logging.getLogger("MX3.HWR").error(
+                        "Could not write snapshot %s: %s"
+                        % (snapshot_filename, writer.exception)
+                    )
+                    raise RuntimeError(
+                        "Could not take snapshot '%s'" % snapshot_filename
+                    )
+
+    _default_take_snapshot = _do_take_snapshot
 
     collect_object.take_crystal_snapshots = types.MethodType(
         take_snapshots, collect_object
@@ -2,6 +2,7 @@
 import base64
 
 from mxcube3.core.components.component_base import ComponentBase
+from mxcube3.core.util.gridutils import HeatmapCache, render_heatmap
 
 from mxcubecore import HardwareRepository as HWR
 
@@ -9,6 +10,7 @@ from mxcubecore import HardwareRepository as HWR
 class Workflow(ComponentBase):
     def __init__(self, app, config):
         super().__init__(app, config)
+        self._heatmap_cache = HeatmapCache(app.CONFIG.app.heatmap_cache_size)
 
     def get_available_workflows(self):
         workflows = {}
@@ -35,11 +37,36 @@ class Workflow(ComponentBase):
         HWR.beamline.workflow.set_values_map(params)
 
     def get_mesh_result(self, gid, _type="heatmap"):
+        """
+        PNG image of the results of grid gid. Rendered from the cell results
+        when they were added through SampleView.shape_add_cell_results,
+        otherwise the image provided by the sample view hardware object.
+        Images are cached per grid result version.
+
+        :param str gid: Id of the grid
+        :param str _type: Result type, heatmap or crystalmap
+        :returns: Tuple (etag, PNG data)
+        """
+        results = self.app.sample_view.get_grid_results(gid)
+        shape = HWR.beamline.sample_view.get_shape(gid)
+
+        if results is not None and shape and _type in results.colors:
+            key = (gid, _type, results.version, shape.num_cols, shape.num_rows)
+
+            return self._heatmap_cache.get(
+                key,
+                lambda: render_heatmap(
+                    results.colors[_type], shape.num_cols, shape.num_rows
+                ),
+            )
+
         base64data = HWR.beamline.sample_view.get_grid_data(gid)
         base64data = base64data if base64data else ""
 
-        data = base64.b64decode(base64data)
-        return data
+        # The data itself is the key, decoded once per change
+        return self._heatmap_cache.get(
+            (gid, _type, base64data), lambda: base64.b64decode(base64data)
+        )
 
     def test_workflow_dialog(self, wf):
         dialog = {
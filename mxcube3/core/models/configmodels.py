@@ -13,6 +13,19 @@ class FlaskConfigModel(BaseModel):
     SECURITY_PASSWORD_SALT: str = Field("ASALT", description="")
     SECURITY_TRACKABLE: bool = Field(True, description="")
     USER_DB_PATH: str = Field("/tmp/mxcube-user.db", description="")
+    EMIT_BATCH_INTERVAL: float = Field(
+        0.02,
+        description="Interval [s] at which socket.io events are sent as one "
+        "batch, 0 sends each event immediately",
+    )
+    EMIT_PRIORITY_EVENTS: List[str] = Field(
+        ["queue"], description="socket.io events that are never batched"
+    )
+    EMIT_BATCH_NAMESPACES: List[str] = Field(
+        ["/hwr", "/logging"],
+        description="socket.io namespaces on which events are batched, the "
+        "client must unpack batch events on them (listenBatch in serverIO.js)",
+    )
 
 class UIComponentModel(BaseModel):
     label: str
@@ -56,12 +69,99 @@ class ModeEnum(str, Enum):
     SSX = 'SSX'
     OSC = 'OSC'
 
+class VideoStreamVariantModel(BaseModel):
+    scale: float = Field(1, description="Scale factor of the frames")
+    quality: Optional[int] = Field(
+        None, description="JPEG quality (1-95), None to keep the camera quality"
+    )
+
+
+class VideoEncoderConfigModel(BaseModel):
+    preset: str = Field(
+        "quality",
+        description="Encoder preset: quality (13 Mb/s at 1280x1024), latency "
+        "(8 Mb/s, same CPU time) or bandwidth (3 Mb/s, 25 % less CPU time), "
+        "see ENCODER_PRESETS in streaming_processes.py",
+    )
+    adaptive: bool = Field(
+        False,
+        description="Switch to degraded_preset when the relay has more than "
+        "max_clients clients or sends more than max_throughput bytes/s",
+    )
+    degraded_preset: str = Field("bandwidth", description="Preset under high load")
+    max_clients: int = Field(4, description="")
+    max_throughput: float = Field(4e6, description="[bytes/s]")
+
+
+class QueueStoreConfigModel(BaseModel):
+    backend: str = Field("redis", description="Queue store: file, sqlite or redis")
+    path: str = Field(
+        "redis://localhost:6379/0",
+        description="Directory (file), database file (sqlite) or URL (redis). "
+        "The file and sqlite stores hold proposal data, use a path only "
+        "readable by the MXCuBE user, not /tmp",
+    )
+    format: str = Field(
+        "json", description="Format of the saved queue: json or msgpack"
+    )
+
+
 class MXCUBEAppConfigModel(BaseModel):
     VIDEO_FORMAT: str = Field("MPEG1", description="Video format MPEG1 or MJPEG")
     mode: ModeEnum = Field(ModeEnum.OSC, description="MXCuBE mode SSX or OSC")
     usermanager: UserManagerConfigModel
     ui_properties: Dict[str, UIPropertiesModel] = {}
     adapter_properties: List = []
+    video_stream_variants: Dict[str, VideoStreamVariantModel] = Field(
+        {
+            "full": VideoStreamVariantModel(),
+            "half": VideoStreamVariantModel(scale=0.5, quality=60),
+            "quarter": VideoStreamVariantModel(scale=0.25, quality=40),
+        },
+        description="MJPEG stream variants clients can choose from, the "
+        "first one is used by default",
+    )
+    video_encoder: VideoEncoderConfigModel = Field(
+        VideoEncoderConfigModel(),
+        description="Settings of the MPEG1 encoder used for streamed video",
+    )
+    video_frame_buffer_size: int = Field(
+        5,
+        description="Number of camera frames kept in memory to serve "
+        "snapshots without a new capture, 0 to disable",
+    )
+    heatmap_cache_size: int = Field(
+        32, description="Number of rendered grid heatmaps kept in memory"
+    )
+    queue_store: QueueStoreConfigModel = Field(
+        QueueStoreConfigModel(),
+        description="Where the queue of each proposal is saved on sign out",
+    )
+    pipelined_snapshots: bool = Field(
+        True,
+        description="Grab the crystal snapshots taken before a collection "
+        "to memory and write them while the next omega move runs, instead "
+        "of waiting for each file to be written",
+    )
+    adapter_snapshot_max_age: Optional[float] = Field(
+        60,
+        description="Maximum age [s] of the adapter state served by "
+        "GET /beamline before it is read again from the hardware, "
+        "None for no limit",
+    )
+    adapter_read_timeout: Optional[float] = Field(
+        5,
+        description="Time [s] to wait for an adapter read from the hardware, "
+        "adapters not read in time are reported as unavailable",
+    )
+    adapter_read_concurrency: int = Field(
+        10, description="Maximum number of adapters read concurrently"
+    )
+    adapter_init_concurrency: int = Field(
+        1,
+        description="Maximum number of adapters created concurrently at "
+        "startup, 1 creates them one after the other",
+    )
 
 class ModeEnumModel(BaseModel):
     mode: ModeEnum = Field(ModeEnum.OSC, description="MXCuBE mode SSX or OSC")
@@ -1,3 +1,44 @@
+import importlib
+
+
+# Modules defining the adapters registered with the adapts decorator
+ADAPTER_MODULES = (
+    "mxcube3.core.adapter.actuator_adapter",
+    "mxcube3.core.adapter.motor_adapter",
+    "mxcube3.core.adapter.detector_adapter",
+    "mxcube3.core.adapter.machine_info_adapter",
+    "mxcube3.core.adapter.beam_adapter",
+    "mxcube3.core.adapter.data_publisher_adapter",
+    "mxcube3.core.adapter.energy_adapter",
+    "mxcube3.core.adapter.diffractometer_adapter",
+    "mxcube3.core.adapter.nstate_adapter",
+)
+
+# Names of the adapter classes in the order they are tried, a hardware
+# object gets the first adapter registered for one of its classes. The
+# order matters for hardware objects with several abstract classes (i.e a
+# shutter is also an actuator). Other adapters are tried last.
+ADAPTER_ORDER = (
+    "NStateAdapter",
+    "DiffractometerAdapter",
+    "EnergyAdapter",
+    "DetectorAdapter",
+    "MachineInfoAdapter",
+    "BeamAdapter",
+    "DataPublisherAdapter",
+    "MotorAdapter",
+    "ActuatorAdapter",
+)
+
+# Adapter class: hardware object classes, filled by the adapts decorator
+_ADAPTER_CLASSES = {}
+
+# Concrete hardware object class: resolved adapter class (or None)
+_RESOLVED_ADAPTER_CLASSES = {}
+
+_ADAPTER_MODULES_LOADED = False
+
+
 def export(func):
     func._export = True
     func._export_name = func.__name__
@@ -5,53 +46,65 @@ def export(func):
     return func
 
 
+def adapts(*ho_classes):
+    """
+    Class decorator registering the decorated adapter class as the adapter
+    for hardware objects of the given classes (and their sub classes)
+
+    :param ho_classes: Hardware object classes
+    """
+
+    def decorate(adapter_cls):
+        _ADAPTER_CLASSES[adapter_cls] = tuple(ho_classes)
+        _RESOLVED_ADAPTER_CLASSES.clear()
+
+        return adapter_cls
+
+    return decorate
+
+
+def _load_adapter_modules():
+    global _ADAPTER_MODULES_LOADED
+
+    if not _ADAPTER_MODULES_LOADED:
+        for module_name in ADAPTER_MODULES:
+            importlib.import_module(module_name)
+
+        _ADAPTER_MODULES_LOADED = True
+
+
+def _adapter_rank(adapter_cls):
+    try:
+        return ADAPTER_ORDER.index(adapter_cls.__name__)
+    except ValueError:
+        return len(ADAPTER_ORDER)
+
+
 def get_adapter_cls_from_hardware_object(ho):
-    from mxcubecore.HardwareObjects.abstract import (
-        AbstractActuator,
-        AbstractDetector,
-        AbstractMachineInfo,
-        AbstractBeam,
-        AbstractNState,
-        AbstractShutter,
-        AbstractEnergy,
-        AbstractMotor,
-    )
-
-    from mxcubecore.HardwareObjects import MiniDiff, GenericDiffractometer
-
-    from mxcubecore.HardwareObjects import DataPublisher
-
-    from mxcube3.core.adapter.actuator_adapter import ActuatorAdapter
-    from mxcube3.core.adapter.motor_adapter import MotorAdapter
-    from mxcube3.core.adapter.detector_adapter import DetectorAdapter
-    from mxcube3.core.adapter.machine_info_adapter import MachineInfoAdapter
-    from mxcube3.core.adapter.beam_adapter import BeamAdapter
-    from mxcube3.core.adapter.data_publisher_adapter import DataPublisherAdapter
-    from mxcube3.core.adapter.energy_adapter import EnergyAdapter
-    from mxcube3.core.adapter.diffractometer_adapter import DiffractometerAdapter
-    from mxcube3.core.adapter.nstate_adapter import NStateAdapter
-
-    if isinstance(ho, AbstractNState.AbstractNState) or isinstance(
-        ho, AbstractShutter.AbstractShutter
-    ):
-        return NStateAdapter
-    elif isinstance(ho, MiniDiff.MiniDiff) or isinstance(
-        ho, GenericDiffractometer.GenericDiffractometer
-    ):
-        return DiffractometerAdapter
-    elif isinstance(ho, AbstractEnergy.AbstractEnergy):
-        return EnergyAdapter
-    elif isinstance(ho, AbstractDetector.AbstractDetector):
-        return DetectorAdapter
-    elif isinstance(ho, AbstractMachineInfo.AbstractMachineInfo):
-        return MachineInfoAdapter
-    elif isinstance(ho, AbstractBeam.AbstractBeam):
-        return BeamAdapter
-    elif isinstance(ho, DataPublisher.DataPublisher):
-        return DataPublisherAdapter
-    elif isinstance(ho, AbstractMotor.AbstractMotor):
-        return MotorAdapter
-    elif isinstance(ho, AbstractActuator.AbstractActuator):
-        return ActuatorAdapter
-    else:
-        return None
+    """
+    Get the first adapter class, in ADAPTER_ORDER, registered for a class of
+    the hardware object. The result is cached by hardware object class.
+
+    :param ho: Hardware object
+
+    :returns: Adapter class or None if there is no adapter for ho
+    """
+    ho_cls = type(ho)
+
+    try:
+        return _RESOLVED_ADAPTER_CLASSES[ho_cls]
+    except KeyError:
+        pass
+
+    _load_adapter_modules()
+    adapter_cls = None
+
+    # sorted is stable, other adapters are tried in registration order
+    for cls in sorted(_ADAPTER_CLASSES, key=_adapter_rank):
+        if issubclass(ho_cls, _ADAPTER_CLASSES[cls]):
+            adapter_cls = cls
+            break
+
+    _RESOLVED_ADAPTER_CLASSES[ho_cls] = adapter_cls
+
+    return adapter_cls
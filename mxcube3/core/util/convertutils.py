@@ -1,3 +1,4 @@
+import functools
 import re
 
 
@@ -28,6 +29,19 @@ def convert_to_dict(ispyb_object):
     return d
 
 
+# Maximum number of key conversions memoised by str_to_camel and str_to_snake
+KEY_CACHE_SIZE = 4096
+
+# Dictionaries with at most this many keys get their converted keys from a
+# key map shared by all dictionaries with the same keys (i.e shapes), the
+# keys of larger dictionaries (i.e grid results) are converted one by one
+MAX_KEY_MAP_SIZE = 64
+MAX_KEY_MAPS = 1024
+
+_KEY_MAPS = {}
+
+
+@functools.lru_cache(maxsize=KEY_CACHE_SIZE, typed=True)
 def str_to_camel(name):
     if isinstance(name, str):
         components = name.split("_")
@@ -38,26 +52,56 @@ def str_to_camel(name):
     return name
 
 
+@functools.lru_cache(maxsize=KEY_CACHE_SIZE, typed=True)
 def str_to_snake(name):
     s = re.sub("(.)([A-Z][a-z]+)", r"\1_\2", name)
     return re.sub("([a-z0-9])([A-Z])", r"\1_\2", s).lower()
 
 
-def _convert_dict_rec(fun, d, recurse=True):
+def _key_map(fun, keys):
+    """
+    :returns: Tuple with the keys converted by fun, computed once for each
+              set of keys (schema)
+    """
+    map_key = (fun, keys)
+    converted = _KEY_MAPS.get(map_key)
+
+    if converted is None:
+        if len(_KEY_MAPS) >= MAX_KEY_MAPS:
+            _KEY_MAPS.clear()
+
+        converted = tuple(fun(key) for key in keys)
+        _KEY_MAPS[map_key] = converted
+
+    return converted
+
+
+def _convert_dict(fun, d, recurse=True):
     converted = {}
+    # Dictionaries left to convert, with the dictionary to fill
+    stack = [(d, converted)]
+
+    while stack:
+        src, dst = stack.pop()
+
+        if len(src) <= MAX_KEY_MAP_SIZE:
+            keys = _key_map(fun, tuple(src))
+        else:
+            keys = map(fun, src)
 
-    for key, value in d.items():
-        if isinstance(value, dict) and recurse:
-            value = _convert_dict_rec(fun, value)
+        for key, value in zip(keys, src.values()):
+            if isinstance(value, dict) and recurse:
+                stack.append((value, {}))
+                value = stack[-1][1]
 
-        converted[fun(key)] = value
+            dst[key] = value
 
     return converted
 
 
 def to_camel(d):
-    return _convert_dict_rec(str_to_camel, d)
+    return _convert_dict(str_to_camel, d)
 
 
 def from_camel(d):
-    return _convert_dict_rec(str_to_snake, d)
+    return _convert_dict(str_to_snake, d)
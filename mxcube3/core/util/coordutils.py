@@ -0,0 +1,144 @@
+import numpy as np
+
+
+class ScreenToMotorCalibration:
+    """
+    Converts screen coordinates to motor positions in batches. The motor
+    positions of a point on the screen are, for a given zoom, beam position
+    and diffractometer position, an affine function of its coordinates. The
+    function is measured once, with a few calls to get_centred_point, and is
+    then applied to any number of points in one vectorized operation.
+
+    The calibration is redone when the key passed to to_motor_positions
+    (i.e pixels per mm, beam position and omega) changes, or after
+    invalidate. Moving the centring motors translates the positions of all
+    points by the same amount, so when the current motor positions are
+    given the calibration is applied relative to them and stays valid. If
+    get_centred_point is not affine (i.e mockups returning random
+    positions) the calibration is marked as unusable.
+    """
+
+    def __init__(self, get_centred_point, step=100, tolerance=1e-6):
+        """
+        :param callable get_centred_point: Function (x, y) returning the motor
+                                           positions of a screen point (dict)
+        :param float step: Distance between the calibration points [pixels]
+        :param float tolerance: Maximum deviation from an affine function,
+                                relative to the motor displacement per step
+        """
+        self._get_centred_point = get_centred_point
+        self._step = step
+        self._tolerance = tolerance
+        self.invalidate()
+
+    def invalidate(self):
+        self._key = None
+        self._usable = False
+        self._origin = None
+        self._names = []
+        self._constant = {}
+        self._p0 = None
+        self._reference = None
+        self._dx = None
+        self._dy = None
+
+    def is_calibrated(self, key):
+        """
+        :returns: True if a calibration (usable or not) was made for key
+        """
+        return self._key is not None and key == self._key
+
+    def _numeric(self, positions):
+        return [
+            name
+            for name, value in positions.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        ]
+
+    def _current(self, positions, default):
+        """
+        :returns: Array of the current positions of the calibrated motors,
+                  default for the motors not in positions
+        """
+        positions = positions or {}
+
+        return np.array(
+            [
+                positions[name]
+                if isinstance(positions.get(name), (int, float))
+                and not isinstance(positions.get(name), bool)
+                else value
+                for name, value in zip(self._names, default)
+            ],
+            dtype=float,
+        )
+
+    def _calibrate(self, key, origin, positions):
+        self.invalidate()
+        self._key = key
+
+        x, y = origin
+        step = self._step
+        p0 = self._get_centred_point(x, y)
+        px = self._get_centred_point(x + step, y)
+        py = self._get_centred_point(x, y + step)
+        pxy = self._get_centred_point(x + step, y + step)
+
+        names = self._numeric(p0)
+        values = np.array(
+            [[p.get(name, np.nan) for name in names] for p in (p0, px, py, pxy)],
+            dtype=float,
+        )
+
+        if np.isnan(values).any():
+            return
+
+        dx = (values[1] - values[0]) / step
+        dy = (values[2] - values[0]) / step
+
+        # The fourth point checks that the function is affine
+        error = np.abs(values[0] + (dx + dy) * step - values[3])
+        scale = np.maximum(np.abs(dx * step) + np.abs(dy * step), 1)
+
+        if (error > self._tolerance * scale).any():
+            return
+
+        self._origin = np.array(origin, dtype=float)
+        self._names = names
+        self._constant = {k: v for k, v in p0.items() if k not in names}
+        self._p0 = values[0]
+        self._reference = self._current(positions, values[0])
+        self._dx = dx
+        self._dy = dy
+        self._usable = True
+
+    def to_motor_positions(self, coords, key=None, origin=(0, 0), positions=None):
+        """
+        :param coords: Sequence of (x, y) screen coordinates
+        :param key: Hashable state the calibration depends on, a different
+                    key than in the previous call triggers a new calibration
+        :param tuple origin: Screen point around which the calibration is
+                             made (i.e beam position)
+        :param dict positions: Current motor positions, the calibration is
+                               applied relative to them
+        :returns: List of motor positions (dict) of each point, None if the
+                  calibration is not usable
+        """
+        if not self.is_calibrated(key):
+            self._calibrate(key, origin, positions)
+
+        if not self._usable:
+            return None
+
+        p0 = self._p0 + self._current(positions, self._reference) - self._reference
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2) - self._origin
+        values = (
+            p0
+            + coords[:, 0:1] * self._dx[np.newaxis, :]
+            + coords[:, 1:2] * self._dy[np.newaxis, :]
+        )
+
+        return [
+            dict(self._constant, **dict(zip(self._names, row)))
+            for row in values.tolist()
+        ]
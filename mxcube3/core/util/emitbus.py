@@ -0,0 +1,96 @@
+import logging
+import threading
+
+import gevent
+
+
+class EmitBus:
+    """
+    Buffers socket.io events per namespace and room and sends the buffered
+    events as one "batch" event, [[event, *args], ...], every interval.
+
+    Only events on namespaces whose clients unpack batches (listenBatch in
+    serverIO.js) are buffered, others are sent immediately. Events in
+    priority_events and events that need options that can't be batched
+    (i.e callback) flush the events buffered for the same namespace and
+    room and are then sent immediately, so that the order in which events
+    were emitted is always preserved.
+
+    Events emitted from another thread than the one that created the bus
+    (the one running the gevent hub), or while the bus is sending, i.e by
+    the logging handler when sending fails, are sent immediately.
+    """
+
+    BATCH_EVENT = "batch"
+
+    def __init__(self, emit, interval, priority_events=(), namespaces=()):
+        """
+        :param callable emit: Function sending one socket.io event
+                              (SocketIO.emit)
+        :param float interval: Interval at which buffered events are sent [s]
+        :param priority_events: Names of events that are sent immediately
+        :param namespaces: Namespaces on which events are batched
+        """
+        self._emit = emit
+        self._interval = interval
+        self._priority_events = set(priority_events)
+        self._namespaces = set(namespaces)
+        self._buffers = {}
+        self._flush_task = None
+        # Greenlet sending buffered events
+        self._flushing = None
+        self._thread_id = threading.get_ident()
+
+    def emit(self, event, *args, **kwargs):
+        namespace = kwargs.pop("namespace", None)
+        room = kwargs.pop("to", kwargs.pop("room", None))
+        kwargs.pop("broadcast", None)
+        key = (namespace, room)
+
+        if (
+            namespace not in self._namespaces
+            or threading.get_ident() != self._thread_id
+            or self._flushing is gevent.getcurrent()
+        ):
+            self._emit(event, *args, namespace=namespace, room=room, **kwargs)
+            return
+
+        if kwargs or event in self._priority_events:
+            self._flush_key(key)
+            self._emit(event, *args, namespace=namespace, room=room, **kwargs)
+            return
+
+        self._buffers.setdefault(key, []).append([event] + list(args))
+
+        if self._flush_task is None:
+            self._flush_task = gevent.spawn_later(self._interval, self.flush)
+
+    def flush(self):
+        """
+        Sends all buffered events
+        """
+        self._flush_task = None
+
+        for key in list(self._buffers.keys()):
+            self._flush_key(key)
+
+    def _flush_key(self, key):
+        frames = self._buffers.pop(key, None)
+
+        if not frames:
+            return
+
+        namespace, room = key
+        self._flushing = gevent.getcurrent()
+
+        try:
+            if len(frames) == 1:
+                self._emit(*frames[0], namespace=namespace, room=room)
+            else:
+                self._emit(self.BATCH_EVENT, frames, namespace=namespace, room=room)
+        except Exception:
+            logging.getLogger("MX3.HWR").exception(
+                "Could not send %s events on %s" % (len(frames), namespace)
+            )
+        finally:
+            self._flushing = None
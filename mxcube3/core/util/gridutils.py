@@ -0,0 +1,197 @@
+import collections
+import hashlib
+import io
+
+import numpy as np
+import PIL.Image
+
+
+RESULT_TYPES = ("heatmap", "crystalmap")
+
+
+def value_to_rgba(values, vmin=None, vmax=None):
+    """
+    Colours of cell values, from blue (vmin) through green to red (vmax),
+    the colour map used for grid heatmaps. Cells without value (NaN) are
+    transparent.
+
+    :param values: Array of values
+    :param float vmin: Value mapped to blue, defaults to the minimum value
+    :param float vmax: Value mapped to red, defaults to the maximum value
+    :returns: Array of shape values.shape + (4,), RGBA as uint8
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    rgba = np.zeros(values.shape + (4,), dtype=np.uint8)
+
+    if not valid.any():
+        return rgba
+
+    vmin = np.nanmin(values) if vmin is None else vmin
+    vmax = np.nanmax(values) if vmax is None else vmax
+    span = vmax - vmin if vmax > vmin else 1.0
+    scaled = np.clip((np.where(valid, values, vmin) - vmin) / span, 0, 1)
+
+    # Piecewise linear ramp: blue -> green at 0.5 -> red
+    rgba[..., 0] = np.clip(2 * scaled - 1, 0, 1) * 255
+    rgba[..., 1] = (1 - np.abs(2 * scaled - 1)) * 255
+    rgba[..., 2] = np.clip(1 - 2 * scaled, 0, 1) * 255
+    rgba[..., 3] = valid * 255
+
+    return rgba
+
+
+class GridResults:
+    """
+    Results of the cells of a grid, one value and one RGBA colour per cell
+    and result type, stored in NumPy arrays. Cells are numbered from 1, as
+    in the grid result dictionaries ({cell: [value, [r, g, b, a]]}).
+
+    The cells changed since the last call to pop_changes are tracked, so
+    that only those have to be sent to the clients.
+    """
+
+    def __init__(self, num_cells):
+        """
+        :param int num_cells: Number of cells of the grid
+        """
+        self.num_cells = num_cells
+        self.version = 0
+        self.values = {t: np.full(num_cells, np.nan) for t in RESULT_TYPES}
+        self.colors = {
+            t: np.zeros((num_cells, 4), dtype=np.uint8) for t in RESULT_TYPES
+        }
+        self._changed = {t: np.zeros(num_cells, dtype=bool) for t in RESULT_TYPES}
+
+    def set_cells(self, cells, values, colors=None, result_type="heatmap"):
+        """
+        :param cells: Cell numbers, starting at 1
+        :param values: Value of each cell
+        :param colors: RGBA colour of each cell, computed from all the values
+                       of the grid with value_to_rgba if None
+        :param str result_type: heatmap or crystalmap
+
+        :raises ValueError: On unknown result type, cell numbers out of range
+                            or lengths not matching
+        """
+        if result_type not in RESULT_TYPES:
+            raise ValueError("Unknown result type %s" % result_type)
+
+        idx = np.asarray(cells, dtype=int).ravel() - 1
+        values = np.asarray(values, dtype=float).ravel()
+
+        if idx.size != values.size:
+            raise ValueError("%d cells but %d values" % (idx.size, values.size))
+
+        if idx.size and (idx.min() < 0 or idx.max() >= self.num_cells):
+            raise ValueError("Cell number out of range 1-%d" % self.num_cells)
+
+        self.values[result_type][idx] = values
+
+        if colors is None:
+            # The colour of every cell depends on the range of all values
+            colors = value_to_rgba(self.values[result_type])
+            self._changed[result_type] |= np.any(
+                colors != self.colors[result_type], axis=1
+            )
+            self.colors[result_type] = colors
+        else:
+            self.colors[result_type][idx] = np.asarray(colors, dtype=np.uint8)
+
+        self._changed[result_type][idx] = True
+        self.version += 1
+
+    def _as_dict(self, result_type, idx):
+        values = self.values[result_type][idx].tolist()
+        colors = self.colors[result_type][idx].tolist()
+
+        return {
+            int(i) + 1: [v, c]
+            for i, v, c in zip(idx.tolist(), values, colors)
+            if v == v  # Skip cells without result (NaN)
+        }
+
+    def pop_changes(self):
+        """
+        :returns: Dictionary result type: {cell: [value, [r, g, b, a]]} with
+                  the cells changed since the last call
+        """
+        changes = {}
+
+        for t in RESULT_TYPES:
+            idx = np.flatnonzero(self._changed[t])
+
+            if idx.size:
+                changes[t] = self._as_dict(t, idx)
+                self._changed[t][:] = False
+
+        return changes
+
+    def as_result(self):
+        """
+        :returns: Dictionary result type: {cell: [value, [r, g, b, a]]} with
+                  all the cells that have a result
+        """
+        return {
+            t: self._as_dict(t, np.arange(self.num_cells)) for t in RESULT_TYPES
+        }
+
+
+def render_heatmap(colors, num_cols, num_rows, cell_size=10):
+    """
+    PNG image of a grid result, one square of cell_size pixels per cell
+
+    :param colors: Array (num_cells, 4) with the RGBA colour of each cell,
+                   cells numbered row by row
+    :param int num_cols: Number of columns of the grid
+    :param int num_rows: Number of rows of the grid
+    :param int cell_size: Size of a cell in the image [pixels]
+    :returns: PNG data
+    :rtype: bytes
+    """
+    pixels = np.asarray(colors, dtype=np.uint8).reshape(num_rows, num_cols, 4)
+    pixels = pixels.repeat(cell_size, axis=0).repeat(cell_size, axis=1)
+
+    buf = io.BytesIO()
+    PIL.Image.fromarray(pixels, "RGBA").save(buf, "PNG")
+
+    return buf.getvalue()
+
+
+class HeatmapCache:
+    """
+    Least recently used cache of rendered heatmaps, keyed on the grid, the
+    result type and the version of the grid results, so that a heatmap is
+    rendered once per change however often it is requested.
+    """
+
+    def __init__(self, max_entries=32):
+        """
+        :param int max_entries: Maximum number of heatmaps kept
+        """
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, render):
+        """
+        :param key: Hashable key, (grid id, result type, version)
+        :param callable render: Called without arguments to render the
+                                heatmap if not cached, returns PNG data
+        :returns: Tuple (etag, PNG data)
+        """
+        entry = self._entries.get(key)
+
+        if entry is None:
+            data = render()
+            entry = (hashlib.sha1(data).hexdigest(), data)
+            self._entries[key] = entry
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+
+        return entry
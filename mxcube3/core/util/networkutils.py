@@ -6,6 +6,8 @@ import time
 import os
 import logging
 
+import gevent
+
 from email.mime.text import MIMEText
 from email.utils import make_msgid
 
@@ -16,23 +18,102 @@ from flask_login import current_user, login_required
 from mxcubecore import HardwareRepository as HWR
 
 
-def RateLimited(maxPerSecond):
+def _first_arg_key(*args, **kwargs):
+    return id(args[0]) if args else None
+
+
+def Throttled(maxPerSecond, key=None):
+    """
+    Limits the rate at which the decorated function is called, separately
+    for each key.
+
+    Calls arriving within the minimum interval are coalesced, only the
+    arguments of the last one are kept and the function is called with them
+    at the end of the interval. The last value is thus never lost.
+
+    The decorated function has two additional methods, cancel(key) that
+    drops the call pending for key and flush(key) that makes it immediately,
+    for callers that send a final value that a pending call must not follow,
+    and keys() returning the keys currently throttled.
+
+    :param float maxPerSecond: Maximum number of calls per second and key
+    :param callable key: Function returning the key for the arguments of a
+                         call, defaults to the first argument (self for
+                         methods), so that each instance is throttled
+                         separately
+
+    :returns: Decorator
+    """
     minInterval = 1.0 / float(maxPerSecond)
+    key = key if key else _first_arg_key
 
     def decorate(func):
-        lastTimeCalled = [0.0]
+        last_called = {}
+        # Key: (args, kwargs, greenlet making the call)
+        pending = {}
+
+        def called(k):
+            now = time.time()
+
+            # Forget the keys whose interval has passed, so that keys used
+            # once (i.e queue entries) are not kept for ever
+            if k not in last_called:
+                for _k, t in list(last_called.items()):
+                    if now - t >= minInterval and _k not in pending:
+                        del last_called[_k]
+
+            last_called[k] = now
+
+        def call(k):
+            args, kwargs, _ = pending.pop(k)
+            called(k)
+
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logging.getLogger("MX3.HWR").exception(
+                    "Error in throttled call to %s" % func.__name__
+                )
+
+        def cancel(k):
+            """
+            Drops the call pending for key k, if any
+            """
+            if k in pending:
+                _, _, greenlet = pending.pop(k)
+                greenlet.kill(block=False)
+
+        def flush(k):
+            """
+            Makes the call pending for key k now, if any
+            """
+            if k in pending:
+                pending[k][2].kill(block=False)
+                call(k)
+
+        @functools.wraps(func)
+        def throttledFunction(*args, **kwargs):
+            k = key(*args, **kwargs)
+
+            # A trailing call is already scheduled, replace its arguments
+            if k in pending:
+                pending[k] = (args, kwargs, pending[k][2])
+                return
+
+            leftToWait = minInterval - (time.time() - last_called.get(k, 0.0))
 
-        def rateLimitedFunction(*args, **kargs):
-            elapsed = time.time() - lastTimeCalled[0]
-            leftToWait = minInterval - elapsed
             if leftToWait > 0:
-                # ignore update
+                pending[k] = (args, kwargs, gevent.spawn_later(leftToWait, call, k))
                 return
-            ret = func(*args, **kargs)
-            lastTimeCalled[0] = time.time()
-            return ret
 
-        return rateLimitedFunction
+            called(k)
+            return func(*args, **kwargs)
+
+        throttledFunction.cancel = cancel
+        throttledFunction.flush = flush
+        throttledFunction.keys = lambda: set(last_called) | set(pending)
+
+        return throttledFunction
 
     return decorate
 
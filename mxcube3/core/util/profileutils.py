@@ -0,0 +1,176 @@
+import builtins
+import contextlib
+import importlib
+import json
+import logging
+import sys
+import time
+
+import gevent
+
+
+class StartupProfiler:
+    """
+    Records the wall time and the time spent importing modules of the stages
+    of the application startup. Disabled by default, stage is then a no-op.
+
+    Stages can be nested, the parent of a stage is the innermost stage
+    entered in the same greenlet, or in the greenlet that enabled the
+    profiler for stages entered in other greenlets. Import times of stages
+    running concurrently overlap.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._records = []
+        self._stacks = {}
+        self._main_greenlet = None
+        self._import_time = 0
+        # Depth of nested imports, per greenlet
+        self._import_depth = {}
+        self._t0 = 0
+        self._builtin_import = None
+        self._import_module = None
+
+    def enable(self):
+        if self.enabled:
+            return
+
+        self.enabled = True
+        self._t0 = time.perf_counter()
+        self._main_greenlet = gevent.getcurrent()
+        self._builtin_import = builtins.__import__
+        self._import_module = importlib.import_module
+        builtins.__import__ = self._timed(self._builtin_import)
+        importlib.import_module = self._timed(self._import_module)
+
+    def disable(self):
+        if not self.enabled:
+            return
+
+        self.enabled = False
+        builtins.__import__ = self._builtin_import
+        importlib.import_module = self._import_module
+        self._import_depth = {}
+
+    @contextlib.contextmanager
+    def profile(self, enabled=True):
+        """
+        Context manager enabling the profiler, disabled on exit even if an
+        exception is raised, so that the import functions are restored
+
+        :param bool enabled: False to not enable the profiler
+        """
+        if enabled:
+            self.enable()
+
+        try:
+            yield self
+        finally:
+            self.disable()
+
+    def _timed(self, import_fun):
+        def _import(*args, **kwargs):
+            # Only the outermost import of each greenlet is timed, nested
+            # imports are included in its time
+            current = gevent.getcurrent()
+            self._import_depth[current] = self._import_depth.get(current, 0) + 1
+            t0 = time.perf_counter()
+
+            try:
+                return import_fun(*args, **kwargs)
+            finally:
+                self._import_depth[current] -= 1
+
+                if self._import_depth[current] == 0:
+                    del self._import_depth[current]
+                    self._import_time += time.perf_counter() - t0
+
+        return _import
+
+    def _stack(self):
+        current = gevent.getcurrent()
+
+        if current not in self._stacks:
+            self._stacks[current] = list(self._stacks.get(self._main_greenlet, []))
+
+        return self._stacks[current]
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Context manager recording the time spent in the stage name
+
+        :param str name: Name of the stage
+        """
+        if not self.enabled:
+            yield
+            return
+
+        stack = self._stack()
+        parent = "/".join(stack)
+        stack.append(name)
+
+        record = {
+            "name": name,
+            "parent": parent,
+            "start": time.perf_counter() - self._t0,
+        }
+        self._records.append(record)
+
+        t0 = time.perf_counter()
+        import_t0 = self._import_time
+        num_modules = len(sys.modules)
+
+        try:
+            yield
+        finally:
+            stack.pop()
+            record["wall_time"] = time.perf_counter() - t0
+            record["import_time"] = self._import_time - import_t0
+            record["modules_imported"] = len(sys.modules) - num_modules
+
+    def report(self):
+        """
+        :returns: Dictionary with the total startup time and the recorded
+                  stages, in the order they were started
+        """
+        return {
+            "total_time": time.perf_counter() - self._t0,
+            "total_import_time": self._import_time,
+            "stages": self._records,
+        }
+
+    def write_report(self, fpath):
+        """
+        Writes the report to fpath as JSON and logs it as a table
+
+        :param str fpath: Path of the JSON report
+        """
+        from mxcubecore.utils.conversion import make_table
+
+        report = self.report()
+
+        with open(fpath, "w") as f:
+            json.dump(report, f, indent=4)
+
+        table = make_table(
+            ["Stage", "Wall time [s]", "Import time [s]", "Modules imported"],
+            [
+                [
+                    "/".join(filter(None, [record["parent"], record["name"]])),
+                    "%.3f" % record.get("wall_time", 0),
+                    "%.3f" % record.get("import_time", 0),
+                    record.get("modules_imported", 0),
+                ]
+                for record in report["stages"]
+            ],
+        )
+
+        logging.getLogger("MX3.HWR").info(
+            "Startup took %.1f s (%.1f s importing), profile written to %s\n%s"
+            % (report["total_time"], report["total_import_time"], fpath, table)
+        )
+
+
+STARTUP_PROFILER = StartupProfiler()
@@ -0,0 +1,361 @@
+"""
+Persistence of the queue (queue_to_dict representation) as versioned
+snapshots plus an append-only journal of the samples changed since.
+"""
+import json
+import os
+import pickle
+import re
+import sqlite3
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Version of the snapshot format, stored in each snapshot
+FORMAT_VERSION = 1
+
+
+def _to_builtin(obj):
+    # numpy scalars (i.e in task parameters) are saved as Python numbers
+    try:
+        return obj.item()
+    except AttributeError:
+        raise TypeError("Can not serialize %r" % (obj,))
+
+
+class JSONSerializer:
+    name = "json"
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(",", ":"), default=_to_builtin).encode(
+            "utf-8"
+        )
+
+    def loads(self, data):
+        return json.loads(data.decode("utf-8"))
+
+    def join_records(self, records):
+        # One record per line, json.dumps never outputs a new line
+        return b"".join(record + b"\n" for record in records)
+
+    def split_records(self, data):
+        return [self.loads(line) for line in data.splitlines() if line.strip()]
+
+
+class MsgpackSerializer:
+    name = "msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("The msgpack queue store format requires msgpack")
+
+    def dumps(self, obj):
+        return msgpack.packb(obj, use_bin_type=True, default=_to_builtin)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+    def join_records(self, records):
+        return b"".join(records)
+
+    def split_records(self, data):
+        unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+        unpacker.feed(data)
+
+        return list(unpacker)
+
+
+SERIALIZERS = {"json": JSONSerializer, "msgpack": MsgpackSerializer}
+
+
+class QueueStore:
+    """
+    Base class of the queue stores. A queue is saved under a key (i.e the
+    proposal) as a snapshot, and then incrementally: each save only appends
+    the top level entries of the queue dictionary (samples and the sample
+    order) that changed, or were removed, since the previous save to a
+    journal. The journal is folded into a new snapshot once it has more
+    records than the queue has entries (and at least compact_min).
+
+    Loading reads the snapshot and replays the journal. Replaying is
+    idempotent, an interrupted compaction does not lose or corrupt data.
+
+    Subclasses implement the storage primitives: _read_snapshot,
+    _write_snapshot, _read_journal, _append_journal and _clear_journal.
+    """
+
+    def __init__(self, serializer="json", compact_min=100):
+        """
+        :param str serializer: Format of the stored data, json or msgpack
+        :param int compact_min: Minimum number of journal records before a
+                                new snapshot is written
+        """
+        self.serializer = SERIALIZERS[serializer]()
+        self.compact_min = compact_min
+        # Serialized records of the last queue saved under each key
+        self._records = {}
+        self._journal_length = {}
+
+    def _record(self, op, name, value=None):
+        return self.serializer.dumps([op, name, value])
+
+    def save(self, key, queue):
+        """
+        :param str key: Key to save the queue under
+        :param dict queue: Queue, as returned by Queue.queue_to_dict
+        """
+        records = {
+            name: self._record("set", name, value) for name, value in queue.items()
+        }
+        previous = self._records.get(key)
+
+        if previous is None:
+            self._snapshot(key, queue)
+        else:
+            changes = [r for name, r in records.items() if previous.get(name) != r]
+            changes.extend(
+                self._record("del", name) for name in previous if name not in records
+            )
+
+            if changes:
+                self._append_journal(key, self.serializer.join_records(changes))
+                self._journal_length[key] = self._journal_length.get(key, 0) + len(
+                    changes
+                )
+
+            if self._journal_length.get(key, 0) > max(self.compact_min, len(records)):
+                self._snapshot(key, queue)
+
+        self._records[key] = records
+
+    def _snapshot(self, key, queue):
+        snapshot = {"format": FORMAT_VERSION, "queue": queue}
+        self._write_snapshot(key, self.serializer.dumps(snapshot))
+        self._clear_journal(key)
+        self._journal_length[key] = 0
+
+    def load(self, key):
+        """
+        :param str key: Key the queue was saved under
+        :returns: Queue dictionary, None if no queue was saved under key
+        :raises ValueError: If the snapshot has an unknown format version
+        """
+        data = self._read_snapshot(key)
+        journal = self._read_journal(key)
+
+        if data is None and not journal:
+            return None
+
+        queue = {}
+
+        if data is not None:
+            snapshot = self.serializer.loads(data)
+
+            if snapshot.get("format") != FORMAT_VERSION:
+                raise ValueError(
+                    "Unknown queue snapshot format %s" % snapshot.get("format")
+                )
+
+            queue = snapshot["queue"]
+
+        for op, name, value in self.serializer.split_records(journal or b""):
+            if op == "set":
+                queue[name] = value
+            else:
+                queue.pop(name, None)
+
+        return queue
+
+    def _read_snapshot(self, key):
+        raise NotImplementedError
+
+    def _write_snapshot(self, key, data):
+        raise NotImplementedError
+
+    def _read_journal(self, key):
+        raise NotImplementedError
+
+    def _append_journal(self, key, data):
+        raise NotImplementedError
+
+    def _clear_journal(self, key):
+        raise NotImplementedError
+
+
+class FileQueueStore(QueueStore):
+    """
+    Stores each queue as two files in a directory, <key>.snapshot and
+    <key>.journal
+    """
+
+    def __init__(self, path, serializer="json", compact_min=100):
+        """
+        :param str path: Directory of the files, created if needed
+        """
+        super().__init__(serializer, compact_min)
+        self.path = path
+        os.makedirs(path, mode=0o700, exist_ok=True)
+
+    def _fpath(self, key, ext):
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", str(key))
+        return os.path.join(self.path, "%s.%s" % (name, ext))
+
+    def _read(self, fpath):
+        try:
+            with open(fpath, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _read_snapshot(self, key):
+        return self._read(self._fpath(key, "snapshot"))
+
+    def _write_snapshot(self, key, data):
+        fpath = self._fpath(key, "snapshot")
+
+        # Replaced atomically, a reader never sees a partial snapshot
+        with open(fpath + ".tmp", "wb") as f:
+            f.write(data)
+
+        os.replace(fpath + ".tmp", fpath)
+
+    def _read_journal(self, key):
+        return self._read(self._fpath(key, "journal"))
+
+    def _append_journal(self, key, data):
+        with open(self._fpath(key, "journal"), "ab") as f:
+            f.write(data)
+
+    def _clear_journal(self, key):
+        try:
+            os.remove(self._fpath(key, "journal"))
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteQueueStore(QueueStore):
+    """
+    Stores the queues in a SQLite database, one table for the snapshots and
+    one for the journal records
+    """
+
+    def __init__(self, path, serializer="json", compact_min=100):
+        """
+        :param str path: Path of the database file, created if needed
+        """
+        super().__init__(serializer, compact_min)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS snapshot (key TEXT PRIMARY KEY, data BLOB)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS journal "
+                "(id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, data BLOB)"
+            )
+
+    def _read_snapshot(self, key):
+        row = self._db.execute(
+            "SELECT data FROM snapshot WHERE key = ?", (key,)
+        ).fetchone()
+
+        return bytes(row[0]) if row else None
+
+    def _write_snapshot(self, key, data):
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO snapshot (key, data) VALUES (?, ?)", (key, data)
+            )
+
+    def _read_journal(self, key):
+        rows = self._db.execute(
+            "SELECT data FROM journal WHERE key = ? ORDER BY id", (key,)
+        ).fetchall()
+
+        return b"".join(bytes(row[0]) for row in rows)
+
+    def _append_journal(self, key, data):
+        with self._db:
+            self._db.execute(
+                "INSERT INTO journal (key, data) VALUES (?, ?)", (key, data)
+            )
+
+    def _clear_journal(self, key):
+        with self._db:
+            self._db.execute("DELETE FROM journal WHERE key = ?", (key,))
+
+
+class RedisQueueStore(QueueStore):
+    """
+    Stores the queues in redis, the snapshot in <key>:snapshot and the
+    journal as a list in <key>:journal. The connection is opened on first
+    use.
+    """
+
+    def __init__(
+        self, url="redis://localhost:6379/0", serializer="json", compact_min=100
+    ):
+        """
+        :param str url: URL of the redis database
+        """
+        super().__init__(serializer, compact_min)
+        self.url = url
+        self._redis = None
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            import redis
+
+            self._redis = redis.Redis.from_url(self.url)
+
+        return self._redis
+
+    def _read_snapshot(self, key):
+        return self.redis.get("%s:snapshot" % key)
+
+    def _write_snapshot(self, key, data):
+        self.redis.set("%s:snapshot" % key, data)
+
+    def _read_journal(self, key):
+        return b"".join(self.redis.lrange("%s:journal" % key, 0, -1))
+
+    def _append_journal(self, key, data):
+        self.redis.rpush("%s:journal" % key, data)
+
+    def _clear_journal(self, key):
+        self.redis.delete("%s:journal" % key)
+
+    def load_pickled(self, key):
+        """
+        Loads a queue saved by previous versions of MXCuBE, pickled in a
+        single redis key
+
+        :param str key: Key the queue was saved under
+        :returns: Queue dictionary, None if no queue was saved under key
+        """
+        data = self.redis.get(key)
+
+        return pickle.loads(data) if data else None
+
+
+QUEUE_STORES = {
+    "file": FileQueueStore,
+    "sqlite": SQLiteQueueStore,
+    "redis": RedisQueueStore,
+}
+
+
+def create_queue_store(backend, path, serializer="json"):
+    """
+    :param str backend: file, sqlite or redis
+    :param str path: Directory (file), database file (sqlite) or URL (redis)
+    :param str serializer: json or msgpack
+    :returns: QueueStore
+    """
+    return QUEUE_STORES[backend](path, serializer)
@@ -0,0 +1,251 @@
+class ShapeChangeTracker:
+    """
+    Keeps the state of the shapes last sent to the clients, so that only the
+    shapes added, changed or deleted since then are sent. Each update that
+    changes something increments the version, clients apply an update only
+    if it is based on the version they have and otherwise ask for the full
+    state (resync).
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._shapes = {}
+
+    @staticmethod
+    def _equal(a, b):
+        try:
+            return bool(a == b)
+        except ValueError:
+            # Values that can't be compared as a whole (i.e numpy arrays)
+            return False
+
+    def update(self, shapes):
+        """
+        :param dict shapes: Shape id: shape dictionary (Shape.as_dict) of all
+                            the current shapes
+        :returns: Tuple (changed, deleted), changed is a dictionary with the
+                  shapes added or changed and deleted a list with the ids of
+                  the shapes removed since the last update
+        """
+        changed = {
+            sid: shape
+            for sid, shape in shapes.items()
+            if not self._equal(self._shapes.get(sid), shape)
+        }
+        deleted = [sid for sid in self._shapes if sid not in shapes]
+
+        if changed or deleted:
+            self.version += 1
+
+        self._shapes = dict(shapes)
+
+        return changed, deleted
+
+    def reset(self):
+        """
+        Forgets the state sent, the next update contains all shapes
+        """
+        self._shapes = {}
+        self.version += 1
+
+
+class ShapeIndex:
+    """
+    Spatial index of the shapes on the screen, for hit testing. Each shape
+    is put in the square buckets of bucket_size pixels its bounding box
+    overlaps, so that a query only tests the shapes near the point.
+
+    Shapes are given as dictionaries (Shape.as_dict), points (t == "P") by
+    their screen_coord, lines (t == "L") by the screen_coord of their two
+    refs and grids (t == "G") by their top left corner, number of cells and
+    cell size and spacing. The cell size and spacing are in um, converted to
+    pixels with the pixels per mm given to build, as done by the UI
+    (DrawGridPlugin).
+    """
+
+    # Shapes returned first when several overlap, smallest on top
+    _ORDER = {"P": 0, "L": 1, "G": 2}
+
+    def __init__(self, bucket_size=64, tolerance=8):
+        """
+        :param int bucket_size: Size of the buckets [pixels]
+        :param float tolerance: Distance from a point or line within which
+                                it is hit [pixels]
+        """
+        self.bucket_size = bucket_size
+        self.tolerance = tolerance
+        self._buckets = {}
+        self._shapes = {}
+        self._pixels_per_mm = (1.0, 1.0)
+
+    def __len__(self):
+        return len(self._shapes)
+
+    def _bounds(self, shape, shapes):
+        t = shape.get("t")
+        tol = self.tolerance
+
+        try:
+            if t == "G":
+                x, y = shape["screen_coord"]
+                cell_w, cell_h, h_space, v_space = self._grid_cell_size(shape)
+                width = shape["num_cols"] * (cell_w + h_space)
+                height = shape["num_rows"] * (cell_h + v_space)
+                return (x, y, x + width, y + height), (cell_w, cell_h, h_space, v_space)
+
+            if t == "L":
+                p1, p2 = (shapes[ref]["screen_coord"] for ref in shape["refs"][:2])
+                bounds = (
+                    min(p1[0], p2[0]) - tol,
+                    min(p1[1], p2[1]) - tol,
+                    max(p1[0], p2[0]) + tol,
+                    max(p1[1], p2[1]) + tol,
+                )
+                return bounds, (p1, p2)
+
+            x, y = shape["screen_coord"]
+            return (x - tol, y - tol, x + tol, y + tol), (x, y)
+        except (KeyError, TypeError, ValueError):
+            return None, None
+
+    def _grid_cell_size(self, shape):
+        """
+        :returns: Tuple (cell width, cell height, horizontal spacing,
+                  vertical spacing) of grid shape [pixels]
+        """
+        ppm_x, ppm_y = self._pixels_per_mm
+
+        return (
+            shape["cell_width"] / 1000.0 * ppm_x,
+            shape["cell_height"] / 1000.0 * ppm_y,
+            shape.get("cell_h_space", 0) / 1000.0 * ppm_x,
+            shape.get("cell_v_space", 0) / 1000.0 * ppm_y,
+        )
+
+    def build(self, shapes, pixels_per_mm=(1.0, 1.0)):
+        """
+        :param dict shapes: Shape id: shape dictionary of all shapes
+        :param tuple pixels_per_mm: Horizontal and vertical pixels per mm of
+                                    the screen, to convert grid cell sizes
+        """
+        self._buckets = {}
+        self._shapes = {}
+        self._pixels_per_mm = tuple(pixels_per_mm)
+        size = float(self.bucket_size)
+
+        for sid, shape in shapes.items():
+            bounds, geometry = self._bounds(shape, shapes)
+
+            if bounds is None:
+                continue
+
+            self._shapes[sid] = (shape, bounds, geometry)
+            x0, y0, x1, y1 = (int(v // size) for v in bounds)
+
+            for bx in range(x0, x1 + 1):
+                for by in range(y0, y1 + 1):
+                    self._buckets.setdefault((bx, by), []).append(sid)
+
+    @staticmethod
+    def _segment_distance(x, y, p1, p2):
+        dx, dy = p2[0] - p1[0], p2[1] - p1[1]
+        length2 = dx * dx + dy * dy
+        u = 0 if length2 == 0 else ((x - p1[0]) * dx + (y - p1[1]) * dy) / length2
+        u = min(max(u, 0), 1)
+
+        return ((x - p1[0] - u * dx) ** 2 + (y - p1[1] - u * dy) ** 2) ** 0.5
+
+    @staticmethod
+    def _cell_number(col, row, num_cols, num_rows, count_fun):
+        """
+        :returns: Number (from 1) of the cell at col, row with the cell
+                  counting of the grid, the same as the UI (countCells)
+        """
+        if count_fun == "zig-zag":
+            if row % 2:
+                return num_cols * (row + 1) - col
+
+            return col + 1 + row * num_cols
+
+        if count_fun == "top-down-zig-zag":
+            if col % 2:
+                return num_rows * (col + 1) - row
+
+            return row + 1 + col * num_rows
+
+        if count_fun == "top-down":
+            return row + 1 + col * num_rows
+
+        if count_fun == "inverse-zig-zag":
+            if col != num_cols - 1 and (num_cols - col + 1) % 2:
+                return num_rows * num_cols - col * num_rows + row - num_rows + 1
+
+            return num_rows * num_cols - col * num_rows - row
+
+        return col + 1 + row * num_cols
+
+    def _grid_cell(self, x, y, shape, cell_size):
+        """
+        :returns: Number of the cell of grid shape at x, y, None if between
+                  cells
+        """
+        gx, gy = shape["screen_coord"]
+        cell_w, cell_h, h_space, v_space = cell_size
+        cell_tw, cell_th = cell_w + h_space, cell_h + v_space
+
+        if cell_tw <= 0 or cell_th <= 0:
+            return None
+
+        col, row = int((x - gx) // cell_tw), int((y - gy) // cell_th)
+        num_cols, num_rows = shape["num_cols"], shape["num_rows"]
+
+        if not (0 <= col < num_cols and 0 <= row < num_rows):
+            return None
+
+        # Cells are drawn centred in their slot, half the spacing on each side
+        dx = x - gx - col * cell_tw - h_space / 2.0
+        dy = y - gy - row * cell_th - v_space / 2.0
+
+        if not (0 <= dx <= cell_w and 0 <= dy <= cell_h):
+            return None
+
+        return self._cell_number(
+            col, row, num_cols, num_rows, shape.get("cell_count_fun")
+        )
+
+    def query(self, x, y):
+        """
+        :param float x: Horizontal screen coordinate
+        :param float y: Vertical screen coordinate
+        :returns: List of (shape id, shape type, cell) of the shapes at x, y,
+                  points first, then lines and grids. cell is the grid cell
+                  number for grids, None otherwise
+        """
+        size = float(self.bucket_size)
+        hits = []
+
+        for sid in self._buckets.get((int(x // size), int(y // size)), []):
+            shape, (x0, y0, x1, y1), geometry = self._shapes[sid]
+
+            if not (x0 <= x <= x1 and y0 <= y <= y1):
+                continue
+
+            t = shape.get("t")
+            cell = None
+
+            if t == "L":
+                if self._segment_distance(x, y, *geometry) > self.tolerance:
+                    continue
+            elif t == "G":
+                try:
+                    cell = self._grid_cell(x, y, shape, geometry)
+                except (KeyError, TypeError):
+                    pass
+            elif (x - geometry[0]) ** 2 + (y - geometry[1]) ** 2 > self.tolerance ** 2:
+                continue
+
+            hits.append((sid, t, cell))
+
+        hits.sort(key=lambda hit: self._ORDER.get(hit[1], len(self._ORDER)))
+
+        return hits
@@ -1,10 +1,13 @@
 import os
 import json
+import time
 
 from flask import Blueprint, Response, jsonify, request
 
 from mxcubecore import HardwareRepository as HWR
 
+from mxcube3.core.util.networkutils import remote_addr
+
 
 def init_route(app, server, url_prefix):
     bp = Blueprint("sampleview", __name__, url_prefix=url_prefix)
@@ -14,18 +17,58 @@ def init_route(app, server, url_prefix):
     def subscribe_to_camera():
         """
         Subscribe to the camera streaming
+            :parameter fps: Optional maximum frame rate for this client
+            :parameter variant: Optional stream variant (i.e full, half,
+                                quarter) as configured in server.yaml
             :response: image as html Content-type
+            :statuscode: 400: unknown variant
         """
+        variant = request.args.get("variant", None)
+
         if app.CONFIG.app.VIDEO_FORMAT == "MPEG1":
             result = Response(status=200)
+        elif variant and variant not in app.sample_view.video_stream_variants:
+            result = Response("Unknown variant %s" % variant, status=400)
         else:
-            frame = app.sample_view.stream_video(HWR.beamline.sample_view.camera)
+            frame = app.sample_view.stream_video(
+                HWR.beamline.sample_view.camera,
+                remote_addr(),
+                request.args.get("fps", None, type=float),
+                variant,
+            )
             result = Response(
                 frame, mimetype='multipart/x-mixed-replace; boundary="!>"'
             )
 
         return result
 
+    @bp.route("/camera/stats", methods=["GET"])
+    @server.restrict
+    def camera_stream_stats():
+        """
+        Camera frame rate, variants of the camera stream, frame counters and
+        latency of its clients and status of the MPEG1 streaming processes.
+        Times are in seconds, latency is measured from the reception of the
+        frame from the camera to its hand over to the web server.
+            :response Content-type:application/json, example:
+            { "capture": {"fps": 25.1, "frames": 1310, "lastFrameAge": 0.02,
+              "decodeTime": 0.006},
+              "variants": [{"name": "half", "scale": 0.5, "quality": 60,
+              "encoded": 1240, "encodeTime": 0.004, "subscribers": 1}],
+              "subscribers": [{"id": 1, "name": "127.0.0.1", "maxFps": null,
+              "fps": 24.8, "delivered": 1240, "dropped": 3, "dropRate": 0.002,
+              "queued": 0, "latency": 0.012, "maxLatency": 0.08,
+              "variant": "half"}],
+              "streaming": {"time": 1697540000.0, "processes": [{"name":
+              "ffmpeg", "pid": 1234, "alive": true, "restarts": 0,
+              "uptime": 520.3, "cpu_time": 130.2}], "controllers": [],
+              "relay": {"time": 1697540000.0, "clients": 2,
+              "bytesPerSecond": 1250000}}
+            }
+            :statuscode: 200: no error
+        """
+        return jsonify(app.sample_view.video_stream_stats())
+
     @bp.route("/camera/unsubscribe", methods=["PUT"])
     @server.restrict
     def unsubscribe_to_camera():
@@ -46,14 +89,49 @@ def init_route(app, server, url_prefix):
         or directly use the user/proposal path
         Return: 'True' if command issued succesfully, otherwise 'False'.
         """
+        path = os.path.join(os.path.dirname(__file__), "snapshots/")
+
         try:
-            HWR.beamline.sample_view.camera.takeSnapshot(
-                os.path.join(os.path.dirname(__file__), "snapshots/")
+            # Served from the frame buffer when possible, no new capture
+            fname = os.path.join(
+                path, "snapshot_%s.jpeg" % time.strftime("%Y%m%d-%H%M%S")
             )
+
+            if not app.sample_view.save_frame(fname):
+                HWR.beamline.sample_view.camera.takeSnapshot(path)
+
             return "True"
         except Exception:
             return "False"
 
+    @bp.route("/camera/frame", methods=["GET"])
+    @server.restrict
+    def get_camera_frame():
+        """
+        JPEG of the first camera frame received at or after a given time,
+        served from the frame buffer
+            :parameter after: Optional time (seconds since the epoch),
+                              defaults to now
+            :parameter timeout: Optional maximum time to wait for the frame [s]
+            :response Content-type: image/jpeg, the X-Frame-Time header has
+                                    the time the frame was received
+            :statuscode: 200: no error
+            :statuscode: 404: no frame received in time or no frame buffer
+        """
+        after = request.args.get("after", type=float)
+        timeout = min(request.args.get("timeout", 1, type=float), 10)
+
+        frame = app.sample_view.get_frame(after, timeout)
+
+        if frame is None:
+            return Response(status=404)
+
+        frame_time, jpeg = frame
+        resp = Response(jpeg, mimetype="image/jpeg")
+        resp.headers["X-Frame-Time"] = "%.3f" % frame_time
+
+        return resp
+
     @bp.route("/camera", methods=["GET"])
     @server.restrict
     def get_image_data():
@@ -119,6 +197,27 @@ def init_route(app, server, url_prefix):
         resp.status_code = 200
         return resp
 
+    @bp.route("/shapes/at", methods=["GET"])
+    @server.restrict
+    def get_shapes_at():
+        """
+        Shapes at a point of the sample view
+            :parameter x: horizontal screen coordinate
+            :parameter y: vertical screen coordinate
+            :response Content-type: application/json, shapes on top first,
+            example: {"shapes": [{"id": "P1", "t": "P", "cell": null},
+            {"id": "G1", "t": "G", "cell": 42}]}
+            :statuscode: 200: no error
+            :statuscode: 400: x or y missing
+        """
+        x = request.args.get("x", type=float)
+        y = request.args.get("y", type=float)
+
+        if x is None or y is None:
+            return Response(status=400)
+
+        return jsonify({"shapes": app.sample_view.shapes_at(x, y)})
+
     @bp.route("/shapes/<sid>", methods=["GET"])
     @server.restrict
     def get_shape_with_sid(sid):
@@ -154,6 +253,41 @@ def init_route(app, server, url_prefix):
         app.sample_view.shape_add_cell_result(sid, cell_number, result)
         return Response(status=200)
 
+    @bp.route("/shapes/<sid>/results", methods=["POST"])
+    @server.restrict
+    def shape_add_cell_results(sid):
+        """
+        Update the result data of several cells at once.
+            :parameter cells: list of cell numbers, starting at 1
+            :parameter values: list with the value of each cell
+            :parameter colors: optional list with the [r, g, b, a] colour of
+                               each cell, computed from the values if omitted
+            :parameter resultType: optional, heatmap (default) or crystalmap
+            :response Content-type: application/json, {"version": 12}
+            :statuscode: 200: no error
+            :statuscode: 400: missing or invalid cells, values or colors
+            :statuscode: 409: no grid with id sid
+        """
+        params = request.get_json(silent=True)
+
+        if not isinstance(params, dict) or not {"cells", "values"} <= set(params):
+            return Response(status=400)
+
+        try:
+            version = app.sample_view.shape_add_cell_results(
+                sid,
+                params["cells"],
+                params["values"],
+                params.get("colors"),
+                params.get("resultType", "heatmap"),
+            )
+        except KeyError:
+            return Response(status=409)
+        except (ValueError, TypeError):
+            return Response(status=400)
+
+        return jsonify({"version": version})
+
     @bp.route("/shapes", methods=["POST"])
     @server.require_control
     @server.restrict
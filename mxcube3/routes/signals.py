@@ -16,26 +16,89 @@ from mxcubecore.HardwareObjects import queue_model_objects as qmo
 from mxcubecore.HardwareObjects import queue_entry as qe
 
 from mxcube3.core.util.convertutils import to_camel
-from mxcube3.core.util.networkutils import RateLimited
+from mxcube3.core.util.networkutils import Throttled
 
 from mxcubecore import HardwareRepository as HWR
 
 
-def last_queue_node():
-    node = HWR.beamline.queue_manager._current_queue_entries[
-        -1
-    ].get_data_model()
+class QueueEntryContext:
+    """
+    Context (node, progress information) of the executing queue entries. The
+    context is created once when an entry starts and re-used by the
+    collection callbacks, that are called for each image. The position of
+    the node is looked up on each use (node_index is cached by the queue),
+    as tasks can be moved or deleted during the execution. Entries are
+    nested (i.e a data collection within a sample), the context of the
+    innermost executing entry is the current one.
+    """
+
+    def __init__(self):
+        # List of (entry, context), innermost entry last
+        self._contexts = []
+
+    def update(self, entry):
+        """
+        Creates the context for queue entry <entry>, that has started
+
+        :param QueueEntry entry: Started entry
+        """
+        node = entry.get_data_model()
+
+        # Reference collections are orphans, the node we want is the
+        # characterisation not the reference collection itself
+        if "refdc" in node.get_name():
+            parent = node.get_parent()
+            node = parent._children[0]
+
+        res = {"node": node}
+        res["interleaved"] = mxcube.queue.is_interleaved(node)
+        res["num_images"] = None
+
+        if not res["interleaved"]:
+            try:
+                res["num_images"] = mxcube.queue.get_task_num_images(node)
+            except (AttributeError, IndexError):
+                pass
+
+        self.remove(entry)
+        self._contexts.append((entry, res))
+
+    def get(self):
+        """
+        :returns: The context of the currently executing queue entry, None
+                  if no entry is executing. A dictionary on the form:
+                {'sample': sample, 'idx': index, 'queue_id': node_id,
+                 'sample_node': sample_node, 'node': node,
+                 'interleaved': bool, 'num_images': total number of images}
+        """
+        if not self._contexts:
+            return None
 
-    # Reference collections are orphans, the node we want is the
-    # characterisation not the reference collection itself
-    if "refdc" in node.get_name():
-        parent = node.get_parent()
-        node = parent._children[0]
+        context = self._contexts[-1][1]
+        res = mxcube.queue.node_index(context["node"])
+        res.update(context)
 
-    res = mxcube.queue.node_index(node)
-    res["node"] = node
+        return res
 
-    return res
+    def remove(self, entry):
+        """
+        Removes the context of queue entry <entry>, that has finished
+        """
+        self._contexts = [(e, c) for e, c in self._contexts if e is not entry]
+
+    def clear(self):
+        self._contexts = []
+
+
+QUEUE_ENTRY_CONTEXT = QueueEntryContext()
+
+
+def last_queue_node():
+    """
+    :returns: Context of the executing queue entry, see QueueEntryContext.get,
+              None if the queue is not executing (i.e late signals)
+    """
+    return QUEUE_ENTRY_CONTEXT.get()
 
 
 beam_signals = ["beamPosChanged", "beamInfoChanged", "valueChanged", "stateChanged"]
@@ -276,6 +339,7 @@ def update_task_result(entry):
 
 
 def queue_execution_entry_started(entry, message=None):
+    QUEUE_ENTRY_CONTEXT.update(entry)
     handle_auto_mount_next(entry)
 
     if not mxcube.queue.is_interleaved(entry.get_data_model()):
@@ -283,6 +347,7 @@ def queue_execution_entry_started(entry, message=None):
 
 
 def queue_execution_entry_finished(entry, message):
+    QUEUE_ENTRY_CONTEXT.remove(entry)
     handle_auto_mount_next(entry)
 
     if not mxcube.queue.is_interleaved(entry.get_data_model()):
@@ -308,6 +373,7 @@ def queue_execution_finished(entry, queue_state=None):
     state = queue_state if queue_state else mxcube.queue.queue_exec_state()
     msg = {"Signal": state, "Message": "Queue execution stopped"}
 
+    QUEUE_ENTRY_CONTEXT.clear()
     mxcube.queue.enable_sample_entries(mxcube.TEMP_DISABLED, True)
     mxcube.TEMP_DISABLED = []
 
@@ -341,7 +407,10 @@ def queue_execution_failed(entry):
 def collect_oscillation_started(*args):
     node = last_queue_node()
 
-    if not mxcube.queue.is_interleaved(node["node"]):
+    if node is None:
+        return
+
+    if not node["interleaved"]:
         msg = {
             "Signal": "collectOscillationStarted",
             "Message": task_signals["collectOscillationStarted"],
@@ -363,8 +432,13 @@ def collect_oscillation_started(*args):
 def collect_image_taken(frame):
     node = last_queue_node()
 
-    if not mxcube.queue.is_interleaved(node["node"]):
-        progress = mxcube.queue.get_task_progress(last_queue_node()["node"], frame)
+    if node is None:
+        return
+
+    if not node["interleaved"]:
+        progress = mxcube.queue.get_task_progress(
+            node["node"], frame, num_images=node["num_images"]
+        )
 
         msg = {
             "Signal": "collectImageTaken",
@@ -381,7 +455,7 @@ def collect_image_taken(frame):
             logging.getLogger("HWR").error("error sending message: " + str(msg))
 
 
-@RateLimited(1)
+@Throttled(1, key=lambda msg: msg["queueID"])
 def _emit_progress(msg):
     logging.getLogger("HWR").debug("[TASK CALLBACK] " + str(msg))
     server.emit("task", msg, namespace="/hwr")
@@ -392,9 +466,15 @@ def collect_oscillation_failed(
 ):
     node = last_queue_node()
 
+    if node is None:
+        return
+
     mxcube.NODE_ID_TO_LIMS_ID[node["queue_id"]] = lims_id
 
-    if not mxcube.queue.is_interleaved(node["node"]):
+    if not node["interleaved"]:
+        # A pending progress message would set the task back to running
+        _emit_progress.cancel(node["queue_id"])
+
         try:
             HWR.beamline.lims_rest.get_dc(lims_id)
         except BaseException:
@@ -420,9 +500,14 @@ def collect_oscillation_failed(
 
 def collect_oscillation_finished(owner, status, state, lims_id, osc_id, params):
     node = last_queue_node()
+
+    if node is None:
+        return
+
     mxcube.NODE_ID_TO_LIMS_ID[node["queue_id"]] = lims_id
 
-    if not mxcube.queue.is_interleaved(node["node"]):
+    if not node["interleaved"]:
+        _emit_progress.cancel(node["queue_id"])
         mxcube.queue.enable_entry(node["queue_id"], False)
 
         msg = {
@@ -446,7 +531,11 @@ def collect_oscillation_finished(owner, status, state, lims_id, osc_id, params):
 def collect_ended(owner, success, message):
     node = last_queue_node()
 
-    if not mxcube.queue.is_interleaved(node["node"]):
+    if node is None:
+        return
+
+    if not node["interleaved"]:
+        _emit_progress.cancel(node["queue_id"])
         state = COLLECTED if success else WARNING
 
         msg = {
@@ -470,14 +559,17 @@ def collect_ended(owner, success, message):
 def collect_started(*args, **kwargs):
     node = last_queue_node()
 
-    if not mxcube.queue.is_interleaved(node["node"]):
+    if node is None:
+        return
+
+    if not node["interleaved"]:
 
         msg = {
             "Signal": kwargs["signal"],
             "Message": task_signals[kwargs["signal"]],
-            "taskIndex": last_queue_node()["idx"],
-            "queueID": last_queue_node()["queue_id"],
-            "sample": last_queue_node()["sample"],
+            "taskIndex": node["idx"],
+            "queueID": node["queue_id"],
+            "sample": node["sample"],
             "state": RUNNING,
             "progress": 0,
         }
@@ -494,6 +586,14 @@ def grid_result_available(shape):
     server.emit("grid_result_available", {"shape": shape}, namespace="/hwr")
 
 
+def grid_cell_results_available(sid, version, cells):
+    server.emit(
+        "grid_cell_results",
+        {"id": sid, "version": version, "cells": cells},
+        namespace="/hwr",
+    )
+
+
 def energy_scan_finished(pk, ip, rm, sample):
     server.emit("energy_scan_result", {"pk": pk, "ip": ip, "rm": rm}, namespace="/hwr")
 
@@ -501,6 +601,9 @@ def energy_scan_finished(pk, ip, rm, sample):
 def queue_interleaved_started():
     node = last_queue_node()
 
+    if node is None:
+        return
+
     msg = {
         "Signal": "queue_interleaved_started",
         "Message": "Interleaved collection started",
@@ -522,6 +625,9 @@ def queue_interleaved_started():
 def queue_interleaved_finished():
     node = last_queue_node()
 
+    if node is None:
+        return
+
     msg = {
         "Signal": "queue_interleaved_finished",
         "Message": "Interleaved collection ended",
@@ -542,6 +648,10 @@ def queue_interleaved_finished():
 
 def queue_interleaved_sw_done(data):
     node = last_queue_node()
+
+    if node is None:
+        return
+
     progress = mxcube.queue.get_task_progress(node["node"], data)
 
     msg = {
@@ -565,6 +675,9 @@ def queue_interleaved_sw_done(data):
 def xrf_task_progress(taskId, progress):
     node = last_queue_node()
 
+    if node is None:
+        return
+
     msg = {
         "Signal": "XRFTaskUpdate",
         "Message": "XRFTaskUpdate",
@@ -673,13 +786,15 @@ def new_plot(plot_info):
         logging.getLogger("HWR").error("error sending new_plot message: %s", plot_info)
 
 
-@RateLimited(1)
-def plot_data(data, last_index=[0], **kwargs):
+@Throttled(1, key=lambda data, *args, **kwargs: data["id"])
+def plot_data(data, last_index={}, **kwargs):
     data_data = data["data"]
-    if last_index[0] > len(data_data):
-        last_index = [0]
+    plot_id = data["id"]
+
+    if last_index.get(plot_id, 0) > len(data_data):
+        last_index[plot_id] = 0
 
-    data["data"] = data_data[last_index[0] :]
+    data["data"] = data_data[last_index.get(plot_id, 0) :]
 
     try:
         server.emit("plot_data", data, namespace="/hwr")
@@ -688,7 +803,7 @@ def plot_data(data, last_index=[0], **kwargs):
             "error sending plot_data message for plot %s", data["id"]
         )
     else:
-        last_index[0] += len(data_data)
+        last_index[plot_id] = len(data_data)
 
 
 def plot_end(data):
@@ -21,10 +21,23 @@ def init_route(app, server, url_prefix):
 
     @bp.route("/mesh_result/<gid>/<t>", methods=["GET"])
     # @server.restrict
-    def get_grid_data(gid, t, rand):
-        res = send_file(
-            io.BytesIO(app.workflow.get_mesh_result(gid, t)), mimetype="image/png"
-        )
+    def get_grid_data(gid, t):
+        """
+        PNG image of the results of grid gid
+            :parameter t: result type, heatmap or crystalmap
+            :response Content-type: image/png, with an ETag header
+            :statuscode: 200: no error
+            :statuscode: 304: not modified (If-None-Match matches the ETag)
+        """
+        etag, data = app.workflow.get_mesh_result(gid, t)
+
+        if etag in request.if_none_match:
+            res = Response(status=304)
+        else:
+            res = send_file(io.BytesIO(data), mimetype="image/png")
+
+        res.set_etag(etag)
+        res.headers["Cache-Control"] = "no-cache"
 
         return res
 
@@ -16,6 +16,8 @@ import flask_security
 from spectree import SpecTree
 
 from mxcube3.core.util import networkutils
+from mxcube3.core.util.emitbus import EmitBus
+from mxcube3.video.streaming_processes import VIDEO_PID_FILE
 from mxcube3.core.components.user.database import init_db, UserDatastore
 from mxcube3.core.models.usermodels import User, Role, Message
 
@@ -28,6 +30,7 @@ class Server:
     api = None
     user_datastore = None
     db_session = None
+    emit_bus = None
 
     @staticmethod
     def exception_handler(e):
@@ -41,16 +44,26 @@ class Server:
         # of non zero exit code, so we dont kill the processes
         # when running the tests
         if not Server.flask.testing:
-            with open("/tmp/mxcube.pid", "r") as f:
-                pid_list = f.read().strip()
-                pid_list = pid_list.split(" ")
-                pid_list.reverse()
+            pid_list = []
 
-            with open("/tmp/mxcube.pid", "w") as f:
-                f.write("")
+            # Video processes first, the server itself last
+            for fpath in (VIDEO_PID_FILE, "/tmp/mxcube.pid"):
+                try:
+                    with open(fpath, "r") as f:
+                        pids = f.read().strip().split(" ")
+                except FileNotFoundError:
+                    continue
+
+                with open(fpath, "w") as f:
+                    f.write("")
+
+                pid_list.extend(reversed(pids))
 
             for pid in pid_list:
-                os.kill(int(pid), signal.SIGKILL)
+                try:
+                    os.kill(int(pid), signal.SIGKILL)
+                except (ProcessLookupError, ValueError):
+                    pass
 
     @staticmethod
     def init(cmdline_options, cfg, mxcube):
@@ -82,6 +95,14 @@ class Server:
         )
         Server.flask_socketio.init_app(Server.flask)
 
+        if cfg.flask.EMIT_BATCH_INTERVAL > 0:
+            Server.emit_bus = EmitBus(
+                Server.flask_socketio.emit,
+                cfg.flask.EMIT_BATCH_INTERVAL,
+                cfg.flask.EMIT_PRIORITY_EVENTS,
+                cfg.flask.EMIT_BATCH_NAMESPACES,
+            )
+
         Server.api = SpecTree(
             "flask",
             app=Server.flask,
@@ -99,6 +120,10 @@ class Server:
             with open("/tmp/mxcube.pid", "w") as f:
                 f.write(str(os.getpid()) + " ")
 
+            # Pids left by a previous run may now belong to other processes
+            with open(VIDEO_PID_FILE, "w") as f:
+                f.write("")
+
             # Make the valid_login_only decorator available on server object
             Server.restrict = staticmethod(networkutils.login_required)
             Server.require_control = staticmethod(networkutils.require_control)
@@ -194,7 +219,10 @@ class Server:
 
     @staticmethod
     def emit(*args, **kwargs):
-        Server.flask_socketio.emit(*args, **kwargs)
+        if Server.emit_bus:
+            Server.emit_bus.emit(*args, **kwargs)
+        else:
+            Server.flask_socketio.emit(*args, **kwargs)
 
     @staticmethod
     def run():
@@ -0,0 +1,367 @@
+"""Distribution of video frames to several subscribers (i.e MJPEG clients)."""
+# -*- coding: utf-8 -*-
+import collections
+import itertools
+import time
+
+import gevent.queue
+
+from mxcube3.video import frameutils
+
+
+def _average(average, value, weight=0.1):
+    """
+    :returns: Exponential moving average updated with value
+    """
+    return value if average is None else average + weight * (value - average)
+
+
+class FrameRate:
+    """
+    Frame rate over the last frames
+    """
+
+    def __init__(self, window=50):
+        """
+        :param int window: Number of frames the rate is computed over
+        """
+        self.frames = 0
+        self._times = collections.deque(maxlen=window)
+
+    def tick(self, t=None):
+        """
+        :param float t: Time of the frame, defaults to now
+        """
+        self.frames += 1
+        self._times.append(time.time() if t is None else t)
+
+    @property
+    def last(self):
+        return self._times[-1] if self._times else None
+
+    @property
+    def fps(self):
+        if len(self._times) < 2:
+            return 0
+
+        elapsed = self._times[-1] - self._times[0]
+
+        return (len(self._times) - 1) / elapsed if elapsed > 0 else 0
+
+
+class FrameSubscriber:
+    """
+    Subscriber of a FrameBroadcaster, receives the frames published through a
+    bounded queue. When the queue is full the oldest frame is dropped, so that
+    a slow subscriber only loses frames and never delays the others.
+    """
+
+    def __init__(self, broadcaster, _id, name="", max_fps=None, queue_size=2):
+        """
+        :param FrameBroadcaster broadcaster: Broadcaster publishing the frames
+        :param int _id: Subscriber id
+        :param str name: Name of the subscriber (i.e remote address)
+        :param float max_fps: Maximum number of frames per second, None for
+                              no limit
+        :param int queue_size: Maximum number of frames waiting to be sent
+        """
+        self.id = _id
+        self.name = name
+        self.max_fps = max_fps
+        self.delivered = 0
+        self.dropped = 0
+        self.latency = None
+        self.max_latency = 0
+        self._broadcaster = broadcaster
+        self._queue = gevent.queue.Queue(max(1, queue_size))
+        self._min_interval = 1.0 / max_fps if max_fps else 0
+        self._last_put = 0
+        self._t0 = time.time()
+
+    def put(self, frame, captured=None):
+        """
+        Queues frame, unless the frame rate of the subscriber is exceeded
+
+        :param bytes frame: Frame
+        :param float captured: Time the frame was captured, used to measure
+                               the latency, defaults to now
+        """
+        now = time.time()
+
+        if now - self._last_put < self._min_interval:
+            self.dropped += 1
+            return
+
+        if self._queue.full():
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except gevent.queue.Empty:
+                pass
+
+        self._queue.put_nowait((frame, now if captured is None else captured))
+        self._last_put = now
+
+    def frames(self):
+        """
+        Generator of the frames published to this subscriber, blocks until a
+        new frame is available.
+        """
+        while True:
+            frame, captured = self._queue.get()
+            self.delivered += 1
+
+            # Time between capture and hand over to the server, the time
+            # spent in the network is not included
+            latency = time.time() - captured
+            self.latency = _average(self.latency, latency)
+            self.max_latency = max(self.max_latency, latency)
+
+            yield frame
+
+    def close(self):
+        self._broadcaster.unsubscribe(self)
+
+    def stats(self):
+        """
+        :returns: Dictionary with the frame counters of this subscriber
+        """
+        elapsed = time.time() - self._t0
+        total = self.delivered + self.dropped
+
+        return {
+            "id": self.id,
+            "name": self.name,
+            "maxFps": self.max_fps,
+            "fps": self.delivered / elapsed if elapsed > 0 else 0,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "dropRate": self.dropped / total if total else 0,
+            "queued": self._queue.qsize(),
+            "latency": self.latency,
+            "maxLatency": self.max_latency,
+        }
+
+
+class FrameBroadcaster:
+    """
+    Publishes each frame once to all the subscribers
+    """
+
+    def __init__(self, queue_size=2):
+        """
+        :param int queue_size: Default size of the subscriber queues
+        """
+        self._queue_size = queue_size
+        self._subscribers = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def num_subscribers(self):
+        return len(self._subscribers)
+
+    def subscribe(self, name="", max_fps=None, queue_size=None):
+        """
+        :param str name: Name of the subscriber (i.e remote address)
+        :param float max_fps: Maximum number of frames per second, None for
+                              no limit
+        :param int queue_size: Maximum number of frames waiting to be sent,
+                               defaults to the broadcaster queue size
+
+        :returns: FrameSubscriber
+        """
+        subscriber = FrameSubscriber(
+            self,
+            next(self._ids),
+            name,
+            max_fps,
+            queue_size if queue_size else self._queue_size,
+        )
+        self._subscribers[subscriber.id] = subscriber
+
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.pop(subscriber.id, None)
+
+    def publish(self, frame, captured=None):
+        """
+        :param bytes frame: Frame to send to all subscribers
+        :param float captured: Time the frame was captured
+        """
+        for subscriber in list(self._subscribers.values()):
+            subscriber.put(frame, captured)
+
+    def stats(self):
+        """
+        :returns: List with the frame counters of each subscriber
+        """
+        return [subscriber.stats() for subscriber in self._subscribers.values()]
+
+
+class StreamVariant:
+    """
+    Scaled and/or quality reduced variant of a video stream, encoded once
+    per frame for all its subscribers
+    """
+
+    def __init__(self, name, scale=1, quality=None, queue_size=2):
+        """
+        :param str name: Name of the variant
+        :param float scale: Scale factor of the frames
+        :param int quality: JPEG quality, None to use the quality of the
+                            original frame
+        :param int queue_size: Default size of the subscriber queues
+        """
+        self.name = name
+        self.scale = scale
+        self.quality = quality
+        self.encoded = 0
+        self.encode_time = None
+        self.broadcaster = FrameBroadcaster(queue_size)
+
+    @property
+    def is_original(self):
+        return self.scale == 1 and self.quality is None
+
+    def encode(self, image):
+        """
+        :param PIL.Image image: Full size frame
+        :returns: JPEG data of the variant
+        """
+        t0 = time.time()
+        jpeg = frameutils.encode_jpeg(
+            image, self.quality if self.quality else 75, scale=self.scale
+        )
+        self.encoded += 1
+        self.encode_time = _average(self.encode_time, time.time() - t0)
+
+        return jpeg
+
+
+class VariantBroadcaster:
+    """
+    Publishes frames to subscribers of several stream variants. Each frame is
+    decoded at most once and encoded once per variant that has subscribers,
+    the encoding cost does not depend on the number of subscribers.
+    """
+
+    def __init__(self, variants, queue_size=2):
+        """
+        :param dict variants: Variant name: (scale, quality)
+        :param int queue_size: Default size of the subscriber queues
+        """
+        self._variants = {
+            name: StreamVariant(name, scale, quality, queue_size)
+            for name, (scale, quality) in variants.items()
+        }
+        self.capture_rate = FrameRate()
+        self.decode_time = None
+
+    @property
+    def variants(self):
+        return list(self._variants.keys())
+
+    @property
+    def num_subscribers(self):
+        return sum(v.broadcaster.num_subscribers for v in self._variants.values())
+
+    def subscribe(self, variant, name="", max_fps=None, queue_size=None):
+        """
+        :param str variant: Name of the variant
+        :param str name: Name of the subscriber (i.e remote address)
+        :param float max_fps: Maximum number of frames per second
+        :param int queue_size: Maximum number of frames waiting to be sent
+
+        :returns: FrameSubscriber
+        :raises KeyError: If there is no variant with that name
+        """
+        subscriber = self._variants[variant].broadcaster.subscribe(
+            name, max_fps, queue_size
+        )
+        subscriber.variant = variant
+
+        return subscriber
+
+    def frame_captured(self):
+        """
+        Records the capture of a frame, whether published or not
+
+        :returns: Time of the capture
+        """
+        captured = time.time()
+        self.capture_rate.tick(captured)
+
+        return captured
+
+    def publish(self, jpeg=None, image=None, captured=None):
+        """
+        Publishes a frame, given either as JPEG data or as PIL.Image, to the
+        subscribers of all variants
+
+        :param bytes jpeg: JPEG data of the frame
+        :param PIL.Image image: Frame
+        :param float captured: Time the frame was captured (frame_captured)
+        """
+        for variant in self._variants.values():
+            if not variant.broadcaster.num_subscribers:
+                continue
+
+            if jpeg is not None and variant.is_original:
+                frame = jpeg
+            else:
+                if image is None:
+                    t0 = time.time()
+                    image = frameutils.decode_jpeg(jpeg)
+                    self.decode_time = _average(self.decode_time, time.time() - t0)
+
+                frame = variant.encode(image)
+
+                if variant.is_original:
+                    jpeg = frame
+
+            variant.broadcaster.publish(frame, captured)
+
+    def stats(self):
+        """
+        :returns: List with the frame counters of each subscriber
+        """
+        stats = []
+
+        for variant in self._variants.values():
+            for subscriber_stats in variant.broadcaster.stats():
+                subscriber_stats["variant"] = variant.name
+                stats.append(subscriber_stats)
+
+        return stats
+
+    def variant_stats(self):
+        """
+        :returns: List with the settings, number of encoded frames and number
+                  of subscribers of each variant
+        """
+        return [
+            {
+                "name": v.name,
+                "scale": v.scale,
+                "quality": v.quality,
+                "encoded": v.encoded,
+                "encodeTime": v.encode_time,
+                "subscribers": v.broadcaster.num_subscribers,
+            }
+            for v in self._variants.values()
+        ]
+
+    def capture_stats(self):
+        """
+        :returns: Dictionary with the frame rate of the camera, the time
+                  since the last frame and the mean JPEG decoding time [s]
+        """
+        last = self.capture_rate.last
+
+        return {
+            "fps": self.capture_rate.fps,
+            "frames": self.capture_rate.frames,
+            "lastFrameAge": time.time() - last if last else None,
+            "decodeTime": self.decode_time,
+        }
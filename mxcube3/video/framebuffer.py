@@ -0,0 +1,109 @@
+"""Ring buffer of the last frames received from the camera."""
+# -*- coding: utf-8 -*-
+import collections
+import time
+
+import gevent
+import gevent.event
+
+from mxcube3.video import frameutils
+
+
+class FrameBuffer:
+    """
+    Keeps the last frames received from the camera, with the time they were
+    received, so that snapshots can be served from memory instead of
+    triggering a new capture.
+
+    Frames are stored as received, JPEG data, PIL.Image or RawFrame, and
+    converted only when requested. A RawFrame keeps a reference to the
+    QImage emitted by the camera, Qt copies the pixels of a shared QImage
+    before they are changed (except for images wrapping external memory).
+    """
+
+    def __init__(self, size=5):
+        """
+        :param int size: Number of frames kept
+        """
+        self._frames = collections.deque(maxlen=max(1, size))
+        self._new_frame = gevent.event.Event()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def append(self, frame, t=None):
+        """
+        :param frame: JPEG data (bytes), PIL.Image or frameutils.RawFrame
+        :param float t: Time the frame was received, defaults to now
+        """
+        self._frames.append((time.time() if t is None else t, frame))
+
+        # Wake up the greenlets waiting for a frame
+        new_frame, self._new_frame = self._new_frame, gevent.event.Event()
+        new_frame.set()
+
+    def latest(self):
+        """
+        :returns: Tuple (time, frame) of the last frame, None if empty
+        """
+        return self._frames[-1] if self._frames else None
+
+    def frame_at(self, t=None, timeout=1):
+        """
+        First frame received at or after time t, waits for the next frame if
+        there is none yet
+
+        :param float t: Time, defaults to now (the next frame)
+        :param float timeout: Maximum time to wait for a frame [s]
+        :returns: Tuple (time, frame), None if no frame was received in time
+        """
+        t = time.time() if t is None else t
+        deadline = time.time() + timeout
+
+        while True:
+            for frame_time, frame in self._frames:
+                if frame_time >= t:
+                    return frame_time, frame
+
+            remaining = deadline - time.time()
+
+            if remaining <= 0 or not self._new_frame.wait(remaining):
+                return None
+
+    def image_at(self, t=None, timeout=1):
+        """
+        Same as frame_at, the frame is returned as PIL.Image
+
+        :returns: Tuple (time, PIL.Image), None if no frame was received in time
+        """
+        result = self.frame_at(t, timeout)
+
+        if result is None:
+            return None
+
+        frame_time, frame = result
+
+        if isinstance(frame, bytes):
+            frame = frameutils.decode_jpeg(frame)
+        else:
+            frame = frameutils.to_image(frame)
+
+        return frame_time, frame
+
+    def jpeg_at(self, t=None, timeout=1, quality=95):
+        """
+        Same as frame_at, the frame is returned as JPEG data
+
+        :returns: Tuple (time, bytes), None if no frame was received in time
+        """
+        result = self.frame_at(t, timeout)
+
+        if result is None:
+            return None
+
+        frame_time, frame = result
+
+        if not isinstance(frame, bytes):
+            frame = frameutils.encode_jpeg(frameutils.to_image(frame), quality)
+
+        return frame_time, frame
@@ -0,0 +1,137 @@
+"""Conversion of raw video frames to JPEG."""
+# -*- coding: utf-8 -*-
+import collections
+import io
+
+import gevent
+import PIL.Image
+
+
+# Frame received from the camera and not converted yet, img is a QImage or
+# an object supporting the buffer protocol, see qimage_buffer
+RawFrame = collections.namedtuple("RawFrame", ["img", "width", "height"])
+
+
+def qimage_buffer(img):
+    """
+    Memory view of the pixel data of a frame. No copy is made for objects
+    supporting the buffer protocol (i.e numpy arrays, bytearray) and for
+    PyQt QImages, whose bits() is a sip.voidptr sized with setsize. Other
+    Qt bindings may return a copy of the pixels from bits().
+
+    :param img: QImage (Format_RGB32 or Format_ARGB32) or object supporting
+                the buffer protocol
+    :returns: memoryview
+    """
+    try:
+        return memoryview(img)
+    except TypeError:
+        pass
+
+    try:
+        num_bytes = img.sizeInBytes()
+    except AttributeError:
+        try:
+            num_bytes = img.byteCount()
+        except AttributeError:
+            num_bytes = img.numBytes()
+
+    bits = img.constBits() if hasattr(img, "constBits") else img.bits()
+
+    if hasattr(bits, "setsize"):
+        bits.setsize(num_bytes)
+
+    return memoryview(bits)
+
+
+def to_pil_image(data, width, height):
+    """
+    PIL image from a 32 bit BGRX/BGRA frame (the memory layout of a 32 bit
+    QImage on little endian machines). The channels are reordered while
+    the pixels are unpacked into the image, the frame is read only once and
+    copied only into the image, not into intermediate buffers.
+
+    :param data: Object supporting the buffer protocol (i.e memoryview,
+                 numpy array) with the pixel data
+    :param int width: Width of the frame
+    :param int height: Height of the frame
+    :returns: PIL.Image in RGB mode
+    """
+    return PIL.Image.frombuffer(
+        "RGB", (width, height), memoryview(data).cast("B"), "raw", "BGRX", 0, 1
+    )
+
+
+def to_image(frame):
+    """
+    :param frame: PIL.Image, RawFrame, or array (i.e numpy) with the pixels
+                  of a grey (height x width) or RGB (height x width x 3) frame
+    :returns: PIL.Image
+    """
+    if isinstance(frame, PIL.Image.Image):
+        return frame
+
+    if isinstance(frame, RawFrame):
+        return to_pil_image(qimage_buffer(frame.img), frame.width, frame.height)
+
+    return PIL.Image.fromarray(frame)
+
+
+def _decode_jpeg(data):
+    image = PIL.Image.open(io.BytesIO(data))
+    image.load()
+
+    return image
+
+
+def decode_jpeg(data, threaded=True):
+    """
+    :param bytes data: JPEG data
+    :param bool threaded: Decode in a worker thread
+    :returns: Decoded PIL.Image
+    """
+    if threaded:
+        return gevent.get_hub().threadpool.apply(_decode_jpeg, (data,))
+
+    return _decode_jpeg(data)
+
+
+def scale_image(image, scale):
+    """
+    :param PIL.Image image: Image to scale
+    :param float scale: Scale factor
+    :returns: Scaled image, image itself if scale is 1
+    """
+    if scale == 1:
+        return image
+
+    size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+
+    return image.resize(size, PIL.Image.BILINEAR)
+
+
+def _encode_jpeg(image, quality, scale=1):
+    buf = io.BytesIO()
+    scale_image(image, scale).save(buf, "JPEG", quality=quality)
+
+    return buf.getvalue()
+
+
+def encode_jpeg(image, quality=75, threaded=True, scale=1):
+    """
+    Encodes image as JPEG, in the gevent thread pool if threaded so that
+    the event loop is not blocked during the encoding.
+
+    :param PIL.Image image: Image to encode
+    :param int quality: JPEG quality (1-95)
+    :param bool threaded: Encode in a worker thread
+    :param float scale: Scale factor applied before encoding
+    :returns: JPEG data
+    :rtype: bytes
+    """
+    if threaded:
+        return gevent.get_hub().threadpool.apply(
+            _encode_jpeg, (image, quality, scale)
+        )
+
+    return _encode_jpeg(image, quality, scale)
@@ -1,79 +1,669 @@
 """Utileties for starting video encoding and streaming."""
 # -*- coding: utf-8 -*-
+import json
+import logging
 import os
+import signal
+import socket
 import subprocess
 import sys
 import time
 import uuid
 
 
+# Pids of the supervisor and of its current processes, rewritten when a
+# process is (re)started
+VIDEO_PID_FILE = "/tmp/mxcube-video.pid"
+RELAY_STREAM_PORT = 4041
+RELAY_WEBSOCKET_PORT = 4042
+
+# Environment variable with the encoder configuration (JSON), set by the
+# MXCuBE server from server.yaml before the streaming is started
+ENCODER_CONFIG_ENV = "MXCUBE_VIDEO_ENCODER"
+
+# Encoder settings, qscale is the fixed quantizer (2-31, lower is better
+# quality and higher bitrate) and gop the number of frames between key frames.
+#
+# Cost of each preset measured with test/benchmarks/bench_encoder_presets.py
+# (1280x1024 YUYV test pattern, ffmpeg 7.0, one x86_64 core, CPU time
+# including the generation of the test pattern):
+#
+#   preset      CPU [% of a core]  bitrate [Mb/s]
+#   quality     32 - 33            13.1
+#   latency     31 - 34             7.9
+#   bandwidth   24 - 27             3.1
+#
+# latency costs about as much CPU as quality for 40 % less bitrate, its
+# coarser quantizer compensating the more frequent key frames, bandwidth
+# saves about a quarter of the CPU time and 75 % of the bitrate.
+ENCODER_PRESETS = {
+    # Best image quality, the settings used before presets were introduced
+    "quality": {
+        "framerate": 30,
+        "qscale": 2,
+        "gop": 12,
+        "input_flags": [],
+        "output_flags": [],
+    },
+    # Frames are sent to the relay as soon as they are encoded, short GOP
+    # so that clients connecting or recovering from a loss get a picture fast
+    "latency": {
+        "framerate": 30,
+        "qscale": 5,
+        "gop": 6,
+        "input_flags": ["-fflags", "nobuffer"],
+        "output_flags": ["-bf", "0", "-flush_packets", "1"],
+    },
+    # Lower frame rate and coarser quantization, for many or remote clients.
+    # MPEG-1 only encodes the frame rates of its fixed table (23.976, 24, 25,
+    # 29.97, 30, 50, 59.94 and 60), ffmpeg refuses others (i.e 15). A lower
+    # rate needs frames dropped with -vf fps= from a lower input rate
+    "bandwidth": {
+        "framerate": 24,
+        "qscale": 10,
+        "gop": 30,
+        "input_flags": [],
+        "output_flags": [],
+    },
+}
+
+DEFAULT_ENCODER_PRESET = "quality"
+
+
 def monitor(*processes):
     """
     Monitor processes, terminate all processes if one dies.
 
     :param processes: processes to monitor
     """
-    while True:
-        if all([p.poll() is None for p in processes]):
-            time.sleep(1)
+    while all([p.poll() is None for p in processes]):
+        time.sleep(1)
 
     for p in processes:
-        p.terminate()
+        if p.poll() is None:
+            p.terminate()
 
 
-def start(device, scale, _hash):
+def status_path(_hash):
     """
-    Start encoding and streaming from device video_device.
+    :param str _hash: Secret of the relay stream
+    :returns: Path of the status file written by the supervisor
+    """
+    return "/tmp/mxcube-streaming-%s.json" % _hash
 
-    :param str device: The path to the device to stream from
-    :returns: Tupple with the two processes performing streaming and encoding
-    :rtype: tuple
+
+def relay_stats_path(_hash):
+    """
+    :param str _hash: Secret of the relay stream
+    :returns: Path of the stats file written by the relay
+    """
+    return "/tmp/mxcube-relay-%s.json" % _hash
+
+
+def read_status(_hash):
+    """
+    Status of the streaming processes of the stream _hash, as written by the
+    supervisor, and the client count and throughput written by the relay
+
+    :param str _hash: Secret of the relay stream
+    :returns: Dictionary with the keys time, processes, controllers and
+              relay, None if the streaming is not running
+    """
+    try:
+        with open(status_path(_hash)) as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        with open(relay_stats_path(_hash)) as f:
+            status["relay"] = json.load(f)
+    except (OSError, ValueError):
+        status["relay"] = None
+
+    return status
+
+
+def _cpu_time(pid):
+    """
+    :param int pid: Process id
+    :returns: User and system CPU time [s] used by the process, None if not
+              available (process gone or no /proc)
+    """
+    try:
+        with open("/proc/%s/stat" % pid) as f:
+            # The command name (field 2) can contain spaces, skip past it
+            fields = f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+
+    # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+    return (int(fields[11]) + int(fields[12])) / float(os.sysconf("SC_CLK_TCK"))
+
+
+def wait_for_port(port, timeout=10, host="localhost", process=None):
+    """
+    Waits until a TCP connection can be made to host:port
+
+    :param int port: Port
+    :param float timeout: Maximum time to wait [s]
+    :param str host: Host
+    :param subprocess.Popen process: Stop waiting if this process exits
+    :returns: True if the port is open, False otherwise
+    """
+    t0 = time.time()
+
+    while time.time() - t0 < timeout:
+        if process is not None and process.poll() is not None:
+            return False
+
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.05)
+
+    return False
+
+
+class SupervisedProcess:
+    """
+    Process started, probed for readiness and restarted by a Supervisor
+    """
+
+    def __init__(self, name, command, ready=None, ready_timeout=10):
+        """
+        :param str name: Name of the process
+        :param list command: Command line, passed to subprocess.Popen, can
+                             be changed before a restart
+        :param callable ready: Called with the process once started, returns
+                               True when the process is ready to be used
+        :param float ready_timeout: Time given to ready [s]
+        """
+        self.name = name
+        self.command = command
+        self.ready = ready
+        self.ready_timeout = ready_timeout
+        self.process = None
+        self.restarts = 0
+        self.started_at = None
+        self.cpu_time = 0
+        self._cpu_time_last = 0
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """
+        Starts the process and waits until it is ready
+
+        :returns: True if the process is ready, False otherwise
+        """
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stderr=subprocess.STDOUT, shell=False
+        )
+        self.started_at = time.time()
+        self._cpu_time_last = 0
+
+        if self.ready:
+            return self.ready(self)
+
+        return self.alive()
+
+    def stop(self, timeout=2):
+        """
+        Terminates the process, kills it if it did not exit within timeout
+
+        :param float timeout: Time given to the process to exit [s]
+        """
+        if not self.alive():
+            return
+
+        self.update_cpu_time()
+        self.process.terminate()
+
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def update_cpu_time(self):
+        """
+        Accumulates the CPU time of the process, over restarts
+        """
+        cpu_time = _cpu_time(self.pid) if self.alive() else None
+
+        if cpu_time is not None:
+            self.cpu_time += cpu_time - self._cpu_time_last
+            self._cpu_time_last = cpu_time
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "pid": self.pid,
+            "alive": self.alive(),
+            "restarts": self.restarts,
+            "uptime": time.time() - self.started_at if self.alive() else 0,
+            "cpu_time": self.cpu_time,
+        }
+
+
+class Supervisor:
+    """
+    Starts processes in order and restarts those that exit, with an
+    exponential backoff for processes that keep on failing.
+    """
+
+    def __init__(
+        self,
+        processes,
+        status_file=None,
+        poll_interval=0.1,
+        min_backoff=0.1,
+        max_backoff=10,
+        stable_time=10,
+        controllers=(),
+        pid_file=None,
+    ):
+        """
+        :param list processes: SupervisedProcess to start, in order
+        :param str status_file: File to which the process stats are written
+                                (JSON), None to not write them
+        :param float poll_interval: Interval at which processes are checked [s]
+        :param float min_backoff: Delay before the first restart [s]
+        :param float max_backoff: Maximum delay between restarts [s]
+        :param float stable_time: Time after which a running process is
+                                  considered stable, resetting its backoff [s]
+        :param controllers: Objects with an update and a stats method, update
+                            is called every second (i.e AdaptiveEncoding)
+        :param str pid_file: File to which the pid of the supervisor and of
+                             the running processes are written, None to not
+                             write them
+        """
+        self.processes = processes
+        self.status_file = status_file
+        self.poll_interval = poll_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_time = stable_time
+        self.controllers = controllers
+        self.pid_file = pid_file
+        self._backoff = {p.name: min_backoff for p in processes}
+        self._restart_at = {}
+        self._running = False
+        self._pids = None
+
+    def start(self):
+        for p in self.processes:
+            if not p.start():
+                logging.getLogger().warning("%s not ready after start" % p.name)
+
+        self.write_pids()
+
+    def write_pids(self):
+        """
+        Rewrites pid_file if the pids of the processes changed, so that it
+        only contains the pids of running processes
+        """
+        pids = [os.getpid()] + [p.pid for p in self.processes if p.alive()]
+
+        if self.pid_file and pids != self._pids:
+            with open(self.pid_file, "w") as f:
+                f.write("".join("%s " % pid for pid in pids))
+
+            self._pids = pids
+
+    def stop(self, *args):
+        self._running = False
+
+        for p in reversed(self.processes):
+            p.stop()
+
+        self.write_status()
+
+    def stats(self):
+        return [p.stats() for p in self.processes]
+
+    def write_status(self):
+        if self.status_file:
+            with open(self.status_file, "w") as f:
+                json.dump(
+                    {
+                        "time": time.time(),
+                        "processes": self.stats(),
+                        "controllers": [c.stats() for c in self.controllers],
+                    },
+                    f,
+                )
+
+    def _check(self, p):
+        now = time.time()
+
+        if p.alive():
+            p.update_cpu_time()
+
+            if now - p.started_at > self.stable_time:
+                self._backoff[p.name] = self.min_backoff
+
+            return
+
+        if p.name not in self._restart_at:
+            self._restart_at[p.name] = now + self._backoff[p.name]
+            logging.getLogger().warning(
+                "%s exited with %s, restarting in %.1f s"
+                % (p.name, p.process.returncode, self._backoff[p.name])
+            )
+        elif now >= self._restart_at[p.name]:
+            del self._restart_at[p.name]
+            self._backoff[p.name] = min(self._backoff[p.name] * 2, self.max_backoff)
+            p.restarts += 1
+            p.start()
+
+    def run(self, status_interval=5):
+        """
+        Supervises the processes until stop is called (i.e on SIGTERM)
+
+        :param float status_interval: Interval at which the status file is
+                                      written [s]
+        """
+        self._running = True
+        last_status = 0
+        last_update = 0
+
+        while self._running:
+            for p in self.processes:
+                self._check(p)
+
+            self.write_pids()
+
+            if time.time() - last_update > 1:
+                for controller in self.controllers:
+                    controller.update()
+
+                last_update = time.time()
+
+            if time.time() - last_status > status_interval:
+                self.write_status()
+                last_status = time.time()
+
+            time.sleep(self.poll_interval)
+
+
+class AdaptiveEncoding:
+    """
+    Switches the encoder to a degraded preset when the relay reports more
+    clients or a higher outbound throughput than configured, and back once
+    the load has been low for a while.
     """
+
+    def __init__(
+        self,
+        encoder,
+        make_command,
+        preset,
+        degraded_preset,
+        relay_stats_file,
+        max_clients=4,
+        max_throughput=4e6,
+        hold_time=5,
+        recover_time=30,
+    ):
+        """
+        :param SupervisedProcess encoder: Encoder process
+        :param callable make_command: Returns the encoder command line for a
+                                      preset name
+        :param str preset: Preset used under normal load
+        :param str degraded_preset: Preset used under high load
+        :param str relay_stats_file: File written every second by the relay
+        :param int max_clients: Number of clients above which the load is high
+        :param float max_throughput: Outbound throughput above which the load
+                                     is high [bytes/s]
+        :param float hold_time: Time the load has to be high before the
+                                encoder is degraded [s]
+        :param float recover_time: Time the load has to be below half of the
+                                   limits before the encoder is restored [s]
+        """
+        self.encoder = encoder
+        self.make_command = make_command
+        self.preset = preset
+        self.degraded_preset = degraded_preset
+        self.relay_stats_file = relay_stats_file
+        self.max_clients = max_clients
+        self.max_throughput = max_throughput
+        self.hold_time = hold_time
+        self.recover_time = recover_time
+        self.degraded = False
+        self.relay_stats = {}
+        self._since = None
+
+    def _read_relay_stats(self):
+        try:
+            with open(self.relay_stats_file) as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Ignore stats not written recently, the relay might be restarting
+        if time.time() - stats.get("time", 0) > 5:
+            return None
+
+        return stats
+
+    def update(self):
+        stats = self._read_relay_stats()
+
+        if stats is None:
+            self._since = None
+            return
+
+        self.relay_stats = stats
+        clients = stats.get("clients", 0)
+        throughput = stats.get("bytesPerSecond", 0)
+
+        if self.degraded:
+            change = clients <= self.max_clients / 2 and (
+                throughput <= self.max_throughput / 2
+            )
+            delay = self.recover_time
+        else:
+            change = clients > self.max_clients or throughput > self.max_throughput
+            delay = self.hold_time
+
+        if not change:
+            self._since = None
+        elif self._since is None:
+            self._since = time.time()
+        elif time.time() - self._since >= delay:
+            self._since = None
+            self.degraded = not self.degraded
+            self._apply()
+
+    def _apply(self):
+        preset = self.degraded_preset if self.degraded else self.preset
+        logging.getLogger().warning(
+            "Switching %s to preset %s (relay: %s)"
+            % (self.encoder.name, preset, self.relay_stats)
+        )
+
+        self.encoder.command = self.make_command(preset)
+        self.encoder.stop()
+        self.encoder.start()
+
+    def stats(self):
+        return {
+            "encoder": self.encoder.name,
+            "preset": self.degraded_preset if self.degraded else self.preset,
+            "degraded": self.degraded,
+            "relay": self.relay_stats,
+        }
+
+
+def relay_command(_hash, stats_file=None):
     fpath = os.path.dirname(__file__)
     websocket_relay_js = os.path.join(fpath, "websocket-relay.js")
 
-    FNULL = open(os.devnull, "w")
+    command = [
+        "node",
+        websocket_relay_js,
+        _hash,
+        str(RELAY_STREAM_PORT),
+        str(RELAY_WEBSOCKET_PORT),
+    ]
 
-    relay = subprocess.Popen(
-        ["node", websocket_relay_js, _hash, "4041", "4042"], shell=False
-    )
+    if stats_file:
+        command.append(stats_file)
 
-    # Make sure that the relay is running (socket is open)
-    time.sleep(2)
+    return command
 
+
+def ffmpeg_command(
+    device,
+    scale,
+    _hash,
+    preset=DEFAULT_ENCODER_PRESET,
+    input_args=None,
+    output=None,
+):
+    """
+    Command line of the encoder
+
+    :param str device: The path to the device to stream from
+    :param tuple scale: Width and height of the stream
+    :param str _hash: Secret of the relay stream
+    :param str preset: Name of the encoder preset, see ENCODER_PRESETS
+    :param list input_args: Input arguments, defaults to the v4l2 device
+    :param str output: Output, defaults to the relay stream
+    :returns: Command line
+    :rtype: list
+    """
+    settings = ENCODER_PRESETS[preset]
     scale = "scale=w=%s:h=%s:force_original_aspect_ratio=decrease" % scale
 
-    ffmpeg = subprocess.Popen(
-        [
-            "ffmpeg",
+    if input_args is None:
+        input_args = [
             "-f",
             "v4l2",
             "-framerate",
-            "30",
+            str(settings["framerate"]),
             "-i",
             device,
+        ]
+
+    if output is None:
+        output = "http://localhost:%s/%s" % (RELAY_STREAM_PORT, _hash)
+
+    return (
+        ["ffmpeg"]
+        + settings["input_flags"]
+        + input_args
+        + [
             "-vf",
             scale,
+            "-r",
+            str(settings["framerate"]),
             "-f",
             "mpegts",
             "-b:v",
             "0k",
             "-q:v",
-            "2",
+            str(settings["qscale"]),
+            "-g",
+            str(settings["gop"]),
             "-an",
             "-vcodec",
             "mpeg1video",
-            "http://localhost:4041/" + _hash,
-        ],
-        stderr=subprocess.STDOUT,
-        stdin=subprocess.PIPE,
-        shell=False,
+        ]
+        + settings["output_flags"]
+        + [output]
     )
 
-    with open("/tmp/mxcube.pid", "a") as f:
-        f.write("%s %s" % (relay.pid, ffmpeg.pid))
 
-    return relay, ffmpeg
+def encoder_config():
+    """
+    :returns: Encoder configuration passed by the MXCuBE server through the
+              environment, see ENCODER_CONFIG_ENV
+    :rtype: dict
+    """
+    try:
+        return json.loads(os.environ.get(ENCODER_CONFIG_ENV, "{}"))
+    except ValueError:
+        logging.getLogger().exception("Invalid %s" % ENCODER_CONFIG_ENV)
+        return {}
+
+
+def supervisor(device, scale, _hash, status_file=None, config=None):
+    """
+    Supervisor of the relay and encoding processes streaming from device.
+
+    :param str device: The path to the device to stream from
+    :param tuple scale: Width and height of the stream
+    :param str _hash: Secret of the relay stream
+    :param str status_file: File to which the process stats are written
+    :param dict config: Encoder configuration, keys: preset, adaptive,
+                        degraded_preset, max_clients and max_throughput
+    :returns: Supervisor, not started
+    """
+    config = config if config else {}
+    preset = config.get("preset", DEFAULT_ENCODER_PRESET)
+
+    if preset not in ENCODER_PRESETS:
+        logging.getLogger().warning(
+            "Unknown encoder preset %s, using %s" % (preset, DEFAULT_ENCODER_PRESET)
+        )
+        preset = DEFAULT_ENCODER_PRESET
+
+    relay_stats_file = relay_stats_path(_hash)
+
+    relay = SupervisedProcess(
+        "relay",
+        relay_command(_hash, relay_stats_file),
+        # The relay is ready when its stream socket is open
+        ready=lambda p: wait_for_port(
+            RELAY_STREAM_PORT, p.ready_timeout, process=p.process
+        ),
+    )
+
+    ffmpeg = SupervisedProcess(
+        "ffmpeg", ffmpeg_command(device, scale, _hash, preset)
+    )
+
+    controllers = []
+
+    if config.get("adaptive", False):
+        controllers.append(
+            AdaptiveEncoding(
+                ffmpeg,
+                lambda _preset: ffmpeg_command(device, scale, _hash, _preset),
+                preset,
+                config.get("degraded_preset", "bandwidth"),
+                relay_stats_file,
+                config.get("max_clients", 4),
+                config.get("max_throughput", 4e6),
+            )
+        )
+
+    return Supervisor(
+        [relay, ffmpeg], status_file, controllers=controllers, pid_file=VIDEO_PID_FILE
+    )
+
+
+def start(device, scale, _hash):
+    """
+    Start encoding and streaming from device video_device.
+
+    :param str device: The path to the device to stream from
+    :returns: Tupple with the two processes performing streaming and encoding
+    :rtype: tuple
+    """
+    _supervisor = supervisor(device, scale, _hash)
+    _supervisor.start()
+
+    return tuple(p.process for p in _supervisor.processes)
 
 
 if __name__ == "__main__":
@@ -94,4 +684,23 @@ if __name__ == "__main__":
     except IndexError:
         _hash = "-1,-1"
 
-    monitor(*start(video_device, scale, _hash))
+    config = encoder_config()
+
+    try:
+        config["preset"] = sys.argv[4].strip()
+    except IndexError:
+        pass
+
+    _supervisor = supervisor(
+        video_device, scale, _hash, status_path(_hash), config
+    )
+
+    def _shutdown(*args):
+        _supervisor.stop()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    _supervisor.start()
+    _supervisor.run()
@@ -11,7 +11,7 @@ var fs = require('fs'),
 if (process.argv.length < 3) {
 	console.log(
 		'Usage: \n' +
-		'node websocket-relay.js <secret> [<stream-port> <websocket-port>]'
+		'node websocket-relay.js <secret> [<stream-port> <websocket-port> <stats-file>]'
 	);
 	process.exit();
 }
@@ -19,6 +19,7 @@ if (process.argv.length < 3) {
 var STREAM_SECRET = process.argv[2],
 	STREAM_PORT = process.argv[3] || 8081,
 	WEBSOCKET_PORT = process.argv[4] || 8082,
+	STATS_FILE = process.argv[5],
 	RECORD_STREAM = false;
 
 // Websocket Server
@@ -39,14 +40,30 @@ socketServer.on('connection', function(socket, upgradeReq) {
 		);
 	});
 });
+socketServer.bytesSent = 0;
 socketServer.broadcast = function(data) {
 	socketServer.clients.forEach(function each(client) {
 		if (client.readyState === WebSocket.OPEN) {
 			client.send(data);
+			socketServer.bytesSent += data.length;
 		}
 	});
 };
 
+// Write the number of clients and the outbound throughput every second,
+// used to adapt the encoding to the load
+if (STATS_FILE) {
+	setInterval(function() {
+		var stats = {
+			time: Date.now() / 1000,
+			clients: socketServer.connectionCount,
+			bytesPerSecond: socketServer.bytesSent
+		};
+		socketServer.bytesSent = 0;
+		fs.writeFile(STATS_FILE, JSON.stringify(stats), function() {});
+	}, 1000);
+}
+
 // HTTP Server to accept incomming MPEG-TS Stream from ffmpeg
 var streamServer = http.createServer( function(request, response) {
 	var params = request.url.substr(1).split('/');
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Time taken to resolve the adapter class of every hardware object of the
+mockup beamline, with an empty and with a filled resolution cache.
+
+    python test/benchmarks/bench_adapter_resolution.py [repeat]
+"""
+import sys
+
+from benchutils import init_app, timeit, print_result
+
+
+def main(repeat=100):
+    init_app()
+
+    from mxcube3 import mxcube
+    from mxcube3.core.util import adapterutils
+
+    hwr = mxcube.mxcubecore.hwr
+    hardware_objects = [
+        ho
+        for ho in map(hwr.get_hardware_object, list(hwr.hardware_objects))
+        if ho
+    ]
+
+    def resolve_all():
+        for ho in hardware_objects:
+            adapterutils.get_adapter_cls_from_hardware_object(ho)
+
+    def resolve_all_uncached():
+        adapterutils._RESOLVED_ADAPTER_CLASSES.clear()
+        resolve_all()
+
+    print("%d hardware objects" % len(hardware_objects))
+    print_result("empty cache", timeit(resolve_all_uncached, repeat), "us")
+    print_result("filled cache", timeit(resolve_all, repeat), "us")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
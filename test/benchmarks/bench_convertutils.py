@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Key conversion of shape dictionaries with to_camel and from_camel, compared
+with the previous recursive conversion without memoisation.
+
+    python test/benchmarks/bench_convertutils.py [num_points] [num_grids]
+"""
+import json
+import re
+import sys
+
+from benchutils import timeit, print_result
+
+from mxcube3.core.util.convertutils import to_camel, from_camel
+
+
+def legacy_str_to_camel(name):
+    if isinstance(name, str):
+        components = name.split("_")
+        name = components[0] + "".join(x.title() for x in components[1:])
+
+    return name
+
+
+def legacy_str_to_snake(name):
+    s = re.sub("(.)([A-Z][a-z]+)", r"\1_\2", name)
+    return re.sub("([a-z0-9])([A-Z])", r"\1_\2", s).lower()
+
+
+def legacy_convert(fun, d):
+    converted = {}
+
+    for key, value in d.items():
+        if isinstance(value, dict):
+            value = legacy_convert(fun, value)
+
+        converted[fun(key)] = value
+
+    return converted
+
+
+def point(i):
+    # Keys of Point.as_dict
+    return {
+        "id": "P%d" % i,
+        "name": "Point %d" % i,
+        "t": "P",
+        "state": "SAVED",
+        "label": "%d" % i,
+        "user_state": "SAVED",
+        "selected": False,
+        "refs": [],
+        "screen_coord": [100 + i, 200 + i],
+        "motor_positions": {
+            "phi": 0.0,
+            "phiy": 0.1,
+            "phiz": 0.2,
+            "sampx": 0.3,
+            "sampy": 0.4,
+            "kappa": 0.0,
+            "kappa_phi": 0.0,
+            "beam_x": 0.0,
+            "beam_y": 0.0,
+        },
+        "pixels_per_mm": [520.0, 520.0],
+        "beam_pos": [640, 512],
+        "beam_width": 0.05,
+        "beam_height": 0.05,
+    }
+
+
+def grid(i, num_cells=20):
+    shape = point(i)
+    shape.update(
+        {
+            "id": "G%d" % i,
+            "t": "G",
+            "num_cols": num_cells,
+            "num_rows": num_cells,
+            "cell_width": 5,
+            "cell_height": 5,
+            "cell_h_space": 0,
+            "cell_v_space": 0,
+            "cell_count_fun": "zig-zag",
+            "motor_positions_center": dict(shape["motor_positions"]),
+            "result": {
+                "heatmap": {
+                    c: [c, [255, 0, 0, 255]] for c in range(1, num_cells ** 2 + 1)
+                }
+            },
+        }
+    )
+
+    return shape
+
+
+def main(num_points=100, num_grids=10):
+    shapes = {"P%d" % i: point(i) for i in range(num_points)}
+    shapes.update({"G%d" % i: grid(i) for i in range(num_grids)})
+    # As received from the clients, JSON keys are strings
+    camel_shapes = json.loads(json.dumps(to_camel(shapes)))
+
+    print("%d points, %d grids" % (num_points, num_grids))
+    print_result(
+        "to_camel (previous)",
+        timeit(lambda: legacy_convert(legacy_str_to_camel, shapes), 50),
+    )
+    print_result("to_camel", timeit(lambda: to_camel(shapes), 50))
+    print_result(
+        "from_camel (previous)",
+        timeit(lambda: legacy_convert(legacy_str_to_snake, camel_shapes), 50),
+    )
+    print_result("from_camel", timeit(lambda: from_camel(camel_shapes), 50))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Conversion of screen coordinates to motor positions, point by point and in
+one batch with ScreenToMotorCalibration. The diffractometer is modelled by
+the centring geometry of GenericDiffractometer (horizontal axis along phiy,
+vertical axis rotated by omega into sampx/sampy).
+
+    python test/benchmarks/bench_coordinate_transforms.py [num_points]
+"""
+import math
+import random
+import sys
+
+import numpy as np
+
+from benchutils import timeit, print_result
+
+from mxcube3.core.util.coordutils import ScreenToMotorCalibration
+
+PIXELS_PER_MM = (520.0, 520.0)
+BEAM_POSITION = (640, 512)
+POSITIONS = {
+    "phi": 32.0,
+    "phiy": 0.12,
+    "phiz": -0.3,
+    "sampx": 0.05,
+    "sampy": -0.02,
+    "kappa": 0.0,
+    "kappa_phi": 0.0,
+    "zoom": "Zoom 2",
+}
+
+
+def get_centred_point_from_coord(x, y):
+    # Same number of operations as in GenericDiffractometer, including the
+    # numpy matrix inversion done for each point
+    phi = math.radians(POSITIONS["phi"])
+    rot = np.matrix(
+        [[math.cos(phi), -math.sin(phi)], [math.sin(phi), math.cos(phi)]]
+    )
+    dx = (x - BEAM_POSITION[0]) / PIXELS_PER_MM[0]
+    dy = (y - BEAM_POSITION[1]) / PIXELS_PER_MM[1]
+    dsampx, dsampy = np.dot(np.array([0, dy]), np.array(rot.I))
+
+    positions = dict(POSITIONS)
+    positions["phiy"] += dx
+    positions["sampx"] += dsampx
+    positions["sampy"] += dsampy
+
+    return positions
+
+
+def main(num_points=100):
+    coords = [
+        (random.uniform(0, 1280), random.uniform(0, 1024)) for _ in range(num_points)
+    ]
+    calibration = ScreenToMotorCalibration(get_centred_point_from_coord)
+    key = (PIXELS_PER_MM, BEAM_POSITION, tuple(sorted(POSITIONS.items())))
+
+    def point_by_point():
+        return [get_centred_point_from_coord(x, y) for x, y in coords]
+
+    def batch():
+        return calibration.to_motor_positions(coords, key, BEAM_POSITION)
+
+    def batch_with_calibration():
+        calibration.invalidate()
+        return batch()
+
+    # Both give the same positions
+    for expected, result in zip(point_by_point(), batch()):
+        for name in ("phiy", "sampx", "sampy"):
+            assert abs(expected[name] - result[name]) < 1e-9
+
+    print("%d points" % num_points)
+    print_result("point by point", timeit(point_by_point))
+    print_result("batch, calibration cached", timeit(batch))
+    print_result("batch, with calibration", timeit(batch_with_calibration))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
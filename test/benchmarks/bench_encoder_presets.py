@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Encoding speed, CPU time and bitrate of the MPEG1 encoder presets. A 1280x1024
+YUYV test pattern (the pixel format of most v4l2 cameras) replaces the
+camera, the stream is written to /dev/null instead of the relay.
+
+    python test/benchmarks/bench_encoder_presets.py [seconds]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from mxcube3.video import streaming_processes
+
+
+def run_preset(preset, seconds, fpath):
+    framerate = streaming_processes.ENCODER_PRESETS[preset]["framerate"]
+    input_args = [
+        "-re",
+        "-f",
+        "lavfi",
+        "-i",
+        "testsrc2=size=1280x1024:rate=%s,format=yuyv422" % framerate,
+        "-t",
+        str(seconds),
+    ]
+    command = streaming_processes.ffmpeg_command(
+        None, (1280, 1024), None, preset, input_args=input_args, output=fpath
+    )
+    command[1:1] = ["-y", "-loglevel", "error"]
+
+    usage_t0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    t0 = time.time()
+    subprocess.run(command, check=True)
+    wall_time = time.time() - t0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    cpu_time = (usage.ru_utime - usage_t0.ru_utime) + (
+        usage.ru_stime - usage_t0.ru_stime
+    )
+
+    return cpu_time, wall_time, os.path.getsize(fpath) * 8 / float(seconds)
+
+
+def main(seconds=10):
+    print("1280x1024 yuyv422 test pattern, %s s per preset" % seconds)
+    print("%-12s %12s %12s %14s" % ("Preset", "CPU [%]", "Wall [s]", "Bitrate [Mb/s]"))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for preset in streaming_processes.ENCODER_PRESETS:
+            fpath = os.path.join(tmpdir, "%s.ts" % preset)
+            cpu_time, wall_time, bitrate = run_preset(preset, seconds, fpath)
+
+            print(
+                "%-12s %12.1f %12.1f %14.2f"
+                % (preset, 100 * cpu_time / wall_time, wall_time, bitrate / 1e6)
+            )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
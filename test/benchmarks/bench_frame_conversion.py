@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Frames per second converted from a raw 32 bit BGRX frame (QImage layout)
+to JPEG, with the previous split/merge conversion and with frameutils.
+
+    python test/benchmarks/bench_frame_conversion.py [width] [height]
+"""
+import io
+import sys
+
+import numpy as np
+import PIL.Image
+
+from benchutils import timeit
+
+from mxcube3.video import frameutils
+
+
+def legacy_conversion(rawdata, width, height):
+    strbuf = io.BytesIO()
+    image = PIL.Image.frombytes("RGBA", (width, height), rawdata)
+    (r, g, b, a) = image.split()
+    image = PIL.Image.merge("RGB", (b, g, r))
+    image.save(strbuf, "JPEG")
+
+    return strbuf.getvalue()
+
+
+def main(width=1280, height=1024):
+    # Smooth gradient with some noise, closer to a camera image than random data
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.empty((height, width, 4), dtype=np.uint8)
+    frame[..., 0] = (x * 255 // width).astype(np.uint8)
+    frame[..., 1] = (y * 255 // height).astype(np.uint8)
+    frame[..., 2] = np.random.randint(0, 16, (height, width), dtype=np.uint8)
+    frame[..., 3] = 255
+
+    def legacy():
+        legacy_conversion(frame.tobytes(), width, height)
+
+    def fast_path():
+        image = frameutils.to_pil_image(frame, width, height)
+        frameutils.encode_jpeg(image, threaded=False)
+
+    def fast_path_threaded():
+        image = frameutils.to_pil_image(frame, width, height)
+        frameutils.encode_jpeg(image)
+
+    print("%dx%d frames" % (width, height))
+
+    for label, fun in [
+        ("split/merge (previous)", legacy),
+        ("frameutils", fast_path),
+        ("frameutils, encoded in thread", fast_path_threaded),
+    ]:
+        best, mean = timeit(fun, 50)
+        print("%-40s %8.1f fps (best %8.1f fps)" % (label, 1 / mean, 1 / best))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
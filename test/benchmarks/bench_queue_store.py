@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Saving and loading the queue with the queue stores (snapshot + journal),
+compared with pickling the whole queue dictionary as previously done.
+
+    python test/benchmarks/bench_queue_store.py [num_samples] [num_tasks]
+"""
+import itertools
+import os
+import pickle
+import sys
+import tempfile
+
+from benchutils import init_app, populate_queue, timeit, print_result
+
+from mxcube3.core.util import queuestore
+
+
+def main(num_samples=1000, num_tasks=1):
+    client = init_app()
+    populate_queue(client, num_samples, num_tasks)
+
+    from mxcube3 import mxcube
+
+    queue_dict = mxcube.queue.queue_to_dict()
+    sid = queue_dict["sample_order"][0]
+    counter = itertools.count()
+    tmpdir = tempfile.mkdtemp()
+
+    formats = ["json"] + (["msgpack"] if queuestore.msgpack else [])
+    stores = [
+        ("file", lambda fmt: queuestore.FileQueueStore(tmpdir, fmt)),
+        (
+            "sqlite",
+            lambda fmt: queuestore.SQLiteQueueStore(
+                os.path.join(tmpdir, "queue-%s.db" % fmt), fmt
+            ),
+        ),
+    ]
+
+    print("Queue with %d samples, %d tasks each" % (num_samples, num_tasks))
+    print_result(
+        "pickle, whole queue (previous)", timeit(lambda: pickle.dumps(queue_dict))
+    )
+
+    for (name, create), fmt in itertools.product(stores, formats):
+        store = create(fmt)
+        key = "queue:%s-%s" % (name, fmt)
+
+        def full_save():
+            store._records.pop(key, None)
+            store.save(key, queue_dict)
+
+        def one_changed_sample():
+            queue_dict[sid] = dict(queue_dict[sid], comments=str(next(counter)))
+            store.save(key, queue_dict)
+
+        label = "%s, %s" % (name, fmt)
+        print_result("%s, snapshot" % label, timeit(full_save))
+        print_result("%s, one changed sample" % label, timeit(one_changed_sample))
+        print_result("%s, load" % label, timeit(lambda: store.load(key)))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
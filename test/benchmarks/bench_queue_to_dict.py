@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the cached (incremental) queue serialization of Queue.queue_to_dict
+with a full rebuild of the dictionary representation, and the same for
+Queue.get_queue_state (queue with LIMS data, requested on each client load).
+
+    python test/benchmarks/bench_queue_to_dict.py [num_samples] [num_tasks]
+"""
+import sys
+
+from benchutils import init_app, populate_queue, timeit, print_result
+
+
+def main(num_samples=300, num_tasks=7):
+    client = init_app()
+    populate_queue(client, num_samples, num_tasks)
+
+    from mxcube3 import mxcube
+    from mxcubecore import HardwareRepository as HWR
+
+    queue = mxcube.queue
+    sample_node = HWR.beamline.queue_model.get_model_root().get_children()[0]
+
+    def full_rebuild():
+        queue.invalidate_queue_dict()
+        queue.queue_to_dict()
+
+    def one_dirty_sample():
+        queue.invalidate_queue_dict(sample_node)
+        queue.queue_to_dict()
+
+    def queue_state_full_rebuild():
+        queue.invalidate_queue_dict()
+        queue.get_queue_state()
+
+    print("Queue with %d samples, %d tasks each" % (num_samples, num_tasks))
+    print_result("full rebuild", timeit(full_rebuild))
+    print_result("cached, one dirty sample", timeit(one_dirty_sample))
+    print_result("cached, nothing dirty", timeit(queue.queue_to_dict))
+    print_result("get_queue_state, full rebuild", timeit(queue_state_full_rebuild))
+    print_result("get_queue_state, cached", timeit(queue.get_queue_state))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Time and size of the shape updates sent to the clients, full state (as sent
+before delta updates) compared with the delta sent when one point changes.
+
+    python test/benchmarks/bench_shape_updates.py [num_grids] [num_cells]
+"""
+import json
+import random
+import sys
+
+from benchutils import init_app, timeit, print_result
+
+
+def add_grid(client, num_cells, x):
+    grid = {
+        "t": "G",
+        "screenCoord": [x, 100],
+        "numCols": num_cells,
+        "numRows": num_cells,
+        "cellWidth": 5,
+        "cellHeight": 5,
+        "width": num_cells * 5,
+        "height": num_cells * 5,
+        "cellHSpace": 0,
+        "cellVSpace": 0,
+        "state": "SAVED",
+    }
+
+    resp = client.post(
+        "/mxcube/api/v0.1/sampleview/shapes",
+        data=json.dumps({"shapes": [grid]}),
+        content_type="application/json",
+    )
+
+    assert resp.status_code == 200
+
+    return json.loads(resp.data)["shapes"][0]["id"]
+
+
+def grid_result(num_cells):
+    def cell_values(i):
+        return [i, [random.randint(0, 255) for _ in range(3)] + [1]]
+
+    cells = range(1, num_cells * num_cells + 1)
+
+    return {
+        "heatmap": {i: cell_values(i) for i in cells},
+        "crystalmap": {i: cell_values(i) for i in cells},
+    }
+
+
+def main(num_grids=50, num_cells=40):
+    client = init_app()
+
+    from mxcube3 import mxcube
+    from mxcubecore import HardwareRepository as HWR
+    from mxcube3.core.util.convertutils import to_camel
+
+    sample_view = mxcube.sample_view
+    emitted = []
+    sample_view.app.server.emit = lambda event, data, **kwargs: emitted.append(data)
+
+    for i in range(num_grids):
+        sid = add_grid(client, num_cells, 10 * i)
+        HWR.beamline.sample_view.set_grid_data(sid, grid_result(num_cells))
+
+    point = HWR.beamline.sample_view.add_shape_from_mpos(
+        [HWR.beamline.diffractometer.get_positions()], (10, 10), "P"
+    )
+
+    def full_update():
+        shape_dict = {}
+
+        for shape in HWR.beamline.sample_view.get_shapes():
+            shape_dict[shape.id] = to_camel(shape.as_dict())
+
+        return json.dumps({"shapes": shape_dict})
+
+    def delta_update():
+        point.selected = not point.selected
+        del emitted[:]
+        sample_view._emit_shapes_updated()
+
+        return json.dumps(emitted[-1])
+
+    sample_view._emit_shapes_updated()
+
+    print("%d grids of %dx%d cells" % (num_grids, num_cells, num_cells))
+    print_result("full state", timeit(full_update))
+    print_result("delta, one point changed", timeit(delta_update))
+    print(
+        "%-40s full: %10d bytes, delta: %10d bytes"
+        % ("message size", len(full_update()), len(delta_update()))
+    )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+""" Helper functions for the benchmarks """
+import os
+import sys
+import time
+import json
+import copy
+
+BENCHMARK_ROOT = os.path.dirname(os.path.realpath(__file__))
+MXCUBE_ROOT = os.path.abspath(os.path.join(BENCHMARK_ROOT, "../../"))
+
+sys.path.append(MXCUBE_ROOT)
+sys.path.append(os.path.join(MXCUBE_ROOT, "test"))
+
+
+def timeit(fun, repeat=10):
+    """
+    Calls fun <repeat> times
+
+    :returns: Tuple (best, mean) time in seconds
+    """
+    times = []
+
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fun()
+        times.append(time.perf_counter() - t0)
+
+    return min(times), sum(times) / len(times)
+
+
+def print_result(label, result, unit="ms"):
+    scale = {"s": 1, "ms": 1e3, "us": 1e6}[unit]
+    best, mean = result
+    print("%-40s best: %10.3f %s, mean: %10.3f %s" % (
+        label, best * scale, unit, mean * scale, unit)
+    )
+
+
+def init_app():
+    """
+    Initializes the application with the mockup hardware objects and
+    returns a logged in flask test client.
+    """
+    from gevent import monkey
+
+    monkey.patch_all(thread=False)
+
+    from mxcubecore import HardwareRepository
+    from mxcube3 import main
+
+    try:
+        os.remove("/tmp/mxcube-test-user.db")
+    except FileNotFoundError:
+        pass
+
+    HardwareRepository.uninit_hardware_repository()
+    server = main(test=True)
+    server.flask.config["TESTING"] = True
+    client = server.flask.test_client()
+
+    data = json.dumps({"proposal": "idtest0", "password": "sUpErSaFe"})
+    client.post(
+        "/mxcube/api/v0.1/login/", data=data, content_type="application/json"
+    )
+
+    return client
+
+
+def populate_queue(client, num_samples, num_tasks):
+    """
+    Adds <num_samples> samples with <num_tasks> data collections each
+    to the queue.
+    """
+    from input_parameters import test_sample_1, test_task
+
+    for i in range(num_samples):
+        puck, pos = divmod(i, 10)
+        sample = copy.deepcopy(test_sample_1)
+        sample["sampleID"] = "%d:%02d" % (puck + 1, pos + 1)
+        sample["location"] = "%d:%d" % (puck + 1, pos + 1)
+        sample["code"] = "matr%d_%d" % (puck + 1, pos + 1)
+        sample["sampleName"] = "Sample-%d" % i
+        sample["tasks"] = [
+            dict(
+                copy.deepcopy(test_task["tasks"][0]),
+                sampleID=sample["sampleID"],
+            )
+            for _ in range(num_tasks)
+        ]
+
+        resp = client.post(
+            "/mxcube/api/v0.1/queue/",
+            data=json.dumps([sample]),
+            content_type="application/json",
+        )
+
+        assert resp.status_code == 200
@@ -0,0 +1,83 @@
+import pytest
+
+from mxcube3.core.util import adapterutils
+from mxcube3.core.util.adapterutils import adapts, get_adapter_cls_from_hardware_object
+
+
+# Hardware object classes with the hierarchy of the mxcubecore abstract classes
+class AbstractActuator:
+    pass
+
+
+class AbstractNState(AbstractActuator):
+    pass
+
+
+class AbstractShutter(AbstractNState):
+    pass
+
+
+class AbstractMotor(AbstractActuator):
+    pass
+
+
+class AbstractEnergy(AbstractActuator):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """Registers adapters for the classes above only"""
+    monkeypatch.setattr(adapterutils, "_ADAPTER_CLASSES", {})
+    monkeypatch.setattr(adapterutils, "_RESOLVED_ADAPTER_CLASSES", {})
+    monkeypatch.setattr(adapterutils, "_ADAPTER_MODULES_LOADED", True)
+
+    # Registered in another order than ADAPTER_ORDER
+    adapters = {}
+
+    for name, ho_classes in [
+        ("ActuatorAdapter", (AbstractActuator,)),
+        ("MotorAdapter", (AbstractMotor,)),
+        ("EnergyAdapter", (AbstractEnergy,)),
+        ("NStateAdapter", (AbstractNState, AbstractShutter)),
+    ]:
+        adapters[name] = adapts(*ho_classes)(type(name, (), {}))
+
+    return adapters
+
+
+@pytest.mark.parametrize(
+    "bases, adapter",
+    [
+        ((AbstractActuator,), "ActuatorAdapter"),
+        ((AbstractShutter,), "NStateAdapter"),
+        ((AbstractMotor,), "MotorAdapter"),
+        # Several abstract classes, the first adapter in ADAPTER_ORDER wins
+        # whatever the order of the bases
+        ((AbstractMotor, AbstractNState), "NStateAdapter"),
+        ((AbstractMotor, AbstractEnergy), "EnergyAdapter"),
+        ((AbstractEnergy, AbstractShutter), "NStateAdapter"),
+    ],
+)
+def test_adapter_order(registry, bases, adapter):
+    """Test that the adapter is the first one of ADAPTER_ORDER that applies."""
+    ho = type("HardwareObject", bases, {})()
+
+    assert get_adapter_cls_from_hardware_object(ho) is registry[adapter]
+
+
+def test_no_adapter():
+    assert get_adapter_cls_from_hardware_object(object()) is None
+
+
+def test_unordered_adapter_tried_last(registry):
+    """Test that adapters not in ADAPTER_ORDER come after the others."""
+    other = adapts(AbstractActuator)(type("OtherAdapter", (), {}))
+    ho = type("HardwareObject", (AbstractActuator,), {})()
+
+    assert get_adapter_cls_from_hardware_object(ho) is registry["ActuatorAdapter"]
+
+    adapterutils._ADAPTER_CLASSES.pop(registry["ActuatorAdapter"])
+    adapterutils._RESOLVED_ADAPTER_CLASSES.clear()
+
+    assert get_adapter_cls_from_hardware_object(ho) is other
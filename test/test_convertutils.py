@@ -0,0 +1,60 @@
+from mxcube3.core.util import convertutils
+from mxcube3.core.util.convertutils import from_camel, to_camel
+
+
+def test_to_camel_nested():
+    """Test that keys of nested dictionaries are converted."""
+    d = {
+        "screen_coord": [1, 2],
+        "motor_positions": {"kappa_phi": 0.0, "phiy": 1.0},
+        "result": {1: [0.5, [255, 0, 0, 255]]},
+    }
+
+    assert to_camel(d) == {
+        "screenCoord": [1, 2],
+        "motorPositions": {"kappaPhi": 0.0, "phiy": 1.0},
+        "result": {1: [0.5, [255, 0, 0, 255]]},
+    }
+
+
+def test_from_camel_nested():
+    """Test that camelCase keys are converted back to snake_case."""
+    d = {"screenCoord": [1, 2], "motorPositions": {"kappaPhi": 0.0}}
+
+    assert from_camel(d) == {
+        "screen_coord": [1, 2],
+        "motor_positions": {"kappa_phi": 0.0},
+    }
+    assert from_camel(to_camel({"cell_h_space": 1})) == {"cell_h_space": 1}
+
+
+def test_source_not_modified():
+    """Test that the converted dictionary shares no dictionary with the
+    source."""
+    d = {"motor_positions": {"phi_y": 1.0}}
+    converted = to_camel(d)
+    converted["motorPositions"]["phiY"] = 2.0
+
+    assert d == {"motor_positions": {"phi_y": 1.0}}
+
+
+def test_same_keys_different_order():
+    """Test dictionaries with the same keys in another order (key maps)."""
+    assert to_camel({"a_b": 1, "c_d": 2}) == {"aB": 1, "cD": 2}
+    assert to_camel({"c_d": 2, "a_b": 1}) == {"cD": 2, "aB": 1}
+
+
+def test_large_dictionaries():
+    """Test dictionaries with more keys than a key map holds."""
+    n = convertutils.MAX_KEY_MAP_SIZE + 10
+    d = {"key_%d" % i: i for i in range(n)}
+
+    assert to_camel(d) == {"key%d" % i: i for i in range(n)}
+
+
+def test_key_maps_bounded():
+    """Test that the number of key maps kept is bounded."""
+    for i in range(convertutils.MAX_KEY_MAPS + 10):
+        to_camel({"key_%d" % i: i})
+
+    assert len(convertutils._KEY_MAPS) <= convertutils.MAX_KEY_MAPS
@@ -0,0 +1,95 @@
+import math
+import random
+
+import pytest
+
+from mxcube3.core.util.coordutils import ScreenToMotorCalibration
+
+PIXELS_PER_MM = 500.0
+BEAM_POSITION = (640, 512)
+
+
+class Diffractometer:
+    """Centring geometry of GenericDiffractometer, see get_centred_point"""
+
+    def __init__(self):
+        self.positions = {"phi": 30.0, "phiy": 0.1, "sampx": 0.2, "sampy": -0.1}
+        self.calls = 0
+
+    def get_centred_point(self, x, y):
+        self.calls += 1
+        phi = math.radians(self.positions["phi"])
+        dx = (x - BEAM_POSITION[0]) / PIXELS_PER_MM
+        dy = (y - BEAM_POSITION[1]) / PIXELS_PER_MM
+
+        return dict(
+            self.positions,
+            phiy=self.positions["phiy"] + dx,
+            sampx=self.positions["sampx"] + dy * math.sin(phi),
+            sampy=self.positions["sampy"] + dy * math.cos(phi),
+            zoom="Zoom 2",
+        )
+
+
+def assert_positions_equal(expected, result):
+    assert set(expected) == set(result)
+
+    for name, value in expected.items():
+        if isinstance(value, float):
+            assert result[name] == pytest.approx(value, abs=1e-9)
+        else:
+            assert result[name] == value
+
+
+def test_batch_matches_point_by_point():
+    """Test that the batch conversion gives the positions of each point."""
+    dm = Diffractometer()
+    calibration = ScreenToMotorCalibration(dm.get_centred_point)
+    coords = [(random.uniform(0, 1280), random.uniform(0, 1024)) for _ in range(20)]
+    result = calibration.to_motor_positions(coords, "key", BEAM_POSITION, dm.positions)
+
+    for (x, y), positions in zip(coords, result):
+        assert_positions_equal(dm.get_centred_point(x, y), positions)
+
+
+def test_calibration_follows_motor_moves():
+    """Test that the calibration is kept, and correct, when motors move."""
+    dm = Diffractometer()
+    calibration = ScreenToMotorCalibration(dm.get_centred_point)
+    calibration.to_motor_positions([(0, 0)], "key", BEAM_POSITION, dm.positions)
+    calls = dm.calls
+
+    dm.positions.update(phiy=0.5, sampx=-0.3)
+    (result,) = calibration.to_motor_positions(
+        [(100, 700)], "key", BEAM_POSITION, dm.positions
+    )
+
+    assert dm.calls == calls
+    assert calibration.is_calibrated("key")
+    assert_positions_equal(dm.get_centred_point(100, 700), result)
+
+
+def test_new_key_recalibrates():
+    """Test that a different key (i.e omega moved) triggers a calibration."""
+    dm = Diffractometer()
+    calibration = ScreenToMotorCalibration(dm.get_centred_point)
+    calibration.to_motor_positions([(0, 0)], 30.0, BEAM_POSITION, dm.positions)
+
+    dm.positions["phi"] = 120.0
+    (result,) = calibration.to_motor_positions(
+        [(10, 20)], 120.0, BEAM_POSITION, dm.positions
+    )
+
+    assert not calibration.is_calibrated(30.0)
+    assert_positions_equal(dm.get_centred_point(10, 20), result)
+
+
+def test_not_affine_unusable():
+    """Test that a function that is not affine is not calibrated."""
+    calibration = ScreenToMotorCalibration(
+        lambda x, y: {"phiy": random.random(), "sampx": x * y}
+    )
+
+    assert calibration.to_motor_positions([(1, 2)], "key") is None
+    assert calibration.is_calibrated("key")
+    assert calibration.to_motor_positions([(1, 2)], "key") is None
@@ -0,0 +1,91 @@
+import threading
+
+import gevent
+
+from mxcube3.core.util.emitbus import EmitBus
+
+
+def emit_bus(**kwargs):
+    packets = []
+
+    def emit(event, *args, **kwargs):
+        packets.append((event, list(args), kwargs))
+
+    bus = EmitBus(emit, 0.01, namespaces=["/hwr"], **kwargs)
+
+    return bus, packets
+
+
+def test_events_sent_as_one_batch():
+    """Test that events on a batched namespace are sent as one batch."""
+    bus, packets = emit_bus()
+    bus.emit("task", {"id": 1}, namespace="/hwr")
+    bus.emit("motor_position", "phi", 10, namespace="/hwr")
+
+    assert packets == []
+    gevent.sleep(0.05)
+    assert packets == [
+        (
+            "batch",
+            [[["task", {"id": 1}], ["motor_position", "phi", 10]]],
+            {"namespace": "/hwr", "room": None},
+        )
+    ]
+
+
+def test_single_event_not_wrapped():
+    """Test that a single buffered event is sent as itself."""
+    bus, packets = emit_bus()
+    bus.emit("task", {"id": 1}, namespace="/hwr")
+    bus.flush()
+
+    assert packets == [("task", [{"id": 1}], {"namespace": "/hwr", "room": None})]
+
+
+def test_other_namespaces_not_batched():
+    """Test that events on namespaces without batch support are sent at once."""
+    bus, packets = emit_bus()
+    bus.emit("state", {"a": 1}, namespace="/ui_state")
+
+    assert packets == [("state", [{"a": 1}], {"namespace": "/ui_state", "room": None})]
+
+
+def test_priority_event_keeps_order():
+    """Test that a priority event is sent after the events buffered before."""
+    bus, packets = emit_bus(priority_events=["queue"])
+    bus.emit("task", 1, namespace="/hwr")
+    bus.emit("queue", 2, namespace="/hwr")
+
+    assert [p[0] for p in packets] == ["task", "queue"]
+
+
+def test_other_thread_not_batched():
+    """Test that events emitted from another thread are sent at once."""
+    bus, packets = emit_bus()
+    thread = threading.Thread(
+        target=bus.emit, args=("task", 1), kwargs={"namespace": "/hwr"}
+    )
+    thread.start()
+    thread.join()
+
+    assert packets == [("task", [1], {"namespace": "/hwr", "room": None})]
+
+
+def test_emit_while_sending_not_buffered():
+    """Test that an event emitted while sending (i.e a log record of the
+    failure) is sent at once instead of being buffered again."""
+    packets = []
+
+    def emit(event, *args, **kwargs):
+        if event == "task":
+            bus.emit("log_record", "failed", namespace="/hwr")
+            raise RuntimeError("failed")
+
+        packets.append(event)
+
+    bus = EmitBus(emit, 0.01, namespaces=["/hwr"])
+    bus.emit("task", 1, namespace="/hwr")
+    bus.flush()
+    gevent.sleep(0.05)
+
+    assert packets == ["log_record"]
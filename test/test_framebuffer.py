@@ -0,0 +1,85 @@
+import io
+
+import gevent
+import PIL.Image
+
+from mxcube3.video import frameutils
+from mxcube3.video.framebuffer import FrameBuffer
+
+
+def jpeg(color):
+    data = io.BytesIO()
+    PIL.Image.new("RGB", (8, 8), color).save(data, format="JPEG")
+
+    return data.getvalue()
+
+
+def test_keeps_last_frames():
+    """Test that only the last size frames are kept."""
+    buffer = FrameBuffer(size=2)
+    assert buffer.latest() is None
+
+    for t in range(3):
+        buffer.append(b"%d" % t, t)
+
+    assert len(buffer) == 2
+    assert buffer.latest() == (2, b"2")
+    assert buffer.frame_at(0, timeout=0) == (1, b"1")
+
+
+def test_frame_at_first_frame_after_t():
+    buffer = FrameBuffer()
+    buffer.append(b"a", 10.0)
+    buffer.append(b"b", 20.0)
+
+    assert buffer.frame_at(15.0, timeout=0) == (20.0, b"b")
+
+
+def test_frame_at_waits_for_next_frame():
+    """Test that frame_at waits for a frame received after t."""
+    buffer = FrameBuffer()
+    buffer.append(b"old", 10.0)
+    gevent.spawn_later(0.01, buffer.append, b"new", 30.0)
+
+    assert buffer.frame_at(20.0, timeout=1) == (30.0, b"new")
+
+
+def test_frame_at_timeout():
+    buffer = FrameBuffer()
+    buffer.append(b"old", 10.0)
+
+    assert buffer.frame_at(20.0, timeout=0.01) is None
+
+
+def test_image_and_jpeg_conversion():
+    """Test that JPEG frames are decoded and images encoded when requested."""
+    buffer = FrameBuffer()
+    data = jpeg("red")
+    buffer.append(data, 1.0)
+    buffer.append(PIL.Image.new("RGB", (8, 8), "blue"), 2.0)
+
+    assert buffer.jpeg_at(1.0, timeout=0) == (1.0, data)
+
+    t, image = buffer.image_at(1.0, timeout=0)
+    assert t == 1.0 and image.size == (8, 8)
+    assert image.getpixel((4, 4))[0] > 200
+
+    t, data = buffer.jpeg_at(2.0, timeout=0)
+    image = PIL.Image.open(io.BytesIO(data))
+    assert t == 2.0 and image.format == "JPEG"
+    assert image.getpixel((4, 4))[2] > 200
+
+
+def test_raw_frame_converted_when_requested():
+    """Test that a raw BGRX frame is kept as is and converted on request."""
+    buffer = FrameBuffer()
+    raw = frameutils.RawFrame(bytearray([0, 0, 255, 0] * 8 * 4), 8, 4)
+    buffer.append(raw, 1.0)
+
+    assert buffer.latest() == (1.0, raw)
+
+    t, image = buffer.image_at(1.0, timeout=0)
+    assert image.size == (8, 4) and image.getpixel((2, 2)) == (255, 0, 0)
+
+    t, data = buffer.jpeg_at(1.0, timeout=0)
+    assert PIL.Image.open(io.BytesIO(data)).size == (8, 4)
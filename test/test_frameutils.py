@@ -0,0 +1,64 @@
+import numpy as np
+
+from mxcube3.video import frameutils
+
+
+class VoidPtr(bytearray):
+    """Buffer with the setsize method of sip.voidptr"""
+
+    def setsize(self, size):
+        self.size = size
+
+
+class QImage:
+    """Pixel access interface of a PyQt QImage"""
+
+    def __init__(self, width, height):
+        self._bits = VoidPtr(width * height * 4)
+
+    def sizeInBytes(self):
+        return len(self._bits)
+
+    def bits(self):
+        return self._bits
+
+
+def test_buffer_of_array_not_copied():
+    """Test that the view of a numpy frame shares its memory."""
+    frame = np.zeros((4, 3, 4), dtype=np.uint8)
+    view = frameutils.qimage_buffer(frame)
+    frame[0, 0, 0] = 255
+
+    assert np.shares_memory(np.asarray(view), frame)
+    assert view.tobytes()[0] == 255
+
+
+def test_buffer_of_qimage_not_copied():
+    """Test that the view of a QImage shares its pixel memory."""
+    img = QImage(3, 4)
+    view = frameutils.qimage_buffer(img)
+    img.bits()[0] = 255
+
+    assert img.bits().size == 48
+    assert view.nbytes == 48 and view[0] == 255
+
+
+def test_to_pil_image_bgrx():
+    """Test the conversion of a BGRX frame to an RGB image."""
+    frame = np.zeros((2, 3, 4), dtype=np.uint8)
+    frame[..., 0] = 10  # B
+    frame[..., 1] = 20  # G
+    frame[..., 2] = 30  # R
+    image = frameutils.to_pil_image(frameutils.qimage_buffer(frame), 3, 2)
+
+    assert image.mode == "RGB" and image.size == (3, 2)
+    assert image.getpixel((2, 1)) == (30, 20, 10)
+
+
+def test_encode_decode_jpeg():
+    """Test a JPEG round trip, scaled, in the thread pool."""
+    image = frameutils.to_image(np.full((20, 40, 3), 128, dtype=np.uint8))
+    data = frameutils.encode_jpeg(image, quality=90, scale=0.5)
+    decoded = frameutils.decode_jpeg(data)
+
+    assert decoded.size == (20, 10)
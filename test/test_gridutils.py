@@ -0,0 +1,106 @@
+import io
+
+import numpy as np
+import PIL.Image
+import pytest
+
+from mxcube3.core.util.gridutils import (
+    GridResults,
+    HeatmapCache,
+    render_heatmap,
+    value_to_rgba,
+)
+
+
+def test_value_to_rgba():
+    """Test the colour map, blue to green to red, NaN transparent."""
+    rgba = value_to_rgba([0, 0.5, 1, np.nan])
+
+    assert rgba[:3].tolist() == [
+        [0, 0, 255, 255],
+        [0, 255, 0, 255],
+        [255, 0, 0, 255],
+    ]
+    assert rgba[3, 3] == 0
+
+
+def test_set_cells_and_pop_changes():
+    """Test that only the cells changed since the last call are returned."""
+    results = GridResults(4)
+    results.set_cells([1, 2], [1.0, 2.0], colors=[[1, 2, 3, 4], [5, 6, 7, 8]])
+
+    assert results.version == 1
+    assert results.pop_changes() == {
+        "heatmap": {1: [1.0, [1, 2, 3, 4]], 2: [2.0, [5, 6, 7, 8]]}
+    }
+    assert results.pop_changes() == {}
+
+    results.set_cells([4], [3.0], colors=[[0, 0, 0, 255]], result_type="crystalmap")
+    assert results.pop_changes() == {"crystalmap": {4: [3.0, [0, 0, 0, 255]]}}
+
+
+def test_computed_colours_recoloured_cells_changed():
+    """Test that cells whose colour changes with the value range are sent."""
+    results = GridResults(3)
+    results.set_cells([1, 2], [0.0, 1.0])
+    results.pop_changes()
+    results.set_cells([3], [2.0])
+
+    # The range is now 0-2, cell 2 turns from red to green
+    assert sorted(results.pop_changes()["heatmap"]) == [2, 3]
+
+
+def test_as_result_skips_cells_without_value():
+    results = GridResults(3)
+    results.set_cells([2], [1.0], colors=[[1, 1, 1, 1]])
+
+    assert results.as_result() == {
+        "heatmap": {2: [1.0, [1, 1, 1, 1]]},
+        "crystalmap": {},
+    }
+
+
+@pytest.mark.parametrize(
+    "cells, values, result_type",
+    [
+        ([0], [1.0], "heatmap"),  # Cells start at 1
+        ([5], [1.0], "heatmap"),  # Out of range
+        ([1, 2], [1.0], "heatmap"),  # Lengths not matching
+        ([1], [1.0], "unknown"),
+    ],
+)
+def test_set_cells_invalid(cells, values, result_type):
+    with pytest.raises(ValueError):
+        GridResults(4).set_cells(cells, values, result_type=result_type)
+
+
+def test_render_heatmap():
+    """Test that each cell is a square of its colour, row by row."""
+    colors = [[255, 0, 0, 255], [0, 255, 0, 255], [0, 0, 255, 255], [0, 0, 0, 0]]
+    image = PIL.Image.open(io.BytesIO(render_heatmap(colors, 2, 2, cell_size=4)))
+
+    assert image.size == (8, 8)
+    assert image.getpixel((1, 1)) == (255, 0, 0, 255)
+    assert image.getpixel((6, 1)) == (0, 255, 0, 255)
+    assert image.getpixel((1, 6)) == (0, 0, 255, 255)
+
+
+def test_heatmap_cache():
+    """Test that a heatmap is rendered once per key and old ones dropped."""
+    cache = HeatmapCache(max_entries=2)
+    renders = []
+
+    def render(data):
+        return lambda: renders.append(data) or data
+
+    etag, data = cache.get(("G1", "heatmap", 1), render(b"a"))
+    assert cache.get(("G1", "heatmap", 1), render(b"b")) == (etag, b"a")
+
+    cache.get(("G1", "heatmap", 2), render(b"c"))
+    cache.get(("G2", "heatmap", 1), render(b"d"))
+
+    assert len(cache) == 2
+    assert renders == [b"a", b"c", b"d"]
+
+    cache.get(("G1", "heatmap", 1), render(b"a"))
+    assert renders == [b"a", b"c", b"d", b"a"]
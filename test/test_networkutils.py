@@ -0,0 +1,72 @@
+import gevent
+
+from mxcube3.core.util.networkutils import Throttled
+
+
+def throttled_recorder(max_per_second=20):
+    calls = []
+
+    @Throttled(max_per_second, key=lambda k, value: k)
+    def record(k, value):
+        calls.append((k, value))
+
+    return record, calls
+
+
+def test_throttled_first_call_immediate():
+    """Test that the first call for a key is made immediately."""
+    record, calls = throttled_recorder()
+    record("a", 1)
+    record("b", 1)
+
+    assert calls == [("a", 1), ("b", 1)]
+
+
+def test_throttled_trailing_call_has_last_value():
+    """Test that calls within the interval are coalesced into the last one."""
+    record, calls = throttled_recorder()
+
+    for value in range(5):
+        record("a", value)
+
+    assert calls == [("a", 0)]
+    gevent.sleep(0.1)
+    assert calls == [("a", 0), ("a", 4)]
+
+
+def test_throttled_cancel():
+    """Test that a cancelled pending call is never made."""
+    record, calls = throttled_recorder()
+    record("a", 0)
+    record("a", 1)
+    record.cancel("a")
+    gevent.sleep(0.1)
+
+    assert calls == [("a", 0)]
+
+
+def test_throttled_flush():
+    """Test that flush makes the pending call at once, and only once."""
+    record, calls = throttled_recorder()
+    record("a", 0)
+    record("a", 1)
+    record.flush("a")
+
+    assert calls == [("a", 0), ("a", 1)]
+    gevent.sleep(0.1)
+    assert calls == [("a", 0), ("a", 1)]
+
+
+def test_throttled_forgets_expired_keys():
+    """Test that the state of keys not called for an interval is dropped."""
+    record, calls = throttled_recorder(100)
+
+    for k in range(100):
+        record(k, 0)
+
+    record(0, 1)
+    gevent.sleep(0.05)
+    record("last", 0)
+
+    assert len(calls) == 102
+    assert record.keys() == {"last"}
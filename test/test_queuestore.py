@@ -0,0 +1,132 @@
+import copy
+import os
+
+import numpy as np
+import pytest
+
+from mxcube3.core.util import queuestore
+
+FORMATS = ["json"] + (["msgpack"] if queuestore.msgpack else [])
+
+
+def queue_dict(num_samples=3):
+    queue = {
+        "sample_order": ["%d:01" % i for i in range(1, num_samples + 1)],
+        "rootNodeId": 1,
+    }
+
+    for sid in queue["sample_order"]:
+        queue[sid] = {"sampleID": sid, "tasks": [{"type": "DataCollection"}]}
+
+    return queue
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def create_store(request, tmp_path):
+    """Returns a function creating stores on the same storage"""
+
+    def create(serializer="json", compact_min=100):
+        if request.param == "file":
+            return queuestore.FileQueueStore(str(tmp_path), serializer, compact_min)
+
+        return queuestore.SQLiteQueueStore(
+            str(tmp_path / "queue.db"), serializer, compact_min
+        )
+
+    return create
+
+
+@pytest.mark.parametrize("serializer", FORMATS)
+def test_save_load(create_store, serializer):
+    """Test that a saved queue is loaded back, also by a new store."""
+    store = create_store(serializer)
+    queue = queue_dict()
+    store.save("queue:1", queue)
+
+    assert store.load("queue:1") == queue
+    assert create_store(serializer).load("queue:1") == queue
+
+
+@pytest.mark.parametrize("serializer", FORMATS)
+def test_numpy_values(create_store, serializer):
+    """Test that numpy scalars are saved as Python numbers."""
+    store = create_store(serializer)
+    queue = queue_dict()
+    queue["1:01"]["tasks"][0]["num_images"] = np.int64(100)
+    store.save("queue:1", queue)
+
+    assert store.load("queue:1")["1:01"]["tasks"][0]["num_images"] == 100
+
+
+def test_load_unknown_key(create_store):
+    assert create_store().load("queue:1") is None
+
+
+def test_incremental_save(create_store):
+    """Test that only the changed and removed entries are journaled."""
+    store = create_store()
+    queue = queue_dict()
+    store.save("queue:1", queue)
+
+    queue = copy.deepcopy(queue)
+    queue["1:01"]["tasks"].append({"type": "Characterisation"})
+    del queue["2:01"]
+    queue["sample_order"].remove("2:01")
+    store.save("queue:1", queue)
+
+    assert store._journal_length["queue:1"] == 3
+    assert create_store().load("queue:1") == queue
+
+    store.save("queue:1", queue)
+    assert store._journal_length["queue:1"] == 3
+
+
+def test_compaction(create_store):
+    """Test that the journal is folded into a snapshot once long enough."""
+    store = create_store(compact_min=2)
+    queue = queue_dict()
+    store.save("queue:1", queue)
+
+    for i in range(6):
+        queue = copy.deepcopy(queue)
+        queue["1:01"]["comments"] = str(i)
+        store.save("queue:1", queue)
+
+    # Compacted at the 6th record, more than the 5 entries of the queue
+    assert store._journal_length["queue:1"] == 0
+    assert create_store().load("queue:1") == queue
+
+
+def test_keys_independent(create_store):
+    store = create_store()
+    store.save("queue:1", queue_dict(1))
+    store.save("queue:2", queue_dict(2))
+
+    assert store.load("queue:1") == queue_dict(1)
+    assert store.load("queue:2") == queue_dict(2)
+
+
+def test_unknown_format(tmp_path):
+    """Test that a snapshot of an unknown format version is not loaded."""
+    store = queuestore.FileQueueStore(str(tmp_path))
+    store._write_snapshot("queue:1", b'{"format":99,"queue":{}}')
+
+    with pytest.raises(ValueError):
+        store.load("queue:1")
+
+
+def test_file_store_key_sanitized(tmp_path):
+    """Test that the key can not name a file outside the directory."""
+    store = queuestore.FileQueueStore(str(tmp_path / "queues"))
+    store.save("../queue:1", queue_dict())
+
+    assert os.listdir(str(tmp_path)) == ["queues"]
+    assert os.stat(str(tmp_path / "queues")).st_mode & 0o077 == 0
+    assert store.load("../queue:1") == queue_dict()
+
+
+def test_create_queue_store(tmp_path):
+    store = queuestore.create_queue_store("sqlite", str(tmp_path / "queue.db"))
+
+    assert isinstance(store, queuestore.SQLiteQueueStore)
+    assert store.serializer.name == "json"
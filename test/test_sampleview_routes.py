@@ -0,0 +1,29 @@
+import json
+
+from fixture import client
+
+
+def test_add_cell_results_without_body(client):
+    """Test that adding cell results without a JSON body is refused."""
+    resp = client.post("/mxcube/api/v0.1/sampleview/shapes/G1/results")
+    assert resp.status_code == 400
+
+
+def test_add_cell_results_without_values(client):
+    """Test that adding cell results without values is refused."""
+    resp = client.post(
+        "/mxcube/api/v0.1/sampleview/shapes/G1/results",
+        data=json.dumps({"cells": [1, 2]}),
+        content_type="application/json",
+    )
+    assert resp.status_code == 400
+
+
+def test_add_cell_results_unknown_grid(client):
+    """Test that adding cell results to a grid that does not exist fails."""
+    resp = client.post(
+        "/mxcube/api/v0.1/sampleview/shapes/G1000/results",
+        data=json.dumps({"cells": [1, 2], "values": [0.5, 1]}),
+        content_type="application/json",
+    )
+    assert resp.status_code == 409
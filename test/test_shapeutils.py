@@ -0,0 +1,105 @@
+import pytest
+
+from mxcube3.core.util.shapeutils import ShapeChangeTracker, ShapeIndex
+
+PIXELS_PER_MM = (500.0, 500.0)
+
+
+def point(sid, x, y):
+    return {"id": sid, "t": "P", "screen_coord": [x, y]}
+
+
+def grid(sid, x, y, count_fun="left-right"):
+    # 3 x 2 cells of 20 x 10 um spaced by 4 um, at 500 pixels per mm:
+    # cells of 10 x 5 pixels, 2 pixels apart, a slot of 12 x 7 pixels
+    return {
+        "id": sid,
+        "t": "G",
+        "screen_coord": [x, y],
+        "num_cols": 3,
+        "num_rows": 2,
+        "cell_width": 20,
+        "cell_height": 10,
+        "cell_h_space": 4,
+        "cell_v_space": 4,
+        "cell_count_fun": count_fun,
+    }
+
+
+def test_tracker_reports_changes_only():
+    """Test that an update returns only the changed and deleted shapes."""
+    tracker = ShapeChangeTracker()
+    changed, deleted = tracker.update({"P1": point("P1", 0, 0)})
+
+    assert set(changed) == {"P1"} and deleted == [] and tracker.version == 1
+
+    changed, deleted = tracker.update({"P1": point("P1", 0, 0)})
+    assert changed == {} and deleted == [] and tracker.version == 1
+
+    changed, deleted = tracker.update({"P2": point("P2", 1, 1)})
+    assert set(changed) == {"P2"} and deleted == ["P1"] and tracker.version == 2
+
+
+def test_tracker_reset():
+    """Test that after a reset all shapes are reported again."""
+    tracker = ShapeChangeTracker()
+    tracker.update({"P1": point("P1", 0, 0)})
+    tracker.reset()
+    changed, _ = tracker.update({"P1": point("P1", 0, 0)})
+
+    assert set(changed) == {"P1"}
+
+
+def test_index_points_and_lines():
+    """Test hits on points and lines, points listed first."""
+    shapes = {
+        "P1": point("P1", 100, 100),
+        "P2": point("P2", 200, 100),
+        "L1": {"id": "L1", "t": "L", "refs": ["P1", "P2"]},
+    }
+    index = ShapeIndex(bucket_size=64, tolerance=5)
+    index.build(shapes, PIXELS_PER_MM)
+
+    assert [hit[0] for hit in index.query(102, 101)] == ["P1", "L1"]
+    assert index.query(150, 103) == [("L1", "L", None)]
+    assert index.query(150, 110) == []
+
+
+@pytest.mark.parametrize(
+    "x, y, hits",
+    [
+        (1006, 2002, [("G1", "G", 1)]),  # First cell, after the half spacing
+        (1030, 2003, [("G1", "G", 3)]),  # Third column
+        (1018, 2010, [("G1", "G", 5)]),  # Second row
+        (1000.5, 2003, [("G1", "G", None)]),  # Spacing before the first cell
+        (1037, 2003, []),  # Outside the grid
+    ],
+)
+def test_index_grid_cell(x, y, hits):
+    """Test that a click maps to the cell drawn there by the UI."""
+    index = ShapeIndex()
+    index.build({"G1": grid("G1", 1000, 2000)}, PIXELS_PER_MM)
+
+    assert index.query(x, y) == hits
+
+
+@pytest.mark.parametrize(
+    "count_fun, cells",
+    [
+        ("left-right", [1, 2, 3, 4, 5, 6]),
+        ("zig-zag", [1, 2, 3, 6, 5, 4]),
+        ("top-down", [1, 3, 5, 2, 4, 6]),
+        ("top-down-zig-zag", [1, 4, 5, 2, 3, 6]),
+    ],
+)
+def test_index_grid_cell_counting(count_fun, cells):
+    """Test the cell numbers of each counting, row by row."""
+    index = ShapeIndex()
+    index.build({"G1": grid("G1", 0, 0, count_fun)}, PIXELS_PER_MM)
+    result = [
+        index.query(6 + 12 * col, 3 + 7 * row)[0][2]
+        for row in range(2)
+        for col in range(3)
+    ]
+
+    assert result == cells
@@ -214,6 +214,45 @@ export function setShapes(shapes) {
   };
 }
 
+export function updateGridCellResults(id, cells) {
+  return {
+    type: 'UPDATE_GRID_CELL_RESULTS',
+    id,
+    cells,
+  };
+}
+
+export function applyShapesDelta(shapes, deleted) {
+  return {
+    type: 'APPLY_SHAPES_DELTA',
+    shapes,
+    deleted,
+  };
+}
+
+export function fetchShapes() {
+  return function (dispatch) {
+    return fetch('/mxcube/api/v0.1/sampleview/shapes', {
+      method: 'GET',
+      credentials: 'include',
+      headers: {
+        Accept: 'application/json',
+        'Content-type': 'application/json',
+      },
+    })
+      .then((response) => {
+        if (response.status >= 400) {
+          throw new Error('Server refused to return shapes');
+        }
+        return response.json();
+      })
+      .then((json) => {
+        dispatch(setShapes(json.shapes));
+        return json.version;
+      });
+  };
+}
+
 export function toggleCinema() {
   return {
     type: 'TOOGLE_CINEMA',
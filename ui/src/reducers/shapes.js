@@ -24,6 +24,33 @@ export default (state = initialState, action) => {
 
       return { ...state, shapes };
     }
+    case 'APPLY_SHAPES_DELTA': {
+      return {
+        ...state,
+        shapes: omit({ ...state.shapes, ...action.shapes }, action.deleted),
+      };
+    }
+    case 'UPDATE_GRID_CELL_RESULTS': {
+      const shape = state.shapes[action.id];
+
+      if (!shape) {
+        return state;
+      }
+
+      const result = { ...shape.result };
+
+      Object.keys(action.cells).forEach((resultType) => {
+        result[resultType] = {
+          ...result[resultType],
+          ...action.cells[resultType],
+        };
+      });
+
+      return {
+        ...state,
+        shapes: { ...state.shapes, [action.id]: { ...shape, result } },
+      };
+    }
     case 'DELETE_SHAPE': {
       return { ...state, shapes: omit(state.shapes, action.id) };
     }
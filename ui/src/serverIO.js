@@ -2,7 +2,9 @@ import io from 'socket.io-client';
 import { addResponseMessage } from 'react-chat-widget';
 import { addLogRecord } from './actions/logger';
 import {
-  setShapes,
+  applyShapesDelta,
+  fetchShapes,
+  updateGridCellResults,
   saveMotorPosition,
   updateMotorState,
   setBeamInfo,
@@ -50,6 +52,17 @@ import { setEnergyScanResult } from './actions/taskResults';
 
 import { CLICK_CENTRING } from './constants';
 
+// The server sends events emitted within the same short interval as one
+// 'batch' event, [[event, ...args], ...], dispatch each of them to the
+// handlers registered for that event
+function listenBatch(socket) {
+  socket.on('batch', (frames) => {
+    frames.forEach(([event, ...args]) => {
+      socket.listeners(event).forEach((listener) => listener(...args));
+    });
+  });
+}
+
 class ServerIO {
   constructor() {
     this.networkSocket = null;
@@ -58,6 +71,10 @@ class ServerIO {
     this.uiStateSocket = null;
     this.hwrsid = null;
     this.connected = false;
+    this.shapesVersion = null;
+    // Newest shapes version received in an update_shapes_delta
+    this.shapesLatestVersion = null;
+    this.shapesResync = null;
 
     this.uiStorage = {
       setItem: (key, value) => {
@@ -112,6 +129,27 @@ class ServerIO {
   //   this.hwrSocket.emit('setRaObserver', { master: true, name }, cb);
   // }
 
+  resyncShapes() {
+    if (this.shapesResync === null) {
+      this.shapesLatestVersion = null;
+      this.shapesResync = this.dispatch(fetchShapes()).then(
+        (version) => {
+          this.shapesVersion = version;
+          this.shapesResync = null;
+
+          // A delta received during the fetch may be newer than the
+          // fetched shapes, fetch again if so
+          if (this.shapesLatestVersion > version) {
+            this.resyncShapes();
+          }
+        },
+        () => {
+          this.shapesResync = null;
+        }
+      );
+    }
+  }
+
   disconnect() {
     this.hwrSocket.disconnect();
     this.hwrSocket.disconnect();
@@ -128,6 +166,9 @@ class ServerIO {
       `//${document.domain}:${window.location.port}/logging`
     );
 
+    listenBatch(this.hwrSocket);
+    listenBatch(this.loggingSocket);
+
     this.loggingSocket.on('log_record', (record) => {
       this.dispatch(addUserMessage(record));
       this.dispatch(addLogRecord(record));
@@ -151,8 +192,22 @@ class ServerIO {
       this.dispatch(updateMotorState(record.name, record.state));
     });
 
-    this.hwrSocket.on('update_shapes', (record) => {
-      this.dispatch(setShapes(record.shapes));
+    this.hwrSocket.on('update_shapes_delta', (record) => {
+      this.shapesLatestVersion = Math.max(
+        this.shapesLatestVersion,
+        record.version
+      );
+
+      if (record.baseVersion === this.shapesVersion) {
+        this.shapesVersion = record.version;
+        this.dispatch(applyShapesDelta(record.shapes, record.deleted));
+      } else if (
+        this.shapesVersion === null ||
+        record.baseVersion > this.shapesVersion
+      ) {
+        // Missed an update, fetch all shapes
+        this.resyncShapes();
+      }
     });
 
     this.hwrSocket.on('update_pixels_per_mm', (record) => {
@@ -175,6 +230,10 @@ class ServerIO {
       this.dispatch(updateShapes([data.shape]));
     });
 
+    this.hwrSocket.on('grid_cell_results', (data) => {
+      this.dispatch(updateGridCellResults(data.id, data.cells));
+    });
+
     this.hwrSocket.on('energy_scan_result', (data) => {
       this.dispatch(setEnergyScanResult(data.pk, data.ip, data.rm));
     });